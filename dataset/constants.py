@@ -1,5 +1,6 @@
-import json, os
+import os
 from pathlib import Path
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 BASE_RPC_URL = "http://127.0.0.1:8546"
@@ -56,17 +57,13 @@ SUSDS_CONTRACT_ADDRESS_ETH = "0xa3931d71877c0e7a3148cb7eb4463524fec27fbd"
 current_dir = Path(__file__).parent
 abi_dir = current_dir.parent / "abi"
 
-with open(abi_dir / 'erc20_abi.json', 'r') as f:
-    ERC20_ABI = json.load(f)
+ERC20_ABI = load_abi("erc20")
 
-with open(abi_dir / 'aave_v3_abi.json', 'r') as f:
-    AAVE_V3_POOL_ABI = json.load(f)
+AAVE_V3_POOL_ABI = load_abi("aave_v3")
 
-with open(abi_dir / 'ens_register_controller_abi.json', 'r') as f:
-    ENS_REGISTER_CONTROLLER_ABI = json.load(f)
+ENS_REGISTER_CONTROLLER_ABI = load_abi("ens_register_controller")
 
-with open(abi_dir / "morpho_abi.json", 'r') as f:
-    MORPHO_CONTRACT_ABI = json.load(f)
+MORPHO_CONTRACT_ABI = load_abi("morpho")
 
 WETH_CONTRACT_ADDRESS_BASE='0x4200000000000000000000000000000000000006'
 
@@ -79,8 +76,7 @@ ENS_REGISTER_CONTROLLER_ADDRESS_ETH = "0x253553366Da8546fC250F225fe3d25d0C782303
 ENS_WRAPPER_ADDRESS_ETH = "0xD4416b13d2b3a9aBae7AcD5D6C2BbDBE25686401"
 
 
-with open(abi_dir / "morpho_vault_abi.json", "r") as f:
-    MORPHO_VAULT_ABI = json.load(f)
+MORPHO_VAULT_ABI = load_abi("morpho_vault")
 
 
 SUSDE_CONTRACT_ADDRESS_ETH = "0x9D39A5DE30e57443BfF2A8307A4256c8797A3497"
@@ -89,12 +85,27 @@ USDS_WRAPPER_ADDRESS_ETH ="0xA188EEC8F81263234dA3622A406892F3D630f98c"
 PENDLE_ROUTER_V4_ADDRESS_ETH="0x888888888889758F76e7103c6CbF23ABbF58F946"
 SUSDS_PROXY_CONTRACT_ADDRESS_ETH="0xa3931d71877C0E7a3148CB7Eb4463524FEc27fbD"
 
-with open(abi_dir / "usds_pm_wrapper_abi.json", "r") as f:
-    USDS_PM_WRAPPER_ABI = json.load(f)
+USDS_PM_WRAPPER_ABI = load_abi("usds_pm_wrapper")
 
-with open(abi_dir / "susds_abi.json", "r") as f:
-    SUSDS_PROXY_ABI= json.load(f)
+SUSDS_PROXY_ABI = load_abi("susds")
 
 
 USDC_CONTRACT_ADDRESS_BASE="0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
-BIND_ADDRESS = "0x670C68F7fE704211cAcaDa9199Db8d52335CE165"
\ No newline at end of file
+BIND_ADDRESS = "0x670C68F7fE704211cAcaDa9199Db8d52335CE165"
+# Multicall3 在主网和 Base 上地址相同
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# 以太坊主网常用代币: symbol -> (合约地址, 精度)，ETH 为原生币
+ERC20_TOKENS_ETH = {
+    "WETH": (WETH_CONTRACT_ADDRESS_ETH, 18),
+    "USDC": (USDC_CONTRACT_ADDRESS_ETH, 6),
+    "USDT": (USDT_CONTRACT_ADDRESS_ETH, 6),
+    "BNB": (BNB_CONTRACT_ADDRESS_ETH, 18),
+    "STETH": (STETH_CONTRACT_ADDRESS_ETH, 18),
+    "WSTETH": (WSTETH_CONTRACT_ADDRESS_ETH, 18),
+    "PEPE": (PEPE_CONTRACT_ADDRESS_ETH, 18),
+    "SHIB": (SHIB_CONTRACT_ADDRESS_ETH, 18),
+    "USDS": (USDS_CONTRACT_ADDRESS_ETH, 18),
+    "SUSDS": (SUSDS_CONTRACT_ADDRESS_ETH, 18),
+    "SUSDE": (SUSDE_CONTRACT_ADDRESS_ETH, 18),
+    "SKY": (SKY_CONTRACT_ADDRESS_ETH, 18),
+}
@@ -9,6 +9,8 @@ from dataset.constants import (
     MORPHO_STEAKHOUSE_USDC_VAULT_ADDRESS_ETH
 )
 from evaluate_utils.morpho_util import morpho_contract
+from evaluate_utils.balance_util import read_all
+from evaluate_utils.abi_registry import load_abi
 
 # 初始化 web3 和账户
 w3 = Web3(HTTPProvider(RPC_URL))
@@ -20,15 +22,7 @@ MORPHO = Web3.to_checksum_address(MORPHO_CONTRACT_ADDRESS_ETH)
 USDC = Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI，仅需 balanceOf
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # Get WETH contract instance
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
@@ -38,9 +32,11 @@ steakhouse_vault_contract = w3.eth.contract(address=steakhouse_vault_addr, abi=E
 
 async def get_balances():
     # Get wallet USDC balance
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    # Get Steakhouse USDC Vault contract USDC balance
-    steakhouse_usdc_balance = steakhouse_vault_contract.functions.balanceOf(addr).call()
+    usdc_balance, steakhouse_usdc_balance = read_all(w3, [
+        usdc_contract.functions.balanceOf(addr),
+        # Get Steakhouse USDC Vault contract USDC balance
+        steakhouse_vault_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Current wallet address ({addr}) USDC balance:\n"
         f"- {usdc_balance / 1e6} USDC\n\n"
@@ -2,6 +2,7 @@ from dataset.constants import ACROSS_PROTOCOL_ADDRESS_ETH, WETH_CONTRACT_ADDRESS
 
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80" #the first default anvil account
@@ -17,9 +18,11 @@ weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    weth_balance_across = weth_contract.functions.balanceOf(ACROSS).call()
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
+    eth_balance, weth_balance_across, weth_balance = read_all(w3, [
+        eth_balance_of(addr),
+        weth_contract.functions.balanceOf(ACROSS),
+        weth_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Balances:\n"
         f"{eth_balance / 10**18} ETH in wallet\n"
@@ -8,6 +8,8 @@ from dataset.constants import (
     USDT_CONTRACT_ADDRESS_ETH,
 )
 from evaluate_utils.morpho_util import morpho_contract
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 # Lido相关合约地址
 STETH_CONTRACT_ADDRESS = "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84"
@@ -27,26 +29,10 @@ WSTETH = Web3.to_checksum_address(WSTETH_CONTRACT_ADDRESS)
 LIDO = Web3.to_checksum_address(LIDO_STAKING_ADDRESS)
 
 # ERC20 ABI，仅需 balanceOf
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
-# stETH ABI, 只需totalSupply
-STETH_ABI = ERC20_ABI + [
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "totalSupply",
-        "outputs": [{"name": "", "type": "uint256"}],
-        "type": "function"
-    }
-]
+# stETH ABI, 只需totalSupply (已包含在 ERC20 ABI 中)
+STETH_ABI = ERC20_ABI
 
 # wstETH ABI, 只需balanceOf
 WSTETH_ABI = ERC20_ABI
@@ -59,21 +45,24 @@ wsteth_contract = w3.eth.contract(address=WSTETH, abi=WSTETH_ABI)
 
 async def get_balances():
     # 获取WETH和USDT余额
-    wallet_weth = weth_contract.functions.balanceOf(addr).call()
-    morpho_weth = weth_contract.functions.balanceOf(MORPHO).call()
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    morpho_usdt_balance = usdt_contract.functions.balanceOf(MORPHO).call()
+    wallet_weth, morpho_weth, usdt_balance, morpho_usdt_balance = read_all(w3, [
+        weth_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(MORPHO),
+        usdt_contract.functions.balanceOf(addr),
+        usdt_contract.functions.balanceOf(MORPHO),
+    ])
 
     # 获取Morpho position
     market_id = '0xb8fc70e82bc5bb53e773626fcc6a23f7eefa036918d7ef216ecfb1950a94a85e'
-    supply_shares, borrow_shares, collateral = morpho_contract.functions.position(market_id, addr).call()
-
-    # 获取stETH和wstETH余额
-    steth_balance = steth_contract.functions.balanceOf(addr).call()
-    wsteth_balance = wsteth_contract.functions.balanceOf(addr).call()
-    # 查询Lido合约中的WETH余额
-    lido_weth_balance = weth_contract.functions.balanceOf(LIDO).call()
-    lido_eth_balance = w3.eth.get_balance(LIDO)
+    (supply_shares, borrow_shares, collateral), steth_balance, wsteth_balance, lido_weth_balance, lido_eth_balance = read_all(w3, [
+        morpho_contract.functions.position(market_id, addr),
+        # 获取stETH和wstETH余额
+        steth_contract.functions.balanceOf(addr),
+        wsteth_contract.functions.balanceOf(addr),
+        # 查询Lido合约中的WETH余额
+        weth_contract.functions.balanceOf(LIDO),
+        eth_balance_of(LIDO),
+    ])
 
     # English comments for new Lido/stETH/wstETH info
     return (
@@ -3,6 +3,7 @@ from eth_account import Account
 import json
 import math
 from pathlib import Path
+from evaluate_utils.abi_registry import load_abi
 
 ###############################################################################
 # Environment parameters – please modify according to your setup
@@ -26,14 +27,9 @@ PRICE_BAND  = 0.01                              # tick ±1 % width
 ###############################################################################
 # Load ABIs (only necessary fragments to reduce script size)
 ###############################################################################
-script_dir = Path(__file__).parent
-abi_dir = script_dir.parent.parent.parent / "abi"
-with open(abi_dir / "uniswap_v3_pool_abi.json") as f:
-    POOL_ABI = json.load(f)
-with open(abi_dir / "uniswap_v3_npm_abi.json") as f:
-    NPM_ABI = json.load(f)
-with open(abi_dir / "erc20_abi.json") as f:
-    ERC20_ABI = json.load(f)
+POOL_ABI = load_abi("uniswap_v3_pool")
+NPM_ABI = load_abi("uniswap_v3_npm")
+ERC20_ABI = load_abi("erc20")
 
 ###############################################################################
 # Utility: Tick ↔ Price conversion
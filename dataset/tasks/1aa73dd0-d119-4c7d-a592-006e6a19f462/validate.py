@@ -8,6 +8,8 @@ from dataset.constants import (
     RPC_URL,
     PRIVATE_KEY
 )
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 w3 = Web3(HTTPProvider(RPC_URL))
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
@@ -19,15 +21,7 @@ POOL = Web3.to_checksum_address(UNISWAP_V3_POOL_ADDRESS_WETH_USDC)
 NPM = Web3.to_checksum_address("0xC36442b4a4522E871399CD717aBDD847Ab11FE88")  # NonfungiblePositionManager
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # ERC721 ABI for NFT balance
 ERC721_ABI = [
@@ -82,12 +76,10 @@ async def get_nft_positions():
             return "No NFT liquidity positions"
         
         positions_info = []
-        for i in range(nft_balance):
-            # Get token ID of the i-th NFT
-            token_id = npm_contract.functions.tokenOfOwnerByIndex(addr, i).call()
-            
-            # Get position info for this NFT
-            position = npm_contract.functions.positions(token_id).call()
+        # Get token IDs of all NFTs, then all position infos, one batched read each
+        token_ids = read_all(w3, [npm_contract.functions.tokenOfOwnerByIndex(addr, i) for i in range(nft_balance)])
+        positions = read_all(w3, [npm_contract.functions.positions(token_id) for token_id in token_ids])
+        for token_id, position in zip(token_ids, positions):
             
             # Parse position info
             nonce, operator, token0, token1, fee, tick_lower, tick_upper, liquidity, fee_growth_0, fee_growth_1, tokens_owed_0, tokens_owed_1 = position
@@ -122,14 +114,16 @@ async def get_nft_positions():
         return f"Failed to get NFT position info: {str(e)}"
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    # Get USDC balance
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    # Get WETH balance
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
-    # Get pool balances
-    pool_weth_balance = weth_contract.functions.balanceOf(POOL).call()
-    pool_usdc_balance = usdc_contract.functions.balanceOf(POOL).call()
+    eth_balance, usdc_balance, weth_balance, pool_weth_balance, pool_usdc_balance = read_all(w3, [
+        eth_balance_of(addr),
+        # Get USDC balance
+        usdc_contract.functions.balanceOf(addr),
+        # Get WETH balance
+        weth_contract.functions.balanceOf(addr),
+        # Get pool balances
+        weth_contract.functions.balanceOf(POOL),
+        usdc_contract.functions.balanceOf(POOL),
+    ])
     
     # Get NFT position info
     nft_positions = await get_nft_positions()
@@ -2,6 +2,7 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDT_CONTRACT_ADDRESS_ETH, WETH_CONTRACT_ADDRESS_ETH, RPC_URL, PRIVATE_KEY
 from evaluate_utils.aave_v3_util import get_aave_info
+from evaluate_utils.abi_registry import load_abi
 
 
 w3 = Web3(HTTPProvider(RPC_URL))
@@ -11,15 +12,7 @@ addr = account.address
 USDT = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdt_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 weth_contract = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
@@ -4,6 +4,8 @@ task: send 10 USDT from Address0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266A to Ad
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDT_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 RPC_URL = "http://127.0.0.1:8545"
@@ -16,23 +18,17 @@ receiver_addr = Web3.to_checksum_address("0xAd4C0379544aE7efd56F2B58c7ffcfD63A1c
 USDT  = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdc_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance_sender = w3.eth.get_balance(addr)
-    usdc_balance_sender = usdc_contract.functions.balanceOf(addr).call()
-    usdc_balance_receiver = usdc_contract.functions.balanceOf(receiver_addr).call()
+    eth_balance_sender, usdc_balance_sender, usdc_balance_receiver = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(addr),
+        usdc_contract.functions.balanceOf(receiver_addr),
+    ])
     return (
         f"Balances of sender:\n"
         f"{eth_balance_sender / 10**18} ETH\n"
@@ -10,11 +10,12 @@ Stake 0.5 ETH 到 Lido（EIP-1559 交易）
 
 import os, json, time
 from decimal import Decimal
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from dataset.constants import RPC_URL
+from evaluate_utils.rpc_util import get_web3
 from eth_account.signers.local import LocalAccount
 def main():
     # 参考 swap.py 的用法
-    RPC_URL =  "http://127.0.0.1:8545"
 
     PRIVATE_KEY = os.getenv(
         "PRIV_KEY",
@@ -37,7 +38,7 @@ def main():
     ]
     """)
 
-    w3 = Web3(HTTPProvider(RPC_URL))
+    w3 = get_web3(RPC_URL)
     account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
     ACCOUNT = account.address
     print(f"连接到 {RPC_URL}, 使用账户 {ACCOUNT}")
@@ -1,6 +1,8 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import LIDO_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 RPC_URL = "http://127.0.0.1:8545"
@@ -13,24 +15,18 @@ LIDO  = Web3.to_checksum_address(LIDO_CONTRACT_ADDRESS_ETH)
 STETH = Web3.to_checksum_address(LIDO_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # 获取合约实例
 lido_contract = w3.eth.contract(address=LIDO, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    lido_eth_balance = w3.eth.get_balance(LIDO)
-    lido_balance = lido_contract.functions.balanceOf(addr).call()
+    eth_balance, lido_eth_balance, lido_balance = read_all(w3, [
+        eth_balance_of(addr),
+        eth_balance_of(LIDO),
+        lido_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Balances:\n"
         f"{eth_balance / 10**18} ETH\n"
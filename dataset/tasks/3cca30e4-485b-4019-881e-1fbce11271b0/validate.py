@@ -1,6 +1,8 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # 默认anvil账户
@@ -11,22 +13,16 @@ addr = account.address
 WETH = Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # 获取WETH合约实例
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
+    eth_balance, weth_balance = read_all(w3, [
+        eth_balance_of(addr),
+        weth_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Balance:\n"
         f"{eth_balance / 10**18} ETH\n"
@@ -8,6 +8,7 @@ from dataset.constants import (
 
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # default anvil account
@@ -24,9 +25,11 @@ usdt_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 aave_pool = w3.eth.contract(address=AAVE_POOL, abi=AAVE_V3_POOL_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
+    eth_balance, usdc_balance, usdt_balance = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(addr),
+        usdt_contract.functions.balanceOf(addr),
+    ])
 
     # Query Aave V3 account data
     # getUserAccountData(address user) returns (totalCollateralBase, totalDebtBase, availableBorrowsBase, currentLiquidationThreshold, ltv, healthFactor)
@@ -1,5 +1,7 @@
 from dataset.constants import USDS_CONTRACT_ADDRESS_ETH, RPC_URL, PRIVATE_KEY, USDC_CONTRACT_ADDRESS_ETH
 from web3 import Web3, HTTPProvider
+from evaluate_utils.balance_util import read_all
+from evaluate_utils.abi_registry import load_abi
 
 # 假设本地RPC和账户私钥
 w3 = Web3(HTTPProvider(RPC_URL))
@@ -7,22 +9,16 @@ account = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 
 # ERC20 ABI（只需balanceOf）
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdc = w3.eth.contract(address=Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
 usds = w3.eth.contract(address=Web3.to_checksum_address(USDS_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
 
 async def get_balances():
-    usdc_balance = usdc.functions.balanceOf(addr).call()
-    usds_balance = usds.functions.balanceOf(addr).call()
+    usdc_balance, usds_balance = read_all(w3, [
+        usdc.functions.balanceOf(addr),
+        usds.functions.balanceOf(addr),
+    ])
     return (
         f"当前钱包地址: {addr}\n"
         f"USDC余额: {usdc_balance / 1e6:.6f} USDC\n"
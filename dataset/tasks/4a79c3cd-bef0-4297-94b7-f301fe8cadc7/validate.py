@@ -5,29 +5,13 @@ from dataset.constants import (
 )
 
 from web3 import Web3, HTTPProvider
+from evaluate_utils.abi_registry import load_abi
 
 # USDC 合约地址（Base链）
 USDC_CONTRACT_ADDRESS_BASE = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
 
 # ERC20 ABI（只需 balanceOf 和 decimals 方法）
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function",
-        "stateMutability": "view"
-    },
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "decimals",
-        "outputs": [{"name": "", "type": "uint8"}],
-        "type": "function",
-        "stateMutability": "view"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 w3 = Web3(HTTPProvider(BASE_RPC_URL))
 account = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
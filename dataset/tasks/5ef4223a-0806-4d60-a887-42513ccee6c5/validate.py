@@ -1,6 +1,8 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH, USDC_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 RPC_URL = "http://127.0.0.1:8545"
@@ -13,15 +15,7 @@ WETH  = Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH)
 USDC  = Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # 获取合约实例
 usdc_contract = w3.eth.contract(address=USDC, abi=ERC20_ABI)
@@ -30,9 +24,11 @@ weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance_before = w3.eth.get_balance(addr)
-    usdc_balance_before = usdc_contract.functions.balanceOf(addr).call()
-    weth_balance_before = weth_contract.functions.balanceOf(addr).call()
+    eth_balance_before, usdc_balance_before, weth_balance_before = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Balances:\n"
         f"{eth_balance_before / 10**18} ETH\n"
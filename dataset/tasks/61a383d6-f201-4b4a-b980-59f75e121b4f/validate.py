@@ -1,5 +1,7 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 RPC_URL = "http://127.0.0.1:8545"
@@ -10,19 +12,13 @@ addr = account.address
 receiver_addr = Web3.to_checksum_address("0xAd4C0379544aE7efd56F2B58c7ffcfD63A1cb216")
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 async def get_balances():
-    eth_balance= w3.eth.get_balance(addr)
-    receiver_eth_balance = w3.eth.get_balance(receiver_addr)
+    eth_balance, receiver_eth_balance = read_all(w3, [
+        eth_balance_of(addr),
+        eth_balance_of(receiver_addr),
+    ])
     return (
         f"Balances of origin address:\n"
         f"{eth_balance / 10**18} ETH\n\n"
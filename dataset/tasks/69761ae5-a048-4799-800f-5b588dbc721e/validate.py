@@ -11,6 +11,7 @@ from dataset.constants import (
 
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # default anvil account
@@ -32,15 +33,15 @@ wsteth_contract = w3.eth.contract(address=WSTETH, abi=ERC20_ABI)
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    
-    # Get stWETH balance
-    wsteth_balance = wsteth_contract.functions.balanceOf(addr).call()
-    
-    # Get Lido contract WETH balance
-    lido_weth_balance = weth_contract.functions.balanceOf(LIDO).call()
+    eth_balance, usdc_balance, usdt_balance, wsteth_balance, lido_weth_balance = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(addr),
+        usdt_contract.functions.balanceOf(addr),
+        # Get stWETH balance
+        wsteth_contract.functions.balanceOf(addr),
+        # Get Lido contract WETH balance
+        weth_contract.functions.balanceOf(LIDO),
+    ])
 
     # Query Aave V3 account data
     # getUserAccountData(address user) returns (totalCollateralBase, totalDebtBase, availableBorrowsBase, currentLiquidationThreshold, ltv, healthFactor)
@@ -4,6 +4,8 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDC_CONTRACT_ADDRESS_ETH
 from evaluate_utils.aave_v3_util import get_aave_info
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # 默认anvil账户
@@ -12,24 +14,18 @@ account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 
 # ERC20 ABI for balanceOf
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # USDC合约实例
 usdc_contract = w3.eth.contract(address=Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
 
 async def get_balances():
     # 获取ETH余额
-    eth_balance = w3.eth.get_balance(addr)
-    # 获取USDC余额
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
+    eth_balance, usdc_balance = read_all(w3, [
+        eth_balance_of(addr),
+        # 获取USDC余额
+        usdc_contract.functions.balanceOf(addr),
+    ])
     # 获取Aave账户信息
     aave_info = await get_aave_info(addr)
     return (
@@ -1,6 +1,8 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDC_CONTRACT_ADDRESS_ETH, WETH_CONTRACT_ADDRESS_ETH, USDT_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80" # 默认anvil账户
@@ -13,25 +15,19 @@ USDT = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 USDC = Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdt_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 usdc_contract = w3.eth.contract(address=USDC, abi=ERC20_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
+    eth_balance, usdt_balance, weth_balance, usdc_balance = read_all(w3, [
+        eth_balance_of(addr),
+        usdt_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(addr),
+        usdc_contract.functions.balanceOf(addr),
+    ])
     return (
         f"余额:\n"
         f"{eth_balance / 10**18} ETH\n"
@@ -2,6 +2,8 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH, MORPHO_CONTRACT_ADDRESS_ETH, RPC_URL, PRIVATE_KEY, USDT_CONTRACT_ADDRESS_ETH
 from evaluate_utils.morpho_util import morpho_contract
+from evaluate_utils.balance_util import read_all
+from evaluate_utils.abi_registry import load_abi
 
 # 初始化 web3 和账户
 w3 = Web3(HTTPProvider(RPC_URL))
@@ -13,27 +15,23 @@ MORPHO = Web3.to_checksum_address(MORPHO_CONTRACT_ADDRESS_ETH)
 USDT = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI，仅需 balanceOf
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # 获取WETH合约实例
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 usdt_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 
 async def get_balances():
-    wallet_weth = weth_contract.functions.balanceOf(addr).call()
-    morpho_weth = weth_contract.functions.balanceOf(MORPHO).call()
+    wallet_weth, morpho_weth = read_all(w3, [
+        weth_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(MORPHO),
+    ])
     market_id = '0xb8fc70e82bc5bb53e773626fcc6a23f7eefa036918d7ef216ecfb1950a94a85e'
-    supply_shares, borrow_shares, collateral = morpho_contract.functions.position(market_id, addr).call()
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    morpho_usdt_balance = usdt_contract.functions.balanceOf(MORPHO).call()
+    (supply_shares, borrow_shares, collateral), usdt_balance, morpho_usdt_balance = read_all(w3, [
+        morpho_contract.functions.position(market_id, addr),
+        usdt_contract.functions.balanceOf(addr),
+        usdt_contract.functions.balanceOf(MORPHO),
+    ])
     return (
         f"Current wallet ({addr}) WETH balance:\n"
         f"- {wallet_weth / 1e18} WETH\n"
@@ -2,6 +2,8 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH, BNB_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 # Ethereum RPC URL (local or public node)
 ETH_RPC_URL = "http://127.0.0.1:8545"
@@ -10,15 +12,7 @@ ETH_RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
 
 # ERC20 ABI (only balanceOf method)
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # Initialize web3 object
 w3 = Web3(HTTPProvider(ETH_RPC_URL))
@@ -33,11 +27,13 @@ bnb_contract = w3.eth.contract(address=Web3.to_checksum_address(BNB_CONTRACT_ADD
 
 async def get_balances():
     # ETH balance
-    eth_balance = w3.eth.get_balance(addr)
-    # WETH balance
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
-    # BNB balance
-    bnb_balance = bnb_contract.functions.balanceOf(addr).call()
+    eth_balance, weth_balance, bnb_balance = read_all(w3, [
+        eth_balance_of(addr),
+        # WETH balance
+        weth_contract.functions.balanceOf(addr),
+        # BNB balance
+        bnb_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Ethereum Mainnet:\n"
         f"ETH Balance: {eth_balance / 10**18} ETH\n"
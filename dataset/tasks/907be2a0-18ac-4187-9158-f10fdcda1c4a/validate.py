@@ -2,6 +2,8 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDT_CONTRACT_ADDRESS_ETH, WETH_CONTRACT_ADDRESS_ETH
 from evaluate_utils.aave_v3_util import get_aave_info
+from evaluate_utils.balance_util import read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 RPC_URL = "http://127.0.0.1:8545"
@@ -13,15 +15,7 @@ addr = account.address
 USDT = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdt_contract = w3.eth.contract(address=USDT, abi=ERC20_ABI)
 weth_contract = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
@@ -29,8 +23,10 @@ weth_contract = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_A
 
 async def get_balances():
     # 获取USDT余额
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
+    usdt_balance, weth_balance = read_all(w3, [
+        usdt_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(addr),
+    ])
     
     aave_info = await get_aave_info(addr)
     
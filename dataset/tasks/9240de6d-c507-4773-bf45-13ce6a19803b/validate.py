@@ -1,6 +1,8 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDT_CONTRACT_ADDRESS_ETH
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80" #the first default anvil account
@@ -10,25 +12,19 @@ addr = account.address
 receiver_addr = Web3.to_checksum_address("0xAd4C0379544aE7efd56F2B58c7ffcfD63A1cb216")
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # USDT 合约地址（主网）
 USDT_ADDRESS = Web3.to_checksum_address(USDT_CONTRACT_ADDRESS_ETH)
 usdt_contract = w3.eth.contract(address=USDT_ADDRESS, abi=ERC20_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    receiver_eth_balance = w3.eth.get_balance(receiver_addr)
-    usdt_balance = usdt_contract.functions.balanceOf(addr).call()
-    receiver_usdt_balance = usdt_contract.functions.balanceOf(receiver_addr).call()
+    eth_balance, receiver_eth_balance, usdt_balance, receiver_usdt_balance = read_all(w3, [
+        eth_balance_of(addr),
+        eth_balance_of(receiver_addr),
+        usdt_contract.functions.balanceOf(addr),
+        usdt_contract.functions.balanceOf(receiver_addr),
+    ])
     return (
         f"Origin address balances:\n"
         f"{eth_balance / 10**18} ETH\n"
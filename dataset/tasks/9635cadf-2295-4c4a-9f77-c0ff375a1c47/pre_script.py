@@ -3,6 +3,7 @@
 
 import os, time, json
 from web3 import Web3
+from evaluate_utils.rpc_util import get_web3
 from eth_account import Account
 from dotenv import load_dotenv
 
@@ -20,7 +21,7 @@ def main():
     # ————————————————————————————————————————————————————————————————
     # 1) 初始化 Web3 & 最简 ERC-20 ABI（只需 balanceOf/decimals）
     # ————————————————————————————————————————————————————————————————
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+    w3 = get_web3(RPC_URL)
 
     ERC20_ABI = json.loads("""[
     {"constant":true,"inputs":[{"name":"owner","type":"address"}],
@@ -9,7 +9,9 @@ Process:
 
 import os, time, json
 from decimal import Decimal
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from dataset.constants import RPC_URL
+from evaluate_utils.rpc_util import get_web3
 from web3.types import (
     TxParams,
 )
@@ -21,7 +23,6 @@ import asyncio
 def main():
     wrap_eth_to_weth(1)
     # ─── Basic Config ────────────────────────────────────────────────────────────────
-    RPC_URL =  "http://127.0.0.1:8545"
     PRIVATE_KEY = os.getenv(
         "PRIV_KEY",
         # Default first Anvil account
@@ -34,7 +35,7 @@ def main():
     PEPE  = Web3.to_checksum_address("0x6982508145454Ce325dDbE47a25d4ec3d2311933")  # PEPE token address
     ROUTER_V2 = Web3.to_checksum_address("0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D")  # Uniswap V2 Router
 
-    w3 = Web3(HTTPProvider(RPC_URL))
+    w3 = get_web3(RPC_URL)
     account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
     addr = account.address
     print(f"Connected to {RPC_URL}, use account {addr}")
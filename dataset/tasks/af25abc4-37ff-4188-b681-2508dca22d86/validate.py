@@ -2,6 +2,7 @@ from dataset.constants import ACROSS_PROTOCOL_ADDRESS_ETH, USDC_CONTRACT_ADDRESS
 
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80" #the first default anvil account
@@ -17,9 +18,11 @@ usdc_contract = w3.eth.contract(address=USDC, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    usdc_balance_across = usdc_contract.functions.balanceOf(ACROSS).call()
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
+    eth_balance, usdc_balance_across, usdc_balance = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(ACROSS),
+        usdc_contract.functions.balanceOf(addr),
+    ])
     return (
         f"Balances:\n"
         f"{eth_balance / 10**18} ETH in wallet\n"
@@ -2,6 +2,8 @@ from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDC_CONTRACT_ADDRESS_ETH, WETH_CONTRACT_ADDRESS_ETH, RPC_URL, PRIVATE_KEY
 from evaluate_utils.aave_v3_util import get_aave_info
+from evaluate_utils.balance_util import read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 w3 = Web3(HTTPProvider(RPC_URL))
@@ -11,23 +13,17 @@ addr = account.address
 USDC = Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdc_contract = w3.eth.contract(address=USDC, abi=ERC20_ABI)
 weth_contract = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
 
 
 async def get_balances():
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
+    usdc_balance, weth_balance = read_all(w3, [
+        usdc_contract.functions.balanceOf(addr),
+        weth_contract.functions.balanceOf(addr),
+    ])
     
     aave_info = await get_aave_info(addr)
     
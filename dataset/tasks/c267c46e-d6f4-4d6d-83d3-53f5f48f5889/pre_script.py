@@ -2,6 +2,7 @@ from web3 import Web3
 from eth_account import Account
 import json
 from pathlib import Path
+from evaluate_utils.abi_registry import load_abi
 
 # Environment variables
 RPC_URL = "http://127.0.0.1:8545"
@@ -14,10 +15,7 @@ USDC = Web3.to_checksum_address("0xA0b86991C6218b36c1d19D4a2e9Eb0cE3606EB48")
 SPENDER_A = Web3.to_checksum_address("0xAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA") # Address A
 
 # Load ABI
-script_dir = Path(__file__).parent
-abi_dir = script_dir.parent / "abi"
-with open(abi_dir / "erc20_abi.json") as f:
-    ERC20_ABI = json.load(f)
+ERC20_ABI = load_abi("erc20")
 
 # Connect to chain and instantiate contract
 w3 = Web3(Web3.HTTPProvider(RPC_URL))
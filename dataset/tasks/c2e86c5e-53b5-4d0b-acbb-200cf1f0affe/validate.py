@@ -2,6 +2,7 @@ from evaluate_utils.aave_v3_util import get_aave_info
 from dataset.constants import PRIVATE_KEY, RPC_URL, USDT_CONTRACT_ADDRESS_ETH, WETH_CONTRACT_ADDRESS_ETH, ERC20_ABI
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import read_all
 
 w3 = Web3(HTTPProvider(RPC_URL))
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
@@ -18,9 +19,11 @@ async def get_balances():
     # Get AAVE info
     aave_info = await get_aave_info(ADDRESS)
     # Get USDT balance
-    usdt_balance = usdt_contract.functions.balanceOf(ADDRESS).call()
-    # Get WETH balance
-    weth_balance = weth_contract.functions.balanceOf(ADDRESS).call()
+    usdt_balance, weth_balance = read_all(w3, [
+        usdt_contract.functions.balanceOf(ADDRESS),
+        # Get WETH balance
+        weth_contract.functions.balanceOf(ADDRESS),
+    ])
     return (
         f"Current wallet balance:\n"
         f"{usdt_balance / 10**6} USDT\n"
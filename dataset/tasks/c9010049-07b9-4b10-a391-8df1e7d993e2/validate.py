@@ -6,6 +6,8 @@ from dataset.constants import (
     UNISWAP_V3_POOL_ADDRESS_WETH_USDC
 )
 import math
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # the first default anvil account
@@ -20,15 +22,7 @@ NPM = Web3.to_checksum_address("0xC36442b4a4522E871399CD717aBDD847Ab11FE88")  #
 
 target_address = Web3.to_checksum_address("0xD117Bd6dE83e3F14265a3CE2BEEE6bd69d29eC7E")
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # Pool ABI for getting current price
 POOL_ABI = [
@@ -146,12 +140,10 @@ async def get_nft_positions(addr = addr):
             return f"No NFT liquidity positions for {addr}\nCurrent Pool Price: {usdc_per_weth:.2f} USDC/WETH"
         
         positions_info = []
-        for i in range(nft_balance):
-            # Get token ID of the i-th NFT
-            token_id = npm_contract.functions.tokenOfOwnerByIndex(addr, i).call()
-            
-            # Get position info for this NFT
-            position = npm_contract.functions.positions(token_id).call()
+        # Get token IDs of all NFTs, then all position infos, one batched read each
+        token_ids = read_all(w3, [npm_contract.functions.tokenOfOwnerByIndex(addr, i) for i in range(nft_balance)])
+        positions = read_all(w3, [npm_contract.functions.positions(token_id) for token_id in token_ids])
+        for token_id, position in zip(token_ids, positions):
             
             # Parse position info
             nonce, operator, token0, token1, fee, tick_lower, tick_upper, liquidity, fee_growth_0, fee_growth_1, tokens_owed_0, tokens_owed_1 = position
@@ -218,14 +210,16 @@ async def get_nft_positions(addr = addr):
         return f"Failed to get NFT position info: {str(e)}"
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    # Get USDC balance
-    usdc_balance = usdc_contract.functions.balanceOf(addr).call()
-    # Get WETH balance
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
-    # Get pool balances
-    pool_weth_balance = weth_contract.functions.balanceOf(POOL).call()
-    pool_usdc_balance = usdc_contract.functions.balanceOf(POOL).call()
+    eth_balance, usdc_balance, weth_balance, pool_weth_balance, pool_usdc_balance = read_all(w3, [
+        eth_balance_of(addr),
+        # Get USDC balance
+        usdc_contract.functions.balanceOf(addr),
+        # Get WETH balance
+        weth_contract.functions.balanceOf(addr),
+        # Get pool balances
+        weth_contract.functions.balanceOf(POOL),
+        usdc_contract.functions.balanceOf(POOL),
+    ])
     
     # Get NFT position info
     nft_positions = await get_nft_positions(addr = target_address)
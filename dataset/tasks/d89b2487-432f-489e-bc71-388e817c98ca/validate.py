@@ -1,6 +1,7 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH, PENDLE_YT_ADDRESS, ERC20_ABI
+from evaluate_utils.balance_util import eth_balance_of, read_all
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # 默认anvil账户
@@ -15,9 +16,11 @@ weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
 yt_contract = w3.eth.contract(address=YT, abi=ERC20_ABI)
 
 async def get_balances():
-    eth_balance = w3.eth.get_balance(addr)
-    weth_balance = weth_contract.functions.balanceOf(addr).call()
-    yt_balance = yt_contract.functions.balanceOf(addr).call()
+    eth_balance, weth_balance, yt_balance = read_all(w3, [
+        eth_balance_of(addr),
+        weth_contract.functions.balanceOf(addr),
+        yt_contract.functions.balanceOf(addr),
+    ])
     return (
         f"余额:\n"
         f"{eth_balance / 10**18} ETH\n"
@@ -1,6 +1,7 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import WETH_CONTRACT_ADDRESS_ETH, AAVE_POOL_ADDRESS_ETH
+from evaluate_utils.abi_registry import load_abi
 
 RPC_URL = "http://127.0.0.1:8545"
 PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"  # the first default anvil account
@@ -11,18 +12,7 @@ SPENDER_A = Web3.to_checksum_address(AAVE_POOL_ADDRESS_ETH)
 WETH = Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI with allowance function
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [
-            {"name": "_owner", "type": "address"},
-            {"name": "_spender", "type": "address"}
-        ],
-        "name": "allowance",
-        "outputs": [{"name": "", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # Get contract instance for WETH
 weth_contract = w3.eth.contract(address=WETH, abi=ERC20_ABI)
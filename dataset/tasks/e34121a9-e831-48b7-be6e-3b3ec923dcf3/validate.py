@@ -1,5 +1,7 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
+from evaluate_utils.balance_util import eth_balance_of, read_all
+from evaluate_utils.abi_registry import load_abi
 
 
 
@@ -13,23 +15,17 @@ receiver_addr = Web3.to_checksum_address("0xAd4C0379544aE7efd56F2B58c7ffcfD63A1c
 USDC  = Web3.to_checksum_address("0xA0b86991c6218b36c1d19d4a2e9eb0ce3606eb48")
 
 # ERC20 ABI
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 usdc_contract = w3.eth.contract(address=USDC, abi=ERC20_ABI)
 
 
 async def get_balances():
-    eth_balance_sender = w3.eth.get_balance(addr)
-    usdc_balance_sender = usdc_contract.functions.balanceOf(addr).call()
-    usdc_balance_receiver = usdc_contract.functions.balanceOf(receiver_addr).call()
+    eth_balance_sender, usdc_balance_sender, usdc_balance_receiver = read_all(w3, [
+        eth_balance_of(addr),
+        usdc_contract.functions.balanceOf(addr),
+        usdc_contract.functions.balanceOf(receiver_addr),
+    ])
     return (
         f"Balances of sender:\n"
         f"{eth_balance_sender / 10**18} ETH\n"
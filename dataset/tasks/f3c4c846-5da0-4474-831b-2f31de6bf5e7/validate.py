@@ -1,6 +1,7 @@
 from web3 import Web3, HTTPProvider
 from eth_account.signers.local import LocalAccount
 from dataset.constants import PEPE_CONTRACT_ADDRESS_ETH, RPC_URL, PRIVATE_KEY
+from evaluate_utils.abi_registry import load_abi
 
 w3 = Web3(HTTPProvider(RPC_URL))
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
@@ -9,18 +10,7 @@ SPENDER_A = Web3.to_checksum_address("0xAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
 PEPE = Web3.to_checksum_address(PEPE_CONTRACT_ADDRESS_ETH)
 
 # ERC20 ABI with only allowance function
-ERC20_ABI = [
-    {
-        "constant": True,
-        "inputs": [
-            {"name": "_owner", "type": "address"},
-            {"name": "_spender", "type": "address"}
-        ],
-        "name": "allowance",
-        "outputs": [{"name": "", "type": "uint256"}],
-        "type": "function"
-    }
-]
+ERC20_ABI = load_abi("erc20")
 
 # Get PEPE contract instance
 pepe_contract = w3.eth.contract(address=PEPE, abi=ERC20_ABI)
@@ -0,0 +1,191 @@
+"""
+Token budget for agent conversations.
+
+Before each call GeneralLLM fits the conversation into the model's context window locally instead
+of waiting for the provider to reject it:
+
+1. old tool outputs (outside the most recent turns) are cut down to their head and tail, oldest first;
+2. if that is not enough, the oldest whole turns are dropped. A turn is an assistant message with
+   the tool results answering it, so tool_use / tool_result (tool_calls / tool) pairs stay together.
+
+The first message (instructions and question) and the most recent turns are always kept. Token
+counts use tiktoken for OpenAI-family models when it is installed and a character estimate
+otherwise, cached per message object.
+"""
+import json
+import os
+from typing import Any, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Context windows by model name prefix, checked in order; unknown models are only trimmed
+# after the provider has rejected a request
+CONTEXT_WINDOWS = [
+    ("gpt-4.1", 1_047_576),
+    ("gpt-4o", 128_000),
+    ("o1", 200_000),
+    ("o3", 200_000),
+    ("o4", 200_000),
+    ("claude", 200_000),
+    ("deepseek", 128_000),
+    ("grok-3", 131_072),
+    ("gemini", 1_048_576),
+]
+# Estimates are approximate, keep this fraction of the window free
+SAFETY_MARGIN = 0.1
+# Characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 3.5
+# Per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+# Turns at the end of the conversation that are never trimmed
+KEEP_RECENT_TURNS = 2
+# Size of a trimmed tool output: head and tail of this many characters each
+TRIMMED_EDGE_CHARS = 600
+# Each retry after a length error shrinks the budget to this fraction of the conversation size
+SHRINK_FACTOR = 0.75
+
+_TRIM_MARKER = "\n[... {count} characters of earlier tool output trimmed ...]\n"
+
+
+def context_window(model_name: str) -> Optional[int]:
+    name = model_name.rsplit("/", 1)[-1]
+    for prefix, window in CONTEXT_WINDOWS:
+        if name.startswith(prefix):
+            return window
+    return None
+
+
+def _field(message: Any, name: str) -> Any:
+    if isinstance(message, dict):
+        return message.get(name)
+    return getattr(message, name, None)
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(exclude_none=True)
+    return json.dumps(value, default=lambda item: item.model_dump(exclude_none=True) if hasattr(item, "model_dump") else str(item))
+
+
+def _is_tool_result(message: Any) -> bool:
+    """OpenAI role=tool messages and Anthropic user messages carrying tool_result blocks."""
+    if _field(message, "role") == "tool":
+        return True
+    content = _field(message, "content")
+    return isinstance(content, list) and any(isinstance(block, dict) and block.get("type") == "tool_result" for block in content)
+
+
+def _trim_text(text: str) -> str:
+    if len(text) <= 2 * TRIMMED_EDGE_CHARS + len(_TRIM_MARKER) + 16:
+        return text
+    removed = len(text) - 2 * TRIMMED_EDGE_CHARS
+    return text[:TRIMMED_EDGE_CHARS] + _TRIM_MARKER.format(count=removed) + text[-TRIMMED_EDGE_CHARS:]
+
+
+def _trim_tool_result(message: dict[str, Any]) -> dict[str, Any]:
+    """A copy of a tool result message with its output cut to head and tail."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return {**message, "content": _trim_text(content)}
+    blocks = []
+    for block in content or []:
+        if isinstance(block, dict) and block.get("type") == "tool_result" and isinstance(block.get("content"), str):
+            block = {**block, "content": _trim_text(block["content"])}
+        blocks.append(block)
+    return {**message, "content": blocks}
+
+
+class ContextBudget:
+    def __init__(self, provider: str, model_name: str, max_output_tokens: int, budget_tokens: Optional[int] = None):
+        self.provider = provider
+        self.model_name = model_name
+        if budget_tokens is None and os.getenv("LLM_CONTEXT_BUDGET"):
+            budget_tokens = int(os.environ["LLM_CONTEXT_BUDGET"])
+        if budget_tokens is None:
+            window = context_window(model_name)
+            if window is not None:
+                budget_tokens = int(window * (1 - SAFETY_MARGIN)) - max_output_tokens
+        self.budget_tokens = budget_tokens
+        self.trimmed = 0
+        self.dropped = 0
+        # id(message) -> (message, tokens); the message is kept so the id cannot be reused
+        self._counts: dict[int, tuple[Any, int]] = {}
+        self._encoding = self._load_encoding()
+
+    def _load_encoding(self) -> Any:
+        if tiktoken is None or self.provider == "anthropic" or "claude" in self.model_name:
+            return None
+        name = self.model_name.rsplit("/", 1)[-1]
+        try:
+            return tiktoken.encoding_for_model(name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+
+    def count_text(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return int(len(text) / CHARS_PER_TOKEN) + 1
+
+    def count(self, message: Any) -> int:
+        cached = self._counts.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        text = _text(_field(message, "content")) + _text(_field(message, "tool_calls"))
+        tokens = self.count_text(text) + MESSAGE_OVERHEAD_TOKENS
+        self._counts[id(message)] = (message, tokens)
+        return tokens
+
+    def total(self, messages: list[Any], tools: list[dict[str, Any]]) -> int:
+        return sum(self.count(message) for message in messages) + (self.count_text(_text(tools)) if tools else 0)
+
+    def _turn_starts(self, messages: list[Any]) -> list[int]:
+        return [index for index, message in enumerate(messages) if index > 0 and _field(message, "role") == "assistant"]
+
+    def fit(self, messages: list[Any], tools: list[dict[str, Any]]) -> bool:
+        """Trim messages in place to the budget, return False if it cannot be reached."""
+        if self.budget_tokens is None:
+            return True
+        total = self.total(messages, tools)
+        if total <= self.budget_tokens:
+            return True
+        starts = self._turn_starts(messages)
+        # With fewer turns than KEEP_RECENT_TURNS all of them are recent, including the newest tool output
+        protected = starts[-KEEP_RECENT_TURNS] if len(starts) >= KEEP_RECENT_TURNS else (starts[0] if starts else len(messages))
+
+        # Cut old tool outputs, oldest first
+        for index in range(1, protected):
+            message = messages[index]
+            if not isinstance(message, dict) or not _is_tool_result(message):
+                continue
+            trimmed = _trim_tool_result(message)
+            saved = self.count(message) - self.count(trimmed)
+            if saved <= 0:
+                continue
+            messages[index] = trimmed
+            self.trimmed += 1
+            total -= saved
+            if total <= self.budget_tokens:
+                return True
+
+        # Drop the oldest whole turns
+        while total > self.budget_tokens:
+            starts = self._turn_starts(messages)
+            if len(starts) <= KEEP_RECENT_TURNS:
+                return False
+            removed = messages[starts[0]:starts[1]]
+            del messages[starts[0]:starts[1]]
+            self.dropped += 1
+            total -= sum(self.count(message) for message in removed)
+        return True
+
+    def shrink(self, messages: list[Any], tools: list[dict[str, Any]]) -> bool:
+        """After the provider rejected the request for length: lower the budget and refit."""
+        self.budget_tokens = int(min(self.budget_tokens or float("inf"), self.total(messages, tools)) * SHRINK_FACTOR)
+        return self.fit(messages, tools)
@@ -19,7 +19,9 @@ async def get_agent(model_name: str, parameters: dict, *args, **kwargs):
             raise Exception(
                 f"Tool {tool} not found in tools. Available tools: {available_tools.keys()}"
             )
-        selected_tools[tool] = available_tools[tool]()
+        # A leased anvil (parameters["rpc_url"]) is only relevant to the code interpreter
+        tool_kwargs = {"rpc_url": parameters["rpc_url"]} if tool == "code_interpreter" and parameters.get("rpc_url") else {}
+        selected_tools[tool] = available_tools[tool](**tool_kwargs)
 
     provider, model_key = model_name.split("/", 1)
     llm = GeneralLLM(
@@ -0,0 +1,110 @@
+"""
+Latency tracking, circuit breakers and endpoint equivalence for hedged LLM calls.
+
+An endpoint is a (provider, model) pair. GeneralLLM records the latency of every successful
+call per endpoint; once enough samples exist, a call that is still running after the
+configured percentile of recent latencies gets a duplicate on the same or an equivalent
+endpoint, and the first response wins. Endpoints that keep failing are skipped by their
+circuit breaker until a cooldown has passed.
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Number of recent latencies kept per endpoint, and needed before hedging starts
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+# Consecutive failures that open a breaker, and how long it stays open
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 30.0
+MAX_COOLDOWN_SECONDS = 600.0
+
+Endpoint = tuple[str, str]
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency below which `percentile`% of recent calls finished, None until there are enough samples."""
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Closed until FAILURE_THRESHOLD consecutive failures, then open for a cooldown.
+
+    After the cooldown calls are let through again (half-open); one more failure re-opens the
+    breaker with a doubled cooldown, a success closes it.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.cooldown = COOLDOWN_SECONDS
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._open_until
+
+    @property
+    def is_open(self) -> bool:
+        return not self.allow()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.cooldown = COOLDOWN_SECONDS
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures < FAILURE_THRESHOLD:
+                return
+            now = time.monotonic()
+            if self.failures > FAILURE_THRESHOLD:
+                # Failed again after a cooldown
+                self.cooldown = min(MAX_COOLDOWN_SECONDS, self.cooldown * 2)
+            self._open_until = now + self.cooldown
+
+
+_trackers: dict[Endpoint, LatencyTracker] = {}
+_breakers: dict[Endpoint, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def latency_tracker(provider: str, model_name: str) -> LatencyTracker:
+    with _registry_lock:
+        return _trackers.setdefault((provider, model_name), LatencyTracker())
+
+
+def circuit_breaker(provider: str, model_name: str) -> CircuitBreaker:
+    with _registry_lock:
+        return _breakers.setdefault((provider, model_name), CircuitBreaker())
+
+
+def equivalent_endpoints(provider: str, model_name: str) -> list[Endpoint]:
+    """
+    Other endpoints serving the same model with the same (OpenAI-compatible) response format.
+
+    OpenAI models are also served by OpenRouter under "openai/<model>" and the other way round.
+    Anthropic's native API returns a different message format, so it only hedges against itself.
+    """
+    if provider == "openai":
+        return [("openrouter", f"openai/{model_name}")]
+    if provider == "openrouter" and model_name.startswith("openai/"):
+        return [("openai", model_name.removeprefix("openai/"))]
+    return []
@@ -1,18 +1,20 @@
 import asyncio
 import json
 import os
+import time
 from abc import ABC, abstractmethod
 import traceback
-from typing import Any
+from typing import Any, Optional
 
-import backoff
-from anthropic import AsyncAnthropic
+from demo.context_budget import ContextBudget
+from demo.llm_cache import CacheMode, LLMCacheMissError, LLMResponseCache, cache_key, default_cache
+from demo.llm_clients import anthropic_client, openai_client
+from demo.hedging import circuit_breaker, equivalent_endpoints, latency_tracker
 from demo.logger import get_logger
-from openai import AsyncOpenAI
+from demo.rate_limiter import MAX_RETRY_SECONDS, classify_error, get_limiter, transient_backoff
 from openai.types.chat import ChatCompletion
 from demo.utils import is_token_limit_error
 from anthropic.types import Message
-import httpx
 provider_args = {
     "openai": {"api_key": os.getenv("OPENAI_API_KEY")},
     "google": {
@@ -55,6 +57,9 @@ provider_args = {
 
 llm_logger = get_logger(__name__)
 
+# Hedging is off unless LLM_HEDGE_PERCENTILE is set, e.g. 95
+HEDGE_PERCENTILE = float(os.environ["LLM_HEDGE_PERCENTILE"]) if os.getenv("LLM_HEDGE_PERCENTILE") else None
+
 
 class LLM(ABC):
     def __init__(self, provider: str, model_name: str):
@@ -63,8 +68,9 @@ class LLM(ABC):
         params = self.get_provider_args()
         if self.provider == "fireworks":
             self.model_name = "accounts/fireworks/models/" + self.model_name
-        self.client = AsyncOpenAI(
-            api_key=params["api_key"], base_url=params.get("base_url")
+        # Shared per (provider, base_url, credentials), see demo/llm_clients.py
+        self.client = openai_client(
+            self.provider, params["api_key"], params.get("base_url")
         )
         # self.provider = provider if provider == "anthropic" else "openai"
 
@@ -103,16 +109,24 @@ class GeneralLLM(LLM):
         model_name: str,
         temperature: float = 0.0,
         max_tokens: int = 8192,
+        cache: Optional[LLMResponseCache] = None,
+        hedge_percentile: Optional[float] = HEDGE_PERCENTILE,
+        context_budget: Optional[int] = None,
     ):
         super().__init__(provider=provider, model_name=model_name)
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # Response cache, configured from LLM_CACHE_MODE when not given
+        self.cache = cache if cache is not None else default_cache()
+        # Duplicate calls that are slower than this percentile of recent latencies, None disables hedging
+        self.hedge_percentile = hedge_percentile
+        self._alternates: Optional[list[GeneralLLM]] = None
+        # Prompt token budget, from LLM_CONTEXT_BUDGET or the model's context window when not given
+        self.context = ContextBudget(provider, model_name, max_tokens, context_budget)
         if provider == "anthropic":
             params = self.get_provider_args()
             proxy_url = "http://127.0.0.1:7890"
-    
-            http_client = httpx.AsyncClient(proxy=proxy_url)
-            self.anthropic_client = AsyncAnthropic(api_key=params["api_key"], http_client=http_client)
+            self.anthropic_client = anthropic_client(params["api_key"], proxy=proxy_url)
 
     async def safe_chat(
         self,
@@ -120,10 +134,12 @@ class GeneralLLM(LLM):
         tools: list[dict[str, Any]] = [],
         ignore_token_error: bool = False,
     ) -> ChatCompletion:
+        # Trim old tool outputs and turns locally before the provider has to reject the request
+        if not self.context.fit(messages, tools):
+            llm_logger.warning(f"Conversation exceeds the context budget of {self.context.budget_tokens} tokens")
         while True:
             try:
-                # Use the retryable chat function with original messages
-                return await self._retryable_chat(messages, tools)
+                return await self._cached_chat(messages, tools)
             except Exception as e:
                 error_str = str(e).lower()
 
@@ -131,49 +147,174 @@ class GeneralLLM(LLM):
                 if is_token_limit_error(error_str):
                     if ignore_token_error:
                         raise Exception(f"Token limit error: {str(e)}")
-                    if len(messages) > 2:
-                        llm_logger.warning(
-                            f"Too long, removing oldest message pair. {len(messages)}"
-                        )
-                        messages.pop(1)
-                        continue
-                    else:
+                    size = self.context.total(messages, tools)
+                    fitted = self.context.shrink(messages, tools)
+                    if not fitted and self.context.total(messages, tools) >= size:
                         raise Exception(
                             f"Cannot reduce message context Any further: {str(e)}"
                         )
+                    llm_logger.warning(
+                        f"Too long, trimmed context to {self.context.budget_tokens} tokens "
+                        f"({self.context.trimmed} tool outputs trimmed, {self.context.dropped} turns dropped)"
+                    )
+                    continue
 
                 raise
 
-    @backoff.on_exception(
-        backoff.expo,
-        Exception,
-        max_tries=None,
-        max_value=150,
-        max_time=1200,  # Maximum backoff time in seconds
-        jitter=backoff.full_jitter,  # Add jitter to avoid thundering herd
-        giveup=lambda e: is_token_limit_error(
-            str(e).lower()
-        ),  # Use the shared function
-    )
+    async def _cached_chat(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
+    ) -> ChatCompletion|Message:
+        if self.cache is None:
+            return await self._retryable_chat(messages, tools)
+        key = cache_key(
+            self.provider,
+            self.model_name,
+            messages,
+            tools,
+            {"temperature": self.temperature, "max_tokens": self.max_tokens},
+        )
+        if self.cache.reads:
+            cached = await self.cache.async_get(key, self.provider)
+            if cached is not None:
+                return cached
+            if self.cache.mode == CacheMode.REPLAY:
+                raise LLMCacheMissError(
+                    f"No cached response for {self.provider}/{self.model_name} request {key[:16]}"
+                )
+        response = await self._retryable_chat(messages, tools)
+        if self.cache.writes:
+            await self.cache.async_put(key, self.provider, self.model_name, response)
+        return response
+
     async def _retryable_chat(
         self, messages: list[dict[str, Any]], tools: list[dict[str, Any]]
-    ) -> ChatCompletion:
+    ) -> ChatCompletion|Message:
+        """
+        Run the call through the provider limiter, hedging slow calls when enabled.
+
+        429 / overloaded responses shrink the provider's concurrency window and pause its
+        callers for the retry-after period; connection errors and 5xx are retried with
+        jittered backoff; other errors (bad requests, token limits, auth) are raised at once.
+        """
+        estimated = self.context.total(messages, tools)
+        deadline = time.monotonic() + MAX_RETRY_SECONDS
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_attempt(messages, tools, estimated, attempt)
+            except Exception as e:
+                retryable, congestion, delay = classify_error(e)
+                if not retryable or is_token_limit_error(str(e).lower()) or time.monotonic() >= deadline:
+                    print(f"Error: {e}")
+                    print(traceback.format_exc())
+                    raise
+                if congestion:
+                    # The limiter has already paused the provider for the retry-after period
+                    delay = 0
+                    llm_logger.warning(f"{self.provider} rate limited, retrying ({get_limiter(self.provider).stats()})")
+                else:
+                    delay = delay if delay is not None else transient_backoff(attempt)
+                    llm_logger.warning(f"{self.provider} request failed ({e}), retrying in {delay:.1f}s")
+            attempt += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _attempt(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]], estimated: int, attempt: int
+    ) -> ChatCompletion|Message:
+        """One call on this endpoint, feeding its limiter, circuit breaker and latency tracker."""
+        limiter = get_limiter(self.provider)
+        breaker = circuit_breaker(self.provider, self.model_name)
+        async with limiter.slot(estimated):
+            started = time.monotonic()
+            try:
+                response = await self.chat(messages, tools)
+            except Exception as e:
+                retryable, congestion, delay = classify_error(e)
+                if retryable:
+                    breaker.record_failure()
+                if congestion:
+                    limiter.on_congestion(delay, attempt)
+                raise
+        latency_tracker(self.provider, self.model_name).record(time.monotonic() - started)
+        breaker.record_success()
+        usage = self.convert_usage(getattr(response, "usage", None))
+        limiter.on_success(usage["total_tokens"] - estimated if usage["total_tokens"] else 0)
+        return response
+
+    def _endpoints(self) -> list["GeneralLLM"]:
+        """This endpoint and its equivalents, skipping those whose circuit breaker is open."""
+        if self._alternates is None:
+            self._alternates = [
+                GeneralLLM(provider, model_name, self.temperature, self.max_tokens, cache=self.cache, hedge_percentile=None)
+                for provider, model_name in equivalent_endpoints(self.provider, self.model_name)
+                if provider_args[provider]["api_key"]
+            ]
+        endpoints = [self, *self._alternates]
+        healthy = [llm for llm in endpoints if circuit_breaker(llm.provider, llm.model_name).allow()]
+        return healthy or [self]
+
+    async def _hedged_attempt(
+        self, messages: list[dict[str, Any]], tools: list[dict[str, Any]], estimated: int, attempt: int
+    ) -> ChatCompletion|Message:
+        """
+        Send the call, and a duplicate once it is slower than the hedge percentile of recent calls.
+
+        The duplicate goes to an equivalent endpoint when one is healthy, otherwise to the same
+        endpoint; the first successful response wins and the other call is cancelled.
+        """
+        endpoints = self._endpoints()
+        primary = endpoints[0]
+        hedge_after = None
+        if self.hedge_percentile is not None:
+            hedge_after = latency_tracker(primary.provider, primary.model_name).percentile(self.hedge_percentile)
+        if hedge_after is None:
+            return await primary._attempt(messages, tools, estimated, attempt)
+
+        first = asyncio.ensure_future(primary._attempt(messages, tools, estimated, attempt))
+        pending = {first}
         try:
-            return await self.chat(messages, tools)
-        except Exception as e:
-            print(f"Error: {e}")
-            print(traceback.format_exc())
-            raise
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return first.result()
+            backup = endpoints[1] if len(endpoints) > 1 else primary
+            llm_logger.info(
+                f"Hedging {primary.provider}/{primary.model_name} call after {hedge_after:.1f}s on {backup.provider}/{backup.model_name}"
+            )
+            second = asyncio.ensure_future(backup._attempt(messages, tools, estimated, attempt))
+            pending.add(second)
+            errors: dict[asyncio.Future, BaseException] = {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors[task] = task.exception()
+            # Both calls failed, report the original call's error
+            raise errors.get(first) or errors[second]
+        finally:
+            # Also reached when the caller is cancelled while waiting, so no call is left running
+            for task in pending:
+                task.cancel()
+
+    async def _openai_create(self, **kwargs: Any) -> ChatCompletion:
+        raw = await self.client.chat.completions.with_raw_response.create(**kwargs)
+        get_limiter(self.provider).observe_headers(raw.headers)
+        return raw.parse()
+
+    async def _anthropic_create(self, **kwargs: Any) -> Message:
+        raw = await self.anthropic_client.messages.with_raw_response.create(**kwargs)
+        get_limiter(self.provider).observe_headers(raw.headers)
+        return raw.parse()
 
     async def chat(
         self, messages: list[dict[str, Any]], tools: list[dict[str, Any]] = []
     ) -> ChatCompletion|Message:
         if self.provider == "anthropic":
-            await asyncio.sleep(10)
             if self.model_name == "claude-3-7-sonnet-20250219-thinking":
                 model_name = "claude-3-7-sonnet-20250219"
                 if len(tools) > 0:
-                    return await self.anthropic_client.messages.create(
+                    return await self._anthropic_create(
                         model=model_name,
                         messages=messages,
                         temperature=1,
@@ -182,7 +323,7 @@ class GeneralLLM(LLM):
                         max_tokens=16384,
                     )
                 else:
-                    return await self.anthropic_client.messages.create(
+                    return await self._anthropic_create(
                         model=model_name,
                         messages=messages,
                         temperature=1,
@@ -191,7 +332,7 @@ class GeneralLLM(LLM):
                     )
             else:
                 if len(tools) > 0:
-                    return await self.anthropic_client.messages.create(
+                    return await self._anthropic_create(
                         model=self.model_name,
                         messages=messages,
                         temperature=self.temperature,
@@ -199,7 +340,7 @@ class GeneralLLM(LLM):
                         max_tokens=8192,
                     )
                 else:
-                    return await self.anthropic_client.messages.create(
+                    return await self._anthropic_create(
                         model=self.model_name,
                         messages=messages,
                         temperature=self.temperature,
@@ -214,20 +355,20 @@ class GeneralLLM(LLM):
             "gpt-4.1"
         ]:
             if len(tools) > 0:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model=self.model_name,
                     messages=messages,
                     tools=tools,
                 )
             else:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model=self.model_name,
                     messages=messages,
                 )
 
         if self.model_name == "grok-3-mini-fast-beta-high-reasoning":
             if len(tools) > 0:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model="grok-3-mini-fast-beta",
                     messages=messages,
                     temperature=self.temperature,
@@ -236,7 +377,7 @@ class GeneralLLM(LLM):
                     reasoning_effort="high",
                 )
             else:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model="grok-3-mini-fast-beta",
                     messages=messages,
                     temperature=self.temperature,
@@ -246,7 +387,7 @@ class GeneralLLM(LLM):
 
         if self.model_name == "grok-3-mini-fast-beta-low-reasoning":
             if len(tools) > 0:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model="grok-3-mini-fast-beta",
                     messages=messages,
                     temperature=self.temperature,
@@ -255,7 +396,7 @@ class GeneralLLM(LLM):
                     reasoning_effort="low",
                 )
             else:
-                return await self.client.chat.completions.create(
+                return await self._openai_create(
                     model="grok-3-mini-fast-beta",
                     messages=messages,
                     temperature=self.temperature,
@@ -264,7 +405,7 @@ class GeneralLLM(LLM):
                 )
 
         if len(tools) > 0:
-            return await self.client.chat.completions.create(
+            return await self._openai_create(
                 model=self.model_name,
                 messages=messages,
                 temperature=self.temperature,
@@ -272,7 +413,7 @@ class GeneralLLM(LLM):
                 max_tokens=self.max_tokens,
             )
         else:
-            return await self.client.chat.completions.create(
+            return await self._openai_create(
                 model=self.model_name,
                 messages=messages,
                 temperature=self.temperature,
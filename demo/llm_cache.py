@@ -0,0 +1,178 @@
+"""
+Content-addressed cache for LLM responses.
+
+Responses are keyed by provider, model, the normalized messages, the tool schemas and the
+sampling parameters, and stored in a local SQLite file with size-based LRU eviction.
+GeneralLLM goes through async_get / async_put, which run the SQLite work on a dedicated thread
+so the event loop is never blocked on disk.
+The mode is taken from LLM_CACHE_MODE unless a cache is passed to GeneralLLM explicitly:
+
+- off:          no caching (default)
+- read_through: return cached responses, call the API and store the result on a miss
+- record:       always call the API and store the result
+- replay:       only return cached responses, a miss raises LLMCacheMissError
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import Any, Optional
+
+from anthropic.types import Message
+from openai.types.chat import ChatCompletion
+
+DEFAULT_CACHE_PATH = ".cache/llm_responses.sqlite3"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Evict down to this fraction of max_bytes so eviction does not run on every insert
+EVICT_TO = 0.9
+
+
+class CacheMode(Enum):
+    OFF = "off"
+    READ_THROUGH = "read_through"
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class LLMCacheMissError(Exception):
+    """Raised in replay mode when a request has no cached response."""
+
+
+def _normalize(value: Any) -> Any:
+    """Convert SDK message objects to plain JSON values with a stable layout."""
+    if hasattr(value, "model_dump"):
+        return _normalize(value.model_dump(exclude_none=True))
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def cache_key(provider: str, model_name: str, messages: list[Any], tools: list[dict[str, Any]], sampling: dict[str, Any]) -> str:
+    payload = {
+        "provider": provider,
+        "model": model_name,
+        "messages": _normalize(messages),
+        "tools": _normalize(tools),
+        "sampling": sampling,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed response store shared by every GeneralLLM using the same file."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: CacheMode = CacheMode.READ_THROUGH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets several evaluation processes share one cache file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL, response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        # Running total of stored bytes, recounted when it crosses max_bytes since other processes may
+        # share the file
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # Cache reads and writes from the event loop run here, one at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in (CacheMode.READ_THROUGH, CacheMode.REPLAY)
+
+    @property
+    def writes(self) -> bool:
+        return self.mode in (CacheMode.READ_THROUGH, CacheMode.RECORD)
+
+    def get(self, key: str, provider: str) -> Optional[ChatCompletion | Message]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        response_type = Message if provider == "anthropic" else ChatCompletion
+        return response_type.model_validate_json(row[0])
+
+    async def async_get(self, key: str, provider: str) -> Optional[ChatCompletion | Message]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, key, provider)
+
+    async def async_put(self, key: str, provider: str, model_name: str, response: ChatCompletion | Message) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.put, key, provider, model_name, response)
+
+    def put(self, key: str, provider: str, model_name: str, response: ChatCompletion | Message) -> None:
+        data = response.model_dump_json()
+        now = time.time()
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._size += len(data) - (replaced[0] if replaced else 0)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, response, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model_name, data, len(data), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._size <= self.max_bytes:
+            return
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self._size <= self.max_bytes:
+            return
+        excess = self._size - int(self.max_bytes * EVICT_TO)
+        freed = 0
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self._size -= freed
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_caches: dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: str = DEFAULT_CACHE_PATH, mode: CacheMode = CacheMode.READ_THROUGH, max_bytes: int = DEFAULT_MAX_BYTES) -> LLMResponseCache:
+    """One cache object per file, so hit counters and the connection are shared."""
+    key = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = LLMResponseCache(path, mode, max_bytes)
+        cache.mode = mode
+        return cache
+
+
+def default_cache() -> Optional[LLMResponseCache]:
+    """Cache configured by LLM_CACHE_MODE / LLM_CACHE_PATH / LLM_CACHE_MAX_MB, None when off."""
+    mode = CacheMode(os.getenv("LLM_CACHE_MODE", CacheMode.OFF.value).lower())
+    if mode == CacheMode.OFF:
+        return None
+    max_mb = os.getenv("LLM_CACHE_MAX_MB")
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    return get_cache(os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH), mode, max_bytes)
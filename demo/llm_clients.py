@@ -0,0 +1,99 @@
+"""
+Process-wide registry of LLM SDK clients.
+
+Every GeneralLLM used to create its own AsyncOpenAI (and httpx.AsyncClient + AsyncAnthropic for
+Anthropic), so a run with hundreds of tasks opened hundreds of connection pools. Clients are now
+shared per (provider, base_url, credentials) on top of one tuned connection pool per proxy, using
+HTTP/2 when the `h2` package is installed. httpx connections belong to the event loop that opened
+them, so the registry is kept per running loop; call `close_llm_clients()` before the loop ends.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import weakref
+from typing import Any, Optional
+
+import httpx
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+POOL_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=64, keepalive_expiry=60)
+# Long completions can take minutes; connecting should not
+TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+class _Registry:
+    def __init__(self) -> None:
+        self.http_clients: dict[Optional[str], httpx.AsyncClient] = {}
+        self.sdk_clients: dict[tuple[str, Optional[str], str], Any] = {}
+
+
+_lock = threading.Lock()
+_loop_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Registry]" = weakref.WeakKeyDictionary()
+# Clients created outside of a running loop (e.g. while building an agent synchronously)
+_default_registry = _Registry()
+
+
+def _registry() -> _Registry:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _default_registry
+    registry = _loop_registries.get(loop)
+    if registry is None:
+        registry = _loop_registries[loop] = _Registry()
+    return registry
+
+
+def _credentials(api_key: Optional[str]) -> str:
+    # Only a digest of the key is kept in the registry key
+    return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+
+def _http_client(registry: _Registry, proxy: Optional[str]) -> httpx.AsyncClient:
+    client = registry.http_clients.get(proxy)
+    if client is None or client.is_closed:
+        client = registry.http_clients[proxy] = httpx.AsyncClient(
+            limits=POOL_LIMITS, timeout=TIMEOUT, http2=HTTP2, proxy=proxy
+        )
+    return client
+
+
+def openai_client(provider: str, api_key: Optional[str], base_url: Optional[str] = None) -> AsyncOpenAI:
+    """Shared AsyncOpenAI for an OpenAI-compatible provider; retries are left to the provider limiter."""
+    key = (provider, base_url, _credentials(api_key))
+    with _lock:
+        registry = _registry()
+        client = registry.sdk_clients.get(key)
+        if client is None or client.is_closed():
+            client = registry.sdk_clients[key] = AsyncOpenAI(
+                api_key=api_key, base_url=base_url, max_retries=0, http_client=_http_client(registry, None)
+            )
+        return client
+
+
+def anthropic_client(api_key: Optional[str], proxy: Optional[str] = None) -> AsyncAnthropic:
+    """Shared AsyncAnthropic, one per (credentials, proxy)."""
+    key = ("anthropic", proxy, _credentials(api_key))
+    with _lock:
+        registry = _registry()
+        client = registry.sdk_clients.get(key)
+        if client is None or client.is_closed():
+            client = registry.sdk_clients[key] = AsyncAnthropic(
+                api_key=api_key, max_retries=0, http_client=_http_client(registry, proxy)
+            )
+        return client
+
+
+async def close_llm_clients() -> None:
+    """Close the shared connection pools of the running loop (and those created outside a loop)."""
+    with _lock:
+        registries = [_registry(), _default_registry]
+        clients = [client for registry in registries for client in registry.http_clients.values()]
+        for registry in registries:
+            registry.http_clients.clear()
+            registry.sdk_clients.clear()
+    for client in clients:
+        await client.aclose()
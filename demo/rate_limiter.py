@@ -0,0 +1,234 @@
+"""
+Per-provider scheduler for LLM calls.
+
+Every provider gets one ProviderLimiter shared by all GeneralLLM instances. It keeps
+request-per-minute and token-per-minute buckets, syncs them with the rate-limit headers
+of each response, and runs an AIMD concurrency window: the window grows by one after a
+window's worth of successful calls and halves on a 429 / overloaded response, when all
+callers also pause until the provider's retry-after has passed.
+
+Budgets can be given with LLM_RPM_<PROVIDER> / LLM_TPM_<PROVIDER> (e.g. LLM_RPM_OPENAI=500),
+otherwise they are learned from the response headers.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Mapping, Optional
+
+import anthropic
+import openai
+
+INITIAL_CONCURRENCY = 8
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+# Polling interval while waiting for a free slot in the window
+POLL_SECONDS = 0.05
+# Backoff for transient errors (connection errors, 5xx) and 429s without retry-after
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Give up retrying a call after this long, as the previous backoff did
+MAX_RETRY_SECONDS = 1200.0
+# Status codes that mean the provider is saturated, 529 is Anthropic's "overloaded"
+CONGESTION_STATUS = {429, 529}
+RETRYABLE_STATUS = {408, 409}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """OpenAI reset durations such as "1s", "6m0s", "20ms"."""
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds until a reset header (duration or RFC 3339 timestamp) expires."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    duration = _parse_duration(value)
+    if duration is not None:
+        return duration
+    try:
+        return max(0.0, datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def _header_int(headers: Mapping[str, str], *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                continue
+    return None
+
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return _parse_reset(headers.get("retry-after"))
+
+
+class ProviderLimiter:
+    def __init__(self, provider: str, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.provider = provider
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = float(INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._refilled = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take a slot and return 0, or return how long to wait before trying again."""
+        now = time.monotonic()
+        if now < self._resume_at:
+            return self._resume_at - now
+        if self.in_flight >= int(self.window):
+            return POLL_SECONDS
+        self._refill(now)
+        if self.rpm and self._requests < 1:
+            return (1 - self._requests) * 60 / self.rpm
+        # A prompt larger than the whole bucket waits for a full bucket instead of forever
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        if self.tpm and self._tokens < tokens:
+            return (tokens - self._tokens) * 60 / self.tpm
+        if self.rpm:
+            self._requests -= 1
+        if self.tpm:
+            self._tokens -= tokens
+        self.in_flight += 1
+        return 0.0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[None]:
+        while True:
+            with self._lock:
+                wait = self._try_acquire(tokens)
+            if wait <= 0:
+                break
+            await asyncio.sleep(min(wait, 1.0))
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Sync the budgets with the provider's view from OpenAI or Anthropic rate-limit headers."""
+        request_limit = _header_int(headers, "x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit")
+        request_remaining = _header_int(headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")
+        token_limit = _header_int(headers, "x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit")
+        token_remaining = _header_int(headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")
+        with self._lock:
+            self._refill(time.monotonic())
+            if request_limit:
+                if not self.rpm:
+                    self._requests = float(request_limit)
+                self.rpm = request_limit
+            if token_limit:
+                if not self.tpm:
+                    self._tokens = float(token_limit)
+                self.tpm = token_limit
+            if request_remaining is not None and self.rpm:
+                self._requests = min(self._requests, float(request_remaining))
+            if token_remaining is not None and self.tpm:
+                self._tokens = min(self._tokens, float(token_remaining))
+            # An exhausted budget pauses everyone until it resets
+            for remaining, reset in (
+                (request_remaining, headers.get("x-ratelimit-reset-requests") or headers.get("anthropic-ratelimit-requests-reset")),
+                (token_remaining, headers.get("x-ratelimit-reset-tokens") or headers.get("anthropic-ratelimit-tokens-reset")),
+            ):
+                seconds = _parse_reset(reset)
+                if remaining == 0 and seconds:
+                    self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def on_success(self, token_correction: int = 0) -> None:
+        """Additive increase, and charge the difference between the estimated and actual tokens."""
+        with self._lock:
+            self.window = min(float(MAX_CONCURRENCY), self.window + 1 / max(self.window, 1.0))
+            if self.tpm:
+                self._tokens -= token_correction
+
+    def on_congestion(self, delay: Optional[float], attempt: int) -> float:
+        """Multiplicative decrease and a shared pause, returns how long the caller should wait."""
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        with self._lock:
+            self.rate_limited += 1
+            self.window = max(1.0, self.window / 2)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "window": round(self.window, 2),
+                "in_flight": self.in_flight,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "rate_limited": self.rate_limited,
+            }
+
+
+def classify_error(error: Exception) -> tuple[bool, bool, Optional[float]]:
+    """(retryable, congestion, retry-after seconds) for an SDK exception."""
+    if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError)):
+        return True, False, None
+    status = getattr(error, "status_code", None)
+    if status is None:
+        return False, False, None
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if status in CONGESTION_STATUS:
+        return True, True, retry_after(headers)
+    if status in RETRYABLE_STATUS or status >= 500:
+        return True, False, retry_after(headers)
+    return False, False, None
+
+
+def transient_backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm = os.getenv(f"LLM_RPM_{provider.upper()}")
+            tpm = os.getenv(f"LLM_TPM_{provider.upper()}")
+            limiter = _limiters[provider] = ProviderLimiter(provider, int(rpm) if rpm else None, int(tpm) if tpm else None)
+        return limiter
@@ -3,9 +3,11 @@ import asyncio
 import json
 import os
 from datetime import datetime
+from typing import Optional
 
 from demo.agent import agent_logger
 from demo.get_agent import get_agent
+from demo.llm_clients import close_llm_clients
 from demo.tools import tool_logger
 from tqdm.asyncio import tqdm
 from pydantic import BaseModel
@@ -16,10 +18,11 @@ class InputQuestion(BaseModel):
     task_id:str
 
 from evaluate_module.schemas import QuestionData
-from web3 import Web3, HTTPProvider
+from evaluate_module.anvil_pool import AnvilPool
 from dataset.constants import RPC_URL
+from evaluate_utils.rpc_util import get_web3, run_sync
 
-w3 = Web3(HTTPProvider(RPC_URL)) 
+w3 = get_web3(RPC_URL)
 
 
 
@@ -42,7 +45,11 @@ async def run_tests_parallel(
 
     tasks = [process_question(question.question) for question in questions]
 
-    results = await tqdm.gather(*tasks, desc="Processing questions")
+    try:
+        results = await tqdm.gather(*tasks, desc="Processing questions")
+    finally:
+        # 所有任务共用的 LLM 连接池在事件循环结束前关闭
+        await close_llm_clients()
 
     formatted_results = []
     for i, (question, result) in enumerate(zip(questions, results)):
@@ -71,12 +78,12 @@ async def run_tests(
     save_results=False,
     parameters={},
 ):
-    snapshot_id = w3.provider.make_request("evm_snapshot", [])["result"] # type: ignore
+    snapshot_id = (await run_sync(w3.provider.make_request, "evm_snapshot", []))["result"] # type: ignore
     formatted_results = []
     for question in questions:
         agent = await get_agent(model_name=model_name, parameters = parameters)
         #reset anvil environment
-        w3.provider.make_request("evm_revert", [snapshot_id]) # type: ignore
+        await run_sync(w3.provider.make_request, "evm_revert", [snapshot_id]) # type: ignore
         print("anvil reset")
         result = await agent.run(
             question = question.to_question(),
@@ -106,31 +113,46 @@ async def run_tests_parallel_with_reset(
     max_concurrent=10,
     save_results=False,
     parameters={},
+    pool: Optional[AnvilPool] = None,
 ):
-    """Run multiple questions in parallel with individual environment resets"""
+    """
+    Run multiple questions in parallel with individual environment resets
+
+    With a pool every question leases its own anvil, the agent's code interpreter
+    is pointed at it and the node is reverted after the run.
+    """
     
     semaphore = asyncio.Semaphore(max_concurrent)
 
+    async def run_question(question, agent_parameters):
+        # 为每个任务创建独立的agent实例
+        agent = await get_agent(model_name=model_name, parameters=agent_parameters)
+        
+        # 运行agent
+        return await agent.run(question=question.to_question())
+
     async def process_question(question):
         async with semaphore:
             try:
-                # 为每个任务创建独立的agent实例
-                agent = await get_agent(model_name=model_name, parameters=parameters)
-                
-                # 创建独立的snapshot并重置环境
-                # snapshot_id = w3.provider.make_request("evm_snapshot", [])["result"] # type: ignore
-                # w3.provider.make_request("evm_revert", [snapshot_id]) # type: ignore
-                
-                # 运行agent
-                result = await agent.run(question=question.to_question())
-                
-                return result
+                if pool is None:
+                    return await run_question(question, parameters)
+                async with pool.lease() as instance:
+                    # 创建独立的snapshot并在结束后重置环境
+                    snapshot_id = (await run_sync(instance.w3.provider.make_request, "evm_snapshot", []))["result"] # type: ignore
+                    try:
+                        return await run_question(question, {**parameters, "rpc_url": instance.rpc_url})
+                    finally:
+                        await run_sync(instance.w3.provider.make_request, "evm_revert", [snapshot_id]) # type: ignore
             except Exception as e:
                 return e
 
     tasks = [process_question(question) for question in questions]
 
-    results = await tqdm.gather(*tasks, desc="Processing questions")
+    try:
+        results = await tqdm.gather(*tasks, desc="Processing questions")
+    finally:
+        # 所有任务共用的 LLM 连接池在事件循环结束前关闭
+        await close_llm_clients()
 
     formatted_results = []
     for i, (question, result) in enumerate(zip(questions, results)):
@@ -2,6 +2,7 @@ import json
 import os
 import re
 from abc import ABC, abstractmethod
+from typing import Optional
 
 import aiohttp
 import backoff
@@ -511,19 +512,27 @@ class ParseHtmlPage(Tool):
         return tool_result
 
 
+def _describe_interpreter(rpc_url: str) -> str:
+    from dataset.constants import PRIVATE_KEY
+    return python_repl_tool.description + f"\nPackage Web3 is installed. RPC_URL = '{rpc_url}' and Private_key = '{PRIVATE_KEY}'"
+
+
 class CodeInterpreter(Tool):
     name = "code_interpreter"
-    from dataset.constants import RPC_URL, PRIVATE_KEY
-    description = python_repl_tool.description + f"\nPackage Web3 is installed. RPC_URL = '{RPC_URL}' and Private_key = '{PRIVATE_KEY}'"
+    from dataset.constants import RPC_URL
+    description = _describe_interpreter(RPC_URL)
     input_arguments = python_repl_tool.args_schema.model_json_schema()['properties']
     # input_arguments: dict = {
     #     "query": 
     # }
     required_arguments = ['query']
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, rpc_url: Optional[str] = None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.interpreter = PythonAstREPLTool()
+        # The description (part of the LLM cache key) always names the configured RPC_URL, so it does not
+        # depend on which anvil was leased. Providers for that URL are routed to the leased node, and the
+        # predefined RPC_URL variable points at it for code that talks to the node without Web3.
+        self.interpreter = PythonAstREPLTool(locals={"RPC_URL": rpc_url}) if rpc_url else PythonAstREPLTool()
     
     async def call_tool(self, arguments: dict, *args, **kwargs) -> list[str]:
         code = arguments.get("query", None)
@@ -0,0 +1,325 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
+from urllib.parse import urlparse
+from web3 import Web3, HTTPProvider
+from dataset.constants import BASE_RPC_URL, RPC_URL
+from evaluate_module.schemas import AnvilConfig, Transport
+from evaluate_utils.rpc_util import IPC_SCHEME, LOCAL_HOSTS, get_web3, notify_state_reset, route_http_providers, use_endpoint
+
+if TYPE_CHECKING:
+    from evaluate_module.state_bundle import StateBundleStore
+
+# anvil --ipc 的默认路径，{port} 替换为节点端口
+DEFAULT_IPC_PATH = "/tmp/anvil-{port}.ipc"
+# 任务代码中写死的节点地址，节点池的端口不能与它们重叠
+CONFIGURED_RPC_URLS = (RPC_URL, BASE_RPC_URL)
+# 默认端口从 RPC_URL (8545) 和 BASE_RPC_URL (8546) 之后开始
+DEFAULT_BASE_PORT = 8547
+# 回收节点时重启 anvil 的尝试次数和间隔 (秒)
+RESTART_ATTEMPTS = 3
+RESTART_BACKOFF = 2
+
+
+def spawn_anvil(command: list[str], rpc_url: str, timeout: float = 60) -> subprocess.Popen:
+    """启动 anvil 并等待 RPC 可用"""
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    w3 = Web3(HTTPProvider(rpc_url, request_kwargs={"timeout": 2}))
+    deadline = time.monotonic() + timeout
+    while not w3.is_connected():
+        if process.poll() is not None:
+            raise RuntimeError(f"anvil at {rpc_url} exited with code {process.returncode}")
+        if time.monotonic() > deadline:
+            process.kill()
+            process.wait()
+            raise TimeoutError(f"anvil at {rpc_url} not ready after {timeout}s")
+        time.sleep(0.2)
+    return process
+
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """进程常驻内存 (MB)，非 Linux 或进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class AnvilInstance:
+    """
+    一个独立的 anvil 节点，process 为空表示节点由外部启动
+
+    rpc_url 始终是 HTTP 地址 (健康检查、交给 agent 的代码解释器)，
+    endpoint 是评估时实际使用的地址，可以是 ws:// 或 ipc://路径。
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", process: Optional[subprocess.Popen] = None, endpoint: Optional[str] = None) -> None:
+        self.host = host
+        self.port = port
+        self.rpc_url = f"http://{host}:{port}"
+        self.endpoint = endpoint or self.rpc_url
+        self.w3: Web3 = get_web3(self.endpoint)
+        self.process = process
+        # 健康检查使用短超时，卡住的节点不会拖住检查
+        self._probe = Web3(HTTPProvider(self.rpc_url, request_kwargs={"timeout": 5}))
+
+    def rss_mb(self) -> Optional[float]:
+        return process_rss_mb(self.process.pid) if self.process else None
+
+    def is_healthy(self) -> bool:
+        if self.process and self.process.poll() is not None:
+            return False
+        try:
+            self._probe.eth.block_number
+            return True
+        except Exception:
+            return False
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __repr__(self) -> str:
+        return f"AnvilInstance({self.endpoint})"
+
+
+class AnvilPool:
+    """
+    anvil 节点池，每次评估独占租用一个节点
+
+    节点端口从 base_port 开始连续分配，需 fork 同一区块，且不能占用 CONFIGURED_RPC_URLS 的端口。
+    租用期间当前协程内所有发往 upstream_rpc_url 的请求都会被路由到租用的节点。
+    linked 中的节点池 (如 upstream_rpc_url=BASE_RPC_URL 的 Base 链节点池) 随本节点池一起租用，
+    发往其它链节点地址的请求同样被路由到独占的节点。
+
+    给出 launcher (端口 -> anvil 启动命令) 时由节点池管理进程:
+    启动 size 个节点和 spares 个热备节点，节点归还时做健康检查，
+    无响应或内存超过 max_rss_mb 的节点被替换为热备节点，并在后台补充新的热备。
+    多次重启失败的节点从池中移除，节点全部移除后 lease() 抛出 RuntimeError，不再无限等待。
+
+    transport 为 WS / IPC 时评估请求通过 WebSocket 或 unix socket 发送，
+    由节点池启动的 anvil 会自动加上 --ipc ipc_path。
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        base_port: int = DEFAULT_BASE_PORT,
+        host: str = "127.0.0.1",
+        upstream_rpc_url: str = RPC_URL,
+        launcher: Optional[Callable[[int], list[str]]] = None,
+        spares: int = 0,
+        max_rss_mb: Optional[float] = None,
+        startup_timeout: float = 60,
+        transport: Transport = Transport.HTTP,
+        ipc_path: Optional[str] = None,
+        linked: Optional[list["AnvilPool"]] = None,
+    ) -> None:
+        self._check_ports(host, range(base_port, base_port + size + (spares if launcher is not None else 0)))
+        # pre_script 中直接创建的 HTTPProvider 也要路由到租用的节点
+        route_http_providers()
+        self.host = host
+        self.transport = transport
+        self.ipc_path = ipc_path or DEFAULT_IPC_PATH
+        self.upstream_rpc_url = upstream_rpc_url
+        self.launcher = launcher
+        self.max_rss_mb = max_rss_mb
+        self.startup_timeout = startup_timeout
+        # 节点被回收时以其 endpoint 调用，用于清理评估器中该节点的快照
+        self.on_recycle: list[Callable[[str], None]] = []
+        self.linked = linked or []
+        self.instances: list[AnvilInstance] = []
+        self._spares: list[AnvilInstance] = []
+        self._refills: set[asyncio.Task] = set()
+        # offline() 生成的状态文件，回收节点时要用它重新启动
+        self._state_path: Optional[str] = None
+        # None 表示节点池已空，取到它的等待者放回后抛出异常，依次唤醒其余等待者
+        self._idle: asyncio.Queue[Optional[AnvilInstance]] = asyncio.Queue()
+        try:
+            for i in range(size):
+                self.instances.append(self._start(base_port + i))
+            if launcher is not None:
+                for i in range(size, size + spares):
+                    self._spares.append(self._start(base_port + i))
+        except Exception:
+            self.close()
+            raise
+        for instance in self.instances:
+            self._idle.put_nowait(instance)
+
+    @classmethod
+    def from_config(
+        cls,
+        config: AnvilConfig,
+        size: int = 4,
+        spares: int = 1,
+        max_rss_mb: Optional[float] = 4096,
+        host: str = "127.0.0.1",
+        upstream_rpc_url: str = RPC_URL,
+        linked: Optional[list["AnvilPool"]] = None,
+    ) -> "AnvilPool":
+        """按 AnvilConfig 启动 fork 节点，端口从 config.port 开始"""
+        def launcher(port: int) -> list[str]:
+            return [
+                "anvil",
+                "--fork-url", config.fork_url,
+                "--fork-block-number", str(config.fork_block_number),
+                "--balance", str(config.balance),
+                "--host", host,
+                "--port", str(port),
+            ]
+        return cls(size, config.port, host, upstream_rpc_url, launcher, spares, max_rss_mb,
+                   transport=config.transport, ipc_path=config.ipc_path, linked=linked)
+
+    @classmethod
+    def offline(
+        cls,
+        store: "StateBundleStore",
+        chain: str = "ethereum",
+        size: int = 4,
+        base_port: int = DEFAULT_BASE_PORT,
+        host: str = "127.0.0.1",
+        upstream_rpc_url: str = RPC_URL,
+        spares: int = 0,
+        max_rss_mb: Optional[float] = None,
+        transport: Transport = Transport.HTTP,
+        linked: Optional[list["AnvilPool"]] = None,
+    ) -> "AnvilPool":
+        """用状态包启动不 fork 的 anvil，评估不再访问上游节点"""
+        fd, state_path = tempfile.mkstemp(prefix=f"anvil-{chain}-", suffix=".json")
+        os.close(fd)
+        store.write_load_state(chain, state_path)
+        try:
+            pool = cls(size, base_port, host, upstream_rpc_url,
+                       lambda port: store.anvil_command(chain, state_path, port, host), spares, max_rss_mb,
+                       transport=transport, linked=linked)
+        except Exception:
+            os.remove(state_path)
+            raise
+        pool._state_path = state_path
+        return pool
+
+    @staticmethod
+    def _check_ports(host: str, ports: range) -> None:
+        """节点池的端口与写死的节点地址重叠时，发往该地址的请求会落到不相关的 fork 上"""
+        for url in CONFIGURED_RPC_URLS:
+            parsed = urlparse(url)
+            same_host = parsed.hostname == host or (parsed.hostname in LOCAL_HOSTS and host in LOCAL_HOSTS)
+            if same_host and parsed.port in ports:
+                raise ValueError(
+                    f"AnvilPool ports {ports.start}-{ports.stop - 1} overlap {url}, choose a base_port outside the configured RPC URLs"
+                )
+
+    @property
+    def size(self) -> int:
+        return len(self.instances)
+
+    def _endpoint(self, port: int) -> str:
+        if self.transport == Transport.WS:
+            return f"ws://{self.host}:{port}"
+        if self.transport == Transport.IPC:
+            return IPC_SCHEME + self.ipc_path.format(port=port)
+        return f"http://{self.host}:{port}"
+
+    def _start(self, port: int) -> AnvilInstance:
+        endpoint = self._endpoint(port)
+        if self.launcher is None:
+            return AnvilInstance(port, self.host, endpoint=endpoint)
+        command = self.launcher(port)
+        if self.transport == Transport.IPC:
+            command = command + ["--ipc", endpoint[len(IPC_SCHEME):]]
+        process = spawn_anvil(command, f"http://{self.host}:{port}", self.startup_timeout)
+        return AnvilInstance(port, self.host, process, endpoint)
+
+    def _is_healthy(self, instance: AnvilInstance) -> bool:
+        if not instance.is_healthy():
+            return False
+        rss = instance.rss_mb()
+        return self.max_rss_mb is None or rss is None or rss <= self.max_rss_mb
+
+    async def _release(self, instance: AnvilInstance) -> None:
+        if self.launcher is None or await asyncio.to_thread(self._is_healthy, instance):
+            self._idle.put_nowait(instance)
+            return
+        print(f"Recycling {instance} (rss: {instance.rss_mb()} MB)")
+        # 新节点从初始状态开始，本地记录的 nonce 等全部作废
+        notify_state_reset(instance.endpoint)
+        for callback in self.on_recycle:
+            callback(instance.endpoint)
+        await asyncio.to_thread(instance.stop)
+        try:
+            if self._spares:
+                replacement = self._spares.pop(0)
+                task = asyncio.create_task(self._refill(instance.port))
+                self._refills.add(task)
+                task.add_done_callback(self._refills.discard)
+            else:
+                replacement = await self._restart(instance.port)
+        except Exception as e:
+            # 重启失败时节点池缩小一个，剩余节点继续工作
+            print(f"Restart anvil on port {instance.port} failed: {e}")
+            self.instances.remove(instance)
+            if not self.instances:
+                self._idle.put_nowait(None)
+            return
+        self.instances[self.instances.index(instance)] = replacement
+        self._idle.put_nowait(replacement)
+
+    async def _restart(self, port: int) -> AnvilInstance:
+        for attempt in range(RESTART_ATTEMPTS):
+            try:
+                return await asyncio.to_thread(self._start, port)
+            except Exception as e:
+                if attempt == RESTART_ATTEMPTS - 1:
+                    raise
+                print(f"Restart anvil on port {port} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(RESTART_BACKOFF * (attempt + 1))
+        raise AssertionError("unreachable")
+
+    async def _refill(self, port: int) -> None:
+        try:
+            self._spares.append(await asyncio.to_thread(self._start, port))
+        except Exception as e:
+            print(f"Start spare anvil on port {port} failed: {e}")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[AnvilInstance]:
+        if not self.instances:
+            raise RuntimeError("AnvilPool has no instances left")
+        instance = await self._idle.get()
+        if instance is None:
+            self._idle.put_nowait(None)
+            raise RuntimeError("AnvilPool has no instances left, all restarts failed")
+        try:
+            async with AsyncExitStack() as stack:
+                for pool in self.linked:
+                    await stack.enter_async_context(pool.lease())
+                with use_endpoint(instance.endpoint, self.upstream_rpc_url, instance.rpc_url):
+                    yield instance
+        finally:
+            await self._release(instance)
+
+    def close(self) -> None:
+        """停止节点池启动的全部 anvil"""
+        for task in self._refills:
+            task.cancel()
+        for instance in self.instances + self._spares:
+            instance.stop()
+        self._spares = []
+        if self._state_path and os.path.exists(self._state_path):
+            os.remove(self._state_path)
+            self._state_path = None
@@ -0,0 +1,255 @@
+"""
+基于交易回执日志和调用追踪的余额变化计算
+
+从已执行交易的回执中解码 ERC20 / ERC721 Transfer、ERC1155 TransferSingle / TransferBatch 和 WETH Deposit / Withdrawal 事件，
+原生 ETH 的转账取自 debug_traceTransaction 的 callTracer 调用树，再计入发送方支付的 gas 费用，
+得到每个 (账户, 代币) 的余额变化，评分时不需要在执行前后读取余额。
+节点不支持 callTracer 时，原生 ETH 只计入交易本身的 value、WETH 取款和 gas 费用，合约内部的 ETH 转账会被遗漏；
+由合约取款时取出的 ETH 只有在该合约是交易直接调用的合约 (路由) 时才计给交易发送方，否则无法确定去向。
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Iterable, NamedTuple, Optional, Union
+from eth_abi import decode
+from web3 import Web3
+from dataset.constants import ERC20_TOKENS_ETH
+from evaluate_utils.erc20_codec import DECIMALS, decode_uint256
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+TRANSFER_SINGLE_TOPIC = "0xc3d58168c5ae7397731d063d5bbf3d657854427343f4c083240f7aacaa2d0f62"
+TRANSFER_BATCH_TOPIC = "0x4a39dc06d4c0dbc64b70af90fd698a233a518aa5d07e595d983b8c0526c8f7fb"
+DEPOSIT_TOPIC = "0xe1fffcc4923d04b559f4d29a8bfc6cda04eb5b0d3c460751c2402c5c5cc9109c"
+WITHDRAWAL_TOPIC = "0x7fcf532c15f0a6db0bd6d0e038bea71d30d808c7d98cb3bf7268a95bf5081b65"
+SYMBOL = "0x95d89b41"
+# eth_simulateV1 traceTransfers 中原生 ETH 转账日志的地址
+NATIVE_TOKEN_ADDRESS = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+METHOD_NOT_FOUND = -32601
+# 会转移 ETH 的调用类型，DELEGATECALL / CALLCODE 的 value 不离开当前合约
+_VALUE_CALL_TYPES = {"CALL", "CREATE", "CREATE2", "SELFDESTRUCT"}
+
+# (账户地址, 代币地址 (原生 ETH 为 None), ERC1155 的 token id (其余为 None))
+DeltaKey = tuple[str, Optional[str], Optional[int]]
+
+
+class TokenMetadata(NamedTuple):
+    symbol: str
+    # ERC721 等没有 decimals 的代币为 None
+    decimals: Optional[int]
+
+
+# 不支持某个 tracer 的 (节点, tracer)，避免每次都先失败一次
+_untraceable_endpoints: set[tuple[str, str]] = set()
+# 所有节点都是主网的分叉，元数据按代币地址 (小写) 缓存
+_metadata_lock = threading.Lock()
+_metadata: dict[str, TokenMetadata] = {
+    address.lower(): TokenMetadata(symbol, decimals) for symbol, (address, decimals) in ERC20_TOKENS_ETH.items()
+}
+
+
+def _hex(value: Union[str, bytes]) -> str:
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    return "0x" + value.lower().removeprefix("0x")
+
+
+def _int(value: Union[int, str, None]) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return int(value, 16)
+    return value
+
+
+def _topic_address(topic: Union[str, bytes]) -> str:
+    return Web3.to_checksum_address("0x" + _hex(topic)[-40:])
+
+
+def _move(deltas: dict[DeltaKey, int], token: Optional[str], sender: str, receiver: str, amount: int, token_id: Optional[int] = None) -> None:
+    deltas[(sender, token, token_id)] -= amount
+    deltas[(receiver, token, token_id)] += amount
+
+
+def apply_logs(deltas: dict[DeltaKey, int], logs: Iterable[Any], withdrawals: Optional[list[tuple[str, str, int]]] = None) -> None:
+    """
+    把一组日志中的代币转移计入 deltas
+
+    ERC721 按集合计数 (与 balanceOf 一致)，ERC1155 按 token id 分别计数。
+    withdrawals 给出时 (没有调用追踪) 把每个 WETH Withdrawal 的 (WETH 合约, 取款人, 数量) 追加到其中，
+    取出的 ETH 的去向由调用方决定。
+    """
+    for log in logs:
+        topics = [_hex(topic) for topic in log.get("topics") or []]
+        if not topics:
+            continue
+        address = _hex(log["address"])
+        token = None if address == NATIVE_TOKEN_ADDRESS else Web3.to_checksum_address(address)
+        data = bytes.fromhex(_hex(log.get("data") or "0x")[2:])
+        if topics[0] == TRANSFER_TOPIC:
+            if len(topics) == 3 and len(data) >= 32:
+                _move(deltas, token, _topic_address(topics[1]), _topic_address(topics[2]), decode_uint256(data))
+            elif len(topics) == 4:
+                # ERC721: tokenId 在 topics[3] 中
+                _move(deltas, token, _topic_address(topics[1]), _topic_address(topics[2]), 1)
+        elif topics[0] == TRANSFER_SINGLE_TOPIC and len(topics) == 4:
+            token_id, amount = decode(["uint256", "uint256"], data)
+            _move(deltas, token, _topic_address(topics[2]), _topic_address(topics[3]), amount, token_id)
+        elif topics[0] == TRANSFER_BATCH_TOPIC and len(topics) == 4:
+            token_ids, amounts = decode(["uint256[]", "uint256[]"], data)
+            for token_id, amount in zip(token_ids, amounts):
+                _move(deltas, token, _topic_address(topics[2]), _topic_address(topics[3]), amount, token_id)
+        elif topics[0] == DEPOSIT_TOPIC and len(topics) == 2 and len(data) >= 32:
+            # 存入的 ETH 已体现在调用的 value 中，这里只记 WETH 的铸造
+            deltas[(_topic_address(topics[1]), token, None)] += decode_uint256(data)
+        elif topics[0] == WITHDRAWAL_TOPIC and len(topics) == 2 and len(data) >= 32:
+            owner, amount = _topic_address(topics[1]), decode_uint256(data)
+            deltas[(owner, token, None)] -= amount
+            if withdrawals is not None and token is not None:
+                withdrawals.append((token, owner, amount))
+
+
+def apply_call_trace(deltas: dict[DeltaKey, int], trace: dict[str, Any]) -> None:
+    """把 callTracer 调用树中的原生 ETH 转账计入 deltas，回滚的调用连同其子调用一起跳过"""
+    stack = [trace]
+    while stack:
+        frame = stack.pop()
+        if frame.get("error"):
+            continue
+        value = _int(frame.get("value"))
+        if value and frame.get("type") in _VALUE_CALL_TYPES and frame.get("to"):
+            _move(deltas, None, Web3.to_checksum_address(frame["from"]), Web3.to_checksum_address(frame["to"]), value)
+        stack.extend(frame.get("calls") or [])
+
+
+def traces_supported(w3: Web3, tracer: str = "callTracer") -> bool:
+    """节点是否 (尚未被发现不) 支持指定的 tracer"""
+    return (getattr(w3.provider, "endpoint_uri", ""), tracer) not in _untraceable_endpoints
+
+
+def trace_transactions(w3: Web3, tx_hashes: list[str], tracer: str, tracer_config: Optional[dict[str, Any]] = None) -> Optional[list[Any]]:
+    """一次批量请求取回每笔交易的 debug_traceTransaction 结果，节点不支持该 tracer 时返回 None"""
+    endpoint = getattr(w3.provider, "endpoint_uri", "")
+    if not tx_hashes or not traces_supported(w3, tracer):
+        return None
+    options: dict[str, Any] = {"tracer": tracer}
+    if tracer_config:
+        options["tracerConfig"] = tracer_config
+    try:
+        responses = w3.provider.make_batch_request(  # type: ignore
+            [("debug_traceTransaction", [tx_hash, options]) for tx_hash in tx_hashes]
+        )
+    except Exception as e:
+        print(f"debug_traceTransaction ({tracer}) failed on {endpoint}: {e}")
+        return None
+    errors = [response["error"] for response in responses if "error" in response]
+    if errors:
+        print(f"debug_traceTransaction ({tracer}) failed on {endpoint}: {errors[0]}")
+        if isinstance(errors[0], dict) and errors[0].get("code") == METHOD_NOT_FOUND:
+            _untraceable_endpoints.add((endpoint, tracer))
+        return None
+    return [response["result"] for response in responses]
+
+
+def _has_code(w3: Web3, accounts: Iterable[str]) -> dict[str, bool]:
+    accounts = list(dict.fromkeys(accounts))
+    if not accounts:
+        return {}
+    responses = w3.provider.make_batch_request([("eth_getCode", [account, "latest"]) for account in accounts])  # type: ignore
+    return {account: (response.get("result") or "0x") not in ("0x", "0x0") for account, response in zip(accounts, responses)}
+
+
+def receipt_deltas(w3: Web3, receipts: list[Any]) -> Optional[dict[DeltaKey, int]]:
+    """
+    按执行顺序给出的交易回执 (web3 回执或原始 JSON 均可) 计算余额变化
+
+    Returns:
+        dict: (账户, 代币地址, token id) -> 余额变化 (最小单位)，不包含变化为 0 的条目；
+        没有调用追踪且 WETH 取款取出的 ETH 去向无法确定时返回 None
+    """
+    deltas: dict[DeltaKey, int] = defaultdict(int)
+    tx_hashes = [_hex(receipt["transactionHash"]) for receipt in receipts]
+    traces = trace_transactions(w3, tx_hashes, "callTracer")
+    if traces is None:
+        # 没有调用追踪时只能取到交易本身的 value
+        responses = w3.provider.make_batch_request([("eth_getTransactionByHash", [tx_hash]) for tx_hash in tx_hashes]) if tx_hashes else []  # type: ignore
+        values = [_int((response.get("result") or {}).get("value")) for response in responses]
+    # (交易发送方, 交易直接调用的合约, WETH 合约, 取款人, 数量)
+    withdrawals: list[tuple[str, Optional[str], str, str, int]] = []
+    for index, receipt in enumerate(receipts):
+        sender = Web3.to_checksum_address(receipt["from"])
+        deltas[(sender, None, None)] -= _int(receipt["gasUsed"]) * _int(receipt.get("effectiveGasPrice"))
+        if _int(receipt["status"]) != 1:
+            continue
+        if traces is not None:
+            apply_logs(deltas, receipt["logs"])
+            apply_call_trace(deltas, traces[index])
+            continue
+        to = receipt.get("to") and Web3.to_checksum_address(receipt["to"])
+        tx_withdrawals: list[tuple[str, str, int]] = []
+        apply_logs(deltas, receipt["logs"], tx_withdrawals)
+        withdrawals.extend((sender, to, weth, owner, amount) for weth, owner, amount in tx_withdrawals)
+        if values[index] and to:
+            _move(deltas, None, sender, to, values[index])
+    if withdrawals:
+        # 外部账户直接取款时 ETH 归取款人；路由合约取款后通常把 ETH 转给交易发送方，
+        # 取款的合约不是交易直接调用的合约时无法确定 ETH 的去向
+        has_code = _has_code(w3, [owner for _, _, _, owner, _ in withdrawals])
+        for sender, to, weth, owner, amount in withdrawals:
+            if not has_code[owner]:
+                _move(deltas, None, weth, owner, amount)
+            elif owner == to:
+                _move(deltas, None, weth, sender, amount)
+            else:
+                return None
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _decode_symbol(return_data: str) -> Optional[str]:
+    data = bytes.fromhex(return_data.removeprefix("0x"))
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        # MKR 等早期代币返回 bytes32
+        if len(data) == 32:
+            return data.rstrip(b"\x00").decode("utf-8", "replace") or None
+    return None
+
+
+def token_metadata(w3: Web3, tokens: Iterable[str]) -> dict[str, TokenMetadata]:
+    """代币的符号和 decimals，未缓存的代币用一次批量 eth_call 读取"""
+    tokens = list(dict.fromkeys(Web3.to_checksum_address(token) for token in tokens))
+    with _metadata_lock:
+        missing = [token for token in tokens if token.lower() not in _metadata]
+    if missing:
+        requests = []
+        for token in missing:
+            requests.append(("eth_call", [{"to": token, "data": DECIMALS}, "latest"]))
+            requests.append(("eth_call", [{"to": token, "data": SYMBOL}, "latest"]))
+        responses = w3.provider.make_batch_request(requests)  # type: ignore
+        with _metadata_lock:
+            for index, token in enumerate(missing):
+                decimals_response, symbol_response = responses[2 * index], responses[2 * index + 1]
+                result = decimals_response.get("result")
+                decimals = decode_uint256(result) if result and len(result) >= 66 else None
+                symbol = symbol_response.get("result")
+                symbol = symbol and _decode_symbol(symbol)
+                _metadata[token.lower()] = TokenMetadata(symbol or token[:10], decimals)
+    with _metadata_lock:
+        return {token: _metadata[token.lower()] for token in tokens}
+
+
+def describe_deltas(w3: Web3, deltas: dict[DeltaKey, int], accounts: Optional[Iterable[str]] = None) -> str:
+    """余额变化的文字描述，accounts 给出时只列出这些账户"""
+    if accounts is not None:
+        wanted = {Web3.to_checksum_address(account) for account in accounts}
+        deltas = {key: delta for key, delta in deltas.items() if key[0] in wanted}
+    metadata = token_metadata(w3, {token for _, token, _ in deltas if token is not None})
+    lines = []
+    for (account, token, token_id), delta in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1] or "", item[0][2] or 0)):
+        symbol, decimals = ("ETH", 18) if token is None else metadata[token]
+        amount = Decimal(delta) / Decimal(10 ** decimals) if decimals is not None else Decimal(delta)
+        label = symbol if token is None else f"{symbol} ({token})"
+        if token_id is not None:
+            label += f" #{token_id}"
+        lines.append(f"{account}: {amount:+f} {label}")
+    return "\n".join(lines)
@@ -4,8 +4,9 @@ from statistics import mean
 from typing import List, Tuple, Optional, Any, Callable, Union
 from types import ModuleType
 from demo.agent import Agent
-from evaluate_module.schemas import AgentOutputItem, BenchmarkItem 
+from evaluate_module.schemas import AgentOutputItem, BenchmarkItem, ExecutionBackend
 from evaluate_module.validate_agent import get_evaluate_agent
+from evaluate_utils.rpc_util import route_web3
 from web3 import Web3
 
 
@@ -19,7 +20,7 @@ def load_agent_output_dataset(dataset_path:str = "dataset/example_agent_output.j
         return [AgentOutputItem(**item) for item in agent_output_dataset]
 
 
-async def get_eval_agent_by_task_id(task_id:str, model_name:str = 'gpt-4.1', bind_address:Optional[str] = None) -> Agent:
+async def get_eval_agent_by_task_id(task_id:str, model_name:str = 'gpt-4.1', bind_address:Optional[str] = None, impersonate:bool = False, backend:ExecutionBackend = ExecutionBackend.SEQUENTIAL, capture_state_diff:bool = False) -> Agent:
     account, w3, get_balances, pre_script = load_task_dependencies(task_id)
     if account is None or w3 is None or get_balances is None:
         raise ValueError(f"Task {task_id} init failed")
@@ -28,7 +29,10 @@ async def get_eval_agent_by_task_id(task_id:str, model_name:str = 'gpt-4.1', bin
         parameters={
             "max_turns": 10,
             "max_output_tokens": 16384,
-            "temperature": 0.0
+            "temperature": 0.0,
+            "impersonate": impersonate,
+            "backend": backend,
+            "capture_state_diff": capture_state_diff
         },
         account=account,
         w3=w3,
@@ -81,6 +85,10 @@ def load_task_dependencies(task_id: str) -> Tuple[Optional[Any], Optional[Web3],
             print(f"No pre_script found for task {task_id}, skipping")
         except Exception as e:
             print(f"Error loading pre_script for task {task_id}: {e}")
+
+        # 模块级 w3 改为可路由，节点池租用时请求会发往对应的 anvil
+        route_web3(module.w3)
+        route_web3(getattr(pre_script, "w3", None))
         
         return module.account, module.w3, module.get_balances, pre_script
         
@@ -121,6 +129,8 @@ def execute_pre_script(pre_script: Optional[ModuleType]) -> bool:
         else:
             import importlib
             importlib.reload(pre_script)
+            # reload 重新创建了模块级 w3，需要再次改为可路由
+            route_web3(getattr(pre_script, "w3", None))
             return "reload"
     
     try:
@@ -1,16 +1,37 @@
 # oce_evaluator.py - 核心评估库
-from typing import Dict, Any
-from evaluate_module.schemas import AgentOutputItem, BenchmarkItem, EvaluateResult, EvaluateScore
+import asyncio
+import math
+from types import ModuleType
+from typing import Dict, Any, Optional
+from evaluate_module.schemas import AgentOutputItem, BenchmarkItem, EvaluateResult, EvaluateScore, ExecutionBackend
 from evaluate_module.evaluator import get_eval_agent_by_task_id, load_evaluate_data
-from web3 import Web3, HTTPProvider
+from evaluate_module.anvil_pool import AnvilPool
+from evaluate_module.validate_agent import execute_pre_script
+from evaluate_module.rule_evaluator import evaluate_by_rules
+from evaluate_module.state_diff import merge_state_diffs
+from evaluate_utils.rpc_util import get_web3, run_sync
 from dataset.constants import RPC_URL
 
 class OCEEvaluator:
     """轻量级OCE评估器"""
     
-    def __init__(self, rpc_url: str = RPC_URL, evaluate_dataset_path:str = "dataset/oce_eval_data.json"):
-        self.w3 = Web3(HTTPProvider(rpc_url))
-        self._snapshots = {}
+    def __init__(self, rpc_url: str = RPC_URL, evaluate_dataset_path:str = "dataset/oce_eval_data.json", pool: Optional[AnvilPool] = None, use_rules: bool = False, impersonate: bool = False, backend: ExecutionBackend = ExecutionBackend.SEQUENTIAL, capture_state_diff: bool = False):
+        self.w3 = get_web3(rpc_url)
+        # 节点池为空时批量评估退化为在 rpc_url 上串行执行
+        self.pool = pool
+        # 先用规则评估，规则无法判定时再调用 LLM
+        self.use_rules = use_rules
+        # 用 anvil 冒充交易的 from 地址执行，不再本地签名
+        self.impersonate = impersonate
+        # 交易执行方式，BUNDLE 时整个交易列表在一个区块中执行
+        self.backend = backend
+        # 记录已执行交易的 prestateTracer 状态差异，合并后放入评估结果的 metadata["state_diff"]
+        self.capture_state_diff = capture_state_diff
+        # 每个节点的快照状态: endpoint -> {"clean": 初始快照, "task_id": 任务, "task": pre_script 执行后的快照}
+        self._snapshots: dict[str, dict[str, Any]] = {}
+        if pool is not None:
+            # 被回收的节点重启后快照全部失效
+            pool.on_recycle.append(lambda endpoint: self._snapshots.pop(endpoint, None))
         self.evaluate_dataset: list[BenchmarkItem] = []
         # 使用相对路径
         self.evaluate_dataset_path = evaluate_dataset_path
@@ -25,13 +46,18 @@ class OCEEvaluator:
     async def evaluate_single(
         self, 
         agent_output: AgentOutputItem,
-        model_name: str = "gpt-4.1"
+        model_name: str = "gpt-4.1",
+        keep_task_state: bool = False
     ) -> EvaluateResult:
-        """评估单个任务"""
+        """
+        评估单个任务
+
+        keep_task_state 为 True 时评估结束后不恢复初始状态，
+        同一节点上后续同一任务的评估直接回滚到 pre_script 执行后的快照。
+        """
+        task_id = agent_output.task_id
         try:
             self.load_eval_dataset(self.evaluate_dataset_path)
-            # 创建快照
-            snapshot_id = self.w3.provider.make_request("evm_snapshot", []).get("result", "") # type: ignore
 
             if agent_output.task_id:
                 task_id = agent_output.task_id
@@ -53,17 +79,41 @@ class OCEEvaluator:
             eval_agent = await get_eval_agent_by_task_id(
                 task_id, 
                 model_name,
-                bind_address
+                bind_address,
+                self.impersonate,
+                self.backend,
+                self.capture_state_diff
             )
-            
-            # 执行评估
-            result, metadata = await eval_agent.run(agent_output.to_question())
-            
-            # 解析结果
-            raw_score = self._parse_evaluation_result(result, agent_output)
-            
+            # 恢复到任务初始状态，pre_script 每个节点每个任务只执行一次
+            await run_sync(self._restore_task_state, task_id, eval_agent.pre_script)
+
             # 获取数据集中的任务信息
             benchmark_item = next((item for item in self.evaluate_dataset if item.task_id == task_id), None)
+
+            verdict = None
+            tx_tool = eval_agent.tools["validate_tx_execution"]
+            if self.use_rules and benchmark_item:
+                rule_state_diffs = [] if self.capture_state_diff else None
+                verdict = await run_sync(evaluate_by_rules, benchmark_item, agent_output.answer, tx_tool.account, tx_tool.w3, tx_tool.bind_address, tx_tool.impersonate, tx_tool.backend, rule_state_diffs)
+
+            if verdict is not None:
+                passed, reason = verdict
+                result = f"{'PASS' if passed else 'FAIL'}\nReason: {reason}"
+                metadata = {"evaluator": "rules"}
+                raw_score = 10.0 if passed else 0.0
+                state_diffs = rule_state_diffs
+            else:
+                if self.use_rules and self.backend != ExecutionBackend.SIMULATE:
+                    # 规则评估已执行过交易，回滚后再交给 LLM
+                    await run_sync(self._restore_task_state, task_id, eval_agent.pre_script)
+                # 执行评估
+                result, metadata = await eval_agent.run(agent_output.to_question(), run_pre_script=False)
+                # 解析结果
+                raw_score = self._parse_evaluation_result(result, agent_output)
+                state_diffs = tx_tool.state_diffs
+            if state_diffs:
+                metadata = {**(metadata or {}), "state_diff": merge_state_diffs(state_diffs).to_compact()}
+            
             level = benchmark_item.level if benchmark_item and benchmark_item.level else 1
             category = benchmark_item.category if benchmark_item else "unknown"
             
@@ -96,20 +146,96 @@ class OCEEvaluator:
             )
         finally:
             # 恢复快照
-            if snapshot_id:
-                self.w3.provider.make_request("evm_revert", [snapshot_id]) # type: ignore
+            if not keep_task_state:
+                await run_sync(self.reset_chain)
+
+    def _snapshot(self) -> str:
+        return self.w3.provider.make_request("evm_snapshot", []).get("result", "") # type: ignore
+
+    def _revert(self, snapshot_id: str) -> None:
+        self.w3.provider.make_request("evm_revert", [snapshot_id]) # type: ignore
+
+    def _restore_task_state(self, task_id: str, pre_script: Optional[ModuleType]) -> None:
+        """
+        把当前节点恢复到任务 pre_script 执行后的状态
+
+        anvil 的 evm_revert 会删除被回滚的快照及其之后的快照，因此每次回滚后都要重新打快照。
+        """
+        state = self._snapshots.setdefault(self.w3.provider.endpoint_uri, {})
+        if state.get("task_id") == task_id and state.get("task"):
+            self._revert(state["task"])
+            state["task"] = self._snapshot()
+            return
+
+        if state.get("clean"):
+            self._revert(state["clean"])
+        state["clean"] = self._snapshot()
+        state["task_id"] = task_id
+        state["task"] = None
+        if pre_script and execute_pre_script(pre_script):
+            state["task"] = self._snapshot()
+
+    def reset_chain(self) -> None:
+        """把当前节点恢复到评估前的初始状态并丢弃任务快照"""
+        state = self._snapshots.pop(self.w3.provider.endpoint_uri, {})
+        if state.get("clean"):
+            self._revert(state["clean"])
     
     async def evaluate_batch(
         self, 
         agent_outputs: list[AgentOutputItem],
         model_name: str = "gpt-4.1"
     ) -> list[EvaluateResult]:
-        """批量评估"""
-        results = []
-        for output in agent_outputs:
-            result = await self.evaluate_single(output, model_name)
-            results.append(result)
-        return results
+        """
+        批量评估，结果顺序与输入一致
+
+        同一任务的输出分为一组在同一节点上连续评估，以复用 pre_script 快照；
+        配置了节点池时各组独占一个 anvil 并发执行，输出较多的任务拆成多组，使并发数接近节点池大小。
+        某组的节点失效时只有该组未完成的输出记为失败，其它组的结果不受影响。
+        """
+        groups: dict[str, list[int]] = {}
+        for index, output in enumerate(agent_outputs):
+            groups.setdefault(output.task_id or output.question or "", []).append(index)
+        if self.pool is not None and self.pool.size > 0:
+            # 每组最多 chunk 个输出，pre_script 在每个节点上仍只执行一次
+            chunk = max(1, math.ceil(len(agent_outputs) / self.pool.size))
+            chunks = [indexes[start:start + chunk] for indexes in groups.values() for start in range(0, len(indexes), chunk)]
+        else:
+            chunks = list(groups.values())
+        results: list[Optional[EvaluateResult]] = [None] * len(agent_outputs)
+
+        def fail_missing(indexes: list[int], error: BaseException) -> None:
+            for index in indexes:
+                if results[index] is None:
+                    results[index] = EvaluateResult(task_id=agent_outputs[index].task_id, status="failed", error=str(error) or repr(error))
+
+        async def evaluate_group(indexes: list[int]) -> None:
+            try:
+                for index in indexes:
+                    results[index] = await self.evaluate_single(agent_outputs[index], model_name, keep_task_state=True)
+            finally:
+                try:
+                    await run_sync(self.reset_chain)
+                except Exception as e:
+                    # 节点已失效 (如进程退出)，节点池归还时会回收它
+                    print(f"Reset chain failed: {e}")
+                    fail_missing(indexes, e)
+
+        if self.pool is None:
+            for indexes in chunks:
+                await evaluate_group(indexes)
+            return results  # type: ignore
+
+        async def evaluate_leased(indexes: list[int]) -> None:
+            async with self.pool.lease():
+                await evaluate_group(indexes)
+
+        outcomes = await asyncio.gather(*(evaluate_leased(indexes) for indexes in chunks), return_exceptions=True)
+        for indexes, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"Evaluate group failed: {outcome}")
+                fail_missing(indexes, outcome)
+        return results  # type: ignore
     
     def _parse_evaluation_result(self, result: str, agent_output: AgentOutputItem) -> float:
         """解析评估结果为分数"""
@@ -0,0 +1,348 @@
+"""
+规则评估: 不调用 LLM，直接执行 agent 给出的交易并检查余额变化
+
+只有 criteria 中每一条都能被规则识别且全部满足时才判定 PASS；
+回答为空、交易执行失败，或 criteria 被完全识别但余额检查不通过时判定 FAIL；
+其余情况 (包括无法从回答中提取交易) 返回 None，交给 LLM 评估。
+
+规则能识别的 criteria 只有余额变化 ("the USDC balance should increase about 2600 with 5% fault tolerance") 和
+交互合约 ("Must interact with ... contract address: 0x...") 两类；头寸、债务、授权额度等只能通过
+BenchmarkItem.storage_assertions 用已执行交易的状态差异检查，没有时交给 LLM。
+余额增加 (兑换得到的数量等取决于价格和手续费) 只有写明容差时才由规则判定，"about" 或不带容差的增加交给 LLM。
+"""
+import ast
+import json
+import re
+from decimal import Decimal
+from typing import Any, Optional
+from web3 import Web3
+from eth_account.signers.local import LocalAccount
+from dataset.constants import ERC20_TOKENS_ETH
+from evaluate_module.balance_delta import DeltaKey, describe_deltas, receipt_deltas, traces_supported
+from evaluate_module.schemas import BalanceAssertion, BenchmarkItem, ExecutionBackend, StateDiff
+from evaluate_module.state_diff import capture_state_diffs, check_storage_assertions, merge_state_diffs
+from evaluate_module.validate_agent import execute_tx_list
+from evaluate_module.simulator import simulate_tx_list
+from evaluate_utils.calldata_decoder import describe_tx_list
+from evaluate_utils.erc20_codec import decode_uint256, encode_balance_of
+
+# ExecuteTxTool 允许的交易字段
+TX_FIELDS = ("to", "from", "value", "data", "maxPriorityFeePerGas", "maxFeePerGas", "gas", "gasPrice")
+TX_INT_FIELDS = ("value", "maxPriorityFeePerGas", "maxFeePerGas", "gas", "gasPrice")
+
+# 未写明容差时 "about" 默认的相对容差 (只用于余额减少)，ETH 余额还需要容纳 gas 消耗
+DEFAULT_ABOUT_TOLERANCE = 0.05
+DEFAULT_ETH_TOLERANCE = 0.01
+
+_CODE_BLOCK = re.compile(r"```(?:json|python)?\s*(.*?)```", re.S)
+_SENTENCE_SPLIT = re.compile(r"\.(?:\s+|$)|;\s*|\n+")
+_CLAUSE_SPLIT = re.compile(r",\s+and\s+|,\s+|\s+and\s+", re.I)
+_FILLER_CLAUSE = re.compile(r"^(?:\d{1,2}\s*)?(?:after|before)\b.*\b(?:executed|transactions?|txs?)\s*:?$|^\d{1,2}$", re.I)
+_BALANCE_CLAUSE = re.compile(
+    r"^(?:the\s+)?(?:wallet\s+)?"
+    r"(?:(?P<token>[a-z]+)\s+balance|balance\s+of\s+(?P<account>0x[0-9a-f]{40})|balance\s+of\s+(?P<token_of>[a-z]+)|(?P<token_bare>[a-z]+)|(?P<wallet>balance))"
+    r"\s+(?:should\s+)?(?P<direction>increase|decrease)s?"
+    r"\s+(?:by\s+)?(?:about\s+(?P<about>)|~\s*(?P<tilde>))?"
+    r"(?P<amount>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>[a-z]+)?"
+    r"(?:\s*(?:\+|plus)\s*(?:some\s+)?(?:eth\s+)?(?:gas\s+)?(?P<fee>fees?))?"
+    r"(?:\s*±\s*(?P<plus_minus>\d+(?:\.\d+)?)%)?"
+    r"(?:\s+with\s+(?:(?P<no_tolerance>no)|(?P<tolerance>\d+(?:\.\d+)?)%)\s+(?:of\s+)?fault\s+tolerance)?$",
+    re.I,
+)
+_INTERACTION_CLAUSE = re.compile(
+    r"^(?:must\s+|directly\s+|ensure\s+(?:that\s+)?(?:the\s+)?(?:tx\s+)?)?"
+    r"(?:interacts?\s+with|(?:the\s+)?contract\s+interaction\s+address\s+(?:should\s+)?includes?)\b"
+    r"[^;]*?\(?(?P<address>0x[0-9a-f]{40})\)?$",
+    re.I,
+)
+# 只说明检查方式、不含断言的片段，在切分子句前去掉
+_FILLER_PHRASE = re.compile(
+    r"\bcheck\s+(?:the\s+)?(?:wallet\s+)?balance(?:\s+changes)?(?:\s+of\s+[\w\s,]+?)?"
+    r"\s+(?:in\s+the\s+wallet|before\s+and\s+after\s+(?:the\s+)?execution)",
+    re.I,
+)
+
+
+def _parse_tx_text(text: str) -> Any:
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(re.sub(r"#[^\n]*", "", text))
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _find_bracketed(text: str) -> list[str]:
+    """找出文本中所有顶层的 [...] / {...} 片段"""
+    pairs = {"[": "]", "{": "}"}
+    fragments, stack, start = [], [], 0
+    for index, char in enumerate(text):
+        if char in pairs:
+            if not stack:
+                start = index
+            stack.append(pairs[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+            if not stack:
+                fragments.append(text[start:index + 1])
+    return fragments
+
+
+def _normalize_tx(tx: dict) -> dict:
+    tx = {k: v for k, v in tx.items() if k in TX_FIELDS}
+    for key in TX_INT_FIELDS:
+        value = tx.get(key)
+        if isinstance(value, str):
+            tx[key] = int(value, 16) if value.lower().startswith("0x") else int(value)
+    tx.setdefault("data", "0x")
+    tx.setdefault("value", 0)
+    return tx
+
+
+def _extract_from(text: str) -> list[dict]:
+    txs: list[dict] = []
+    for fragment in [text] + _find_bracketed(text):
+        parsed = _parse_tx_text(fragment)
+        if isinstance(parsed, list) and parsed and all(isinstance(tx, dict) and "to" in tx for tx in parsed):
+            return [_normalize_tx(tx) for tx in parsed]
+        if isinstance(parsed, dict) and "to" in parsed:
+            txs.append(_normalize_tx(parsed))
+    return txs
+
+
+def extract_tx_list(answer: str) -> Optional[list[dict]]:
+    """从 agent 输出中提取交易列表，优先使用代码块中的 JSON"""
+    txs = [tx for block in _CODE_BLOCK.findall(answer) for tx in _extract_from(block)]
+    return txs or _extract_from(answer) or None
+
+
+def _parse_balance_clause(clause: str) -> Optional[tuple[BalanceAssertion, bool]]:
+    """
+    解析一条余额变化子句
+
+    Returns:
+        (余额断言, 是否可由规则判定)，无法识别时返回 None；
+        没有写明容差的余额增加 (如兑换所得) 不可判定
+    """
+    match = _BALANCE_CLAUSE.match(clause)
+    if not match:
+        return None
+    account = match.group("account")
+    token = match.group("token") or match.group("token_of") or match.group("token_bare") or match.group("unit")
+    unit = match.group("unit")
+    if account and not unit:
+        return None
+    if not token or (unit and unit.upper() != token.upper()):
+        return None
+    token = token.upper()
+    if match.group("fee") and token != "ETH":
+        return None
+    if token != "ETH" and token not in ERC20_TOKENS_ETH:
+        return None
+
+    amount = float(match.group("amount").replace(",", ""))
+    delta = amount if match.group("direction").lower() == "increase" else -amount
+    explicit = match.group("no_tolerance") is not None or bool(match.group("tolerance") or match.group("plus_minus"))
+    if match.group("no_tolerance") is not None:
+        tolerance = 0.0
+    elif explicit:
+        tolerance = float(match.group("tolerance") or match.group("plus_minus")) / 100
+    elif match.group("about") is not None or match.group("tilde") is not None:
+        tolerance = DEFAULT_ABOUT_TOLERANCE
+    else:
+        tolerance = 0.0
+    if token == "ETH":
+        tolerance = max(tolerance, DEFAULT_ETH_TOLERANCE)
+    return BalanceAssertion(token=token, account=account, delta=delta, tolerance=tolerance), explicit or delta < 0
+
+
+def parse_criteria(criteria: str) -> tuple[list[BalanceAssertion], list[str], bool]:
+    """
+    从 criteria 文本中解析余额断言和要求交互的合约
+
+    Returns:
+        tuple: (识别出的余额断言, 要求交互的合约地址, criteria 是否被完全识别)
+    """
+    assertions: list[BalanceAssertion] = []
+    contracts: list[str] = []
+    fully_parsed = True
+    # "contract, address:0x..." 中的逗号不是子句分隔
+    criteria = re.sub(r",\s*(address\s*:)", r" \1", _FILLER_PHRASE.sub("", criteria), flags=re.I)
+    for sentence in _SENTENCE_SPLIT.split(criteria):
+        for clause in _CLAUSE_SPLIT.split(sentence):
+            clause = clause.strip(" :")
+            if not clause or _FILLER_CLAUSE.match(clause):
+                continue
+            # 去掉编号，如 "1 Must ..." 或 "... 2" (由 "2. After" 切分而来)
+            for candidate in (clause, re.sub(r"^\d{1,2}\s+|\s+\d{1,2}$", "", clause)):
+                parsed = _parse_balance_clause(candidate)
+                if parsed is not None:
+                    assertion, decidable = parsed
+                    assertions.append(assertion)
+                    fully_parsed = fully_parsed and decidable
+                    break
+                interaction = _INTERACTION_CLAUSE.match(candidate)
+                if interaction is not None:
+                    contracts.append(Web3.to_checksum_address(interaction.group("address")))
+                    break
+            else:
+                fully_parsed = False
+    return assertions, contracts, fully_parsed
+
+
+def read_balances(w3: Web3, assertions: list[BalanceAssertion], wallet: str) -> dict[tuple[str, str], Decimal]:
+    """
+    用一次 JSON-RPC 批量请求读取断言涉及的全部余额
+
+    Returns:
+        dict: (账户地址, 代币) -> 余额，单位为代币数量
+    """
+    keys = list(dict.fromkeys((assertion.account or wallet, assertion.token) for assertion in assertions))
+    decimals = {assertion.token: assertion.decimals for assertion in assertions}
+    token_addresses = {assertion.token: assertion.token_address for assertion in assertions}
+    requests = []
+    for account, token in keys:
+        token_address = token_addresses[token]
+        if token_address is None:
+            requests.append(("eth_getBalance", [account, "latest"]))
+        else:
+            requests.append(("eth_call", [{"to": token_address, "data": encode_balance_of(account)}, "latest"]))
+    responses = w3.provider.make_batch_request(requests)  # type: ignore
+    errors = [response["error"] for response in responses if "error" in response]
+    if errors:
+        raise ValueError(f"read balances failed: {errors[0]}")
+    return {
+        key: Decimal(
+            int(response["result"], 16) if token_addresses[key[1]] is None else decode_uint256(response["result"])
+        ) / Decimal(10 ** decimals[key[1]])
+        for key, response in zip(keys, responses)
+    }
+
+
+def check_assertions(
+    assertions: list[BalanceAssertion],
+    changes: dict[tuple[str, str], Decimal],
+    wallet: str,
+) -> Optional[str]:
+    """检查余额变化，全部满足时返回 None，否则返回第一条不满足的原因"""
+    for assertion in assertions:
+        key = (assertion.account or wallet, assertion.token)
+        actual = float(changes[key])
+        if not assertion.check(actual):
+            return f"{assertion.token} balance of {key[0]} changed by {actual}, expected {assertion}"
+    return None
+
+
+def receipt_changes(assertions: list[BalanceAssertion], deltas: dict[DeltaKey, int], wallet: str) -> dict[tuple[str, str], Decimal]:
+    """从回执计算的余额变化中取出断言涉及的部分，单位为代币数量"""
+    return {
+        (assertion.account or wallet, assertion.token): Decimal(
+            deltas.get((Web3.to_checksum_address(assertion.account or wallet), assertion.token_address, None), 0)
+        ) / Decimal(10 ** assertion.decimals)  # type: ignore
+        for assertion in assertions
+    }
+
+
+def evaluate_by_rules(
+    benchmark_item: BenchmarkItem,
+    answer: str,
+    account: LocalAccount,
+    w3: Web3,
+    bind_address: Optional[str] = None,
+    impersonate: bool = False,
+    backend: ExecutionBackend = ExecutionBackend.SEQUENTIAL,
+    state_diffs: Optional[list[StateDiff]] = None,
+) -> Optional[tuple[bool, str]]:
+    """
+    规则评估，优先使用 BenchmarkItem.assertions，没有时从 criteria 文本解析
+
+    给出 state_diffs 时把已执行交易的状态差异 (prestateTracer) 追加到其中，模拟执行时没有状态差异。
+    storage_assertions 用同一份状态差异检查，模拟执行或节点不支持 prestateTracer 时交给 LLM。
+
+    Returns:
+        (是否通过, 原因)，规则无法判定时返回 None
+    """
+    if not answer or not answer.strip():
+        return False, "not tx provided"
+    tx_list = extract_tx_list(answer)
+    if not tx_list:
+        # 提取器不认识的回答格式交给 LLM 判断
+        return None
+
+    if benchmark_item.assertions or benchmark_item.storage_assertions:
+        # 结构化断言代替 criteria 文本
+        assertions, contracts, fully_parsed = benchmark_item.assertions or [], [], True
+    else:
+        assertions, contracts, fully_parsed = parse_criteria(benchmark_item.criteria)
+    wallet = Web3.to_checksum_address(bind_address) if bind_address else account.address
+
+    # 余额变化默认从交易回执和调用追踪中计算，不读取余额；模拟执行时余额随模拟请求一起返回，
+    # 断言涉及原生 ETH 而节点不支持调用追踪时退回到执行前后各读一次余额
+    reads_balances = backend == ExecutionBackend.SIMULATE or (
+        any(assertion.token_address is None for assertion in assertions) and not traces_supported(w3)
+    )
+    before = read_balances(w3, assertions, wallet) if assertions and reads_balances else {}
+    after = None
+    receipts: list[Any] = []
+    try:
+        if backend == ExecutionBackend.SIMULATE:
+            # 模拟执行在同一次请求中读出执行后的余额，链上状态不变
+            probes = [
+                (Web3.to_checksum_address(assertion.account or wallet), assertion.token_address and Web3.to_checksum_address(assertion.token_address))
+                for assertion in assertions
+            ]
+            simulation = simulate_tx_list(tx_list, account, w3, bind_address, impersonate, probes)
+            failed_index, total_gas_used = simulation.failed_index, simulation.gas_used
+            after = {
+                (assertion.account or wallet, assertion.token): Decimal(simulation.balances[probe]) / Decimal(10 ** assertion.decimals)  # type: ignore
+                for assertion, probe in zip(assertions, probes)
+            }
+        else:
+            failed_index, total_gas_used = execute_tx_list(tx_list, account, w3, bind_address, impersonate, backend, receipts)
+    except Exception as e:
+        print(f"规则评估执行交易出错: {e}")
+        return None
+    storage_assertions = benchmark_item.storage_assertions or []
+    captured = capture_state_diffs(w3, receipts) if receipts and (state_diffs is not None or storage_assertions) else None
+    if state_diffs is not None and captured:
+        state_diffs.extend(captured)
+    if failed_index is not None:
+        return False, f"transaction {failed_index} reverted: {tx_list[failed_index]}\n{describe_tx_list(tx_list)}"
+
+    # criteria 未被完全识别时，余额不符也可能是 criteria 表述不严谨，交给 LLM 判断
+    if not fully_parsed or not (assertions or storage_assertions):
+        return None
+    # 只能确认交易直接调用的合约，经由路由间接交互的合约无法确认时同样交给 LLM 判断
+    called = {Web3.to_checksum_address(tx["to"]) for tx in tx_list if tx.get("to")}
+    if any(contract not in called for contract in contracts):
+        return None
+    if storage_assertions:
+        if captured is None:
+            return None
+        failure = check_storage_assertions(w3, storage_assertions, merge_state_diffs(captured), wallet)
+        if failure:
+            return False, failure
+    if not assertions:
+        details = ", ".join(str(assertion) for assertion in storage_assertions)
+        return True, f"all transactions executed (gas used: {total_gas_used}), storage changes match: {details}"
+    deltas = None
+    if reads_balances:
+        if after is None:
+            after = read_balances(w3, assertions, wallet)
+        changes = {key: after[key] - before[key] for key in after}
+    else:
+        deltas = receipt_deltas(w3, receipts)
+        if deltas is None:
+            # 没有调用追踪时 WETH 取出的 ETH 去向不明，交给 LLM 判断
+            return None
+        changes = receipt_changes(assertions, deltas, wallet)
+    failure = check_assertions(assertions, changes, wallet)
+    if failure:
+        if deltas:
+            failure += f"\nbalance changes of {wallet}:\n{describe_deltas(w3, deltas, [wallet])}"
+        return False, failure
+    details = ", ".join(str(assertion) for assertion in [*assertions, *storage_assertions])
+    return True, f"all transactions executed (gas used: {total_gas_used}), balance changes match: {details}"
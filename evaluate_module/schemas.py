@@ -1,7 +1,9 @@
 from math import isclose
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional, Union
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 from enum import Enum
+from web3 import Web3
+from dataset.constants import ERC20_TOKENS_ETH
 
 class EvaluateTarget(Enum):
     ANSWER = "ANSWER"
@@ -9,6 +11,16 @@ class EvaluateTarget(Enum):
     TOOL_USE = "TOOL_USE"
     SOURCES = "SOURCES"
 
+class ExecutionBackend(Enum):
+    SEQUENTIAL = "sequential"   # 逐笔发送并等待回执
+    BUNDLE = "bundle"           # 整个交易列表在同一个区块中执行
+    SIMULATE = "simulate"       # eth_simulateV1 模拟执行，不改变链上状态
+
+class Transport(Enum):
+    HTTP = "http"   # http://host:port
+    WS = "ws"       # ws://host:port，与 HTTP 同一端口
+    IPC = "ipc"     # anvil --ipc 的 unix socket
+
 class ToolUse(BaseModel):
     call_id: str
     tool_name:str
@@ -100,6 +112,111 @@ class AnvilConfig(BaseModel):
     fork_block_number: str = Field(description="The fork block number")
     balance: str = Field(description="The balance of the account")
     port: int = Field(description="The port of the anvil")
+    transport: Transport = Field(description="How evaluators talk to the anvil", default=Transport.HTTP)
+    ipc_path: Optional[str] = Field(description="IPC socket path, {port} is replaced by the node port", default=None)
+
+class Comparison(Enum):
+    APPROX = "approx"   # |actual - delta| <= |delta| * tolerance
+    GTE = "gte"         # actual >= delta
+    LTE = "lte"         # actual <= delta
+
+
+class BalanceAssertion(BaseModel):
+    token: str = Field(description="Token symbol from ERC20_TOKENS_ETH, ETH for the native balance, or a token address")
+    account: Optional[str] = Field(default=None, description="Account to check, defaults to the wallet executing the txs")
+    delta: float = Field(description="Expected balance change in token units, negative for a decrease")
+    tolerance: float = Field(default=0.0, ge=0, description="Relative tolerance of the change, 0.01 means 1%")
+    comparison: Comparison = Comparison.APPROX
+    decimals: Optional[int] = Field(default=None, description="Token decimals, required when token is an address")
+
+    # 编译结果: 代币合约地址 (原生 ETH 为 None)
+    _token_address: Optional[str] = PrivateAttr(default=None)
+
+    @model_validator(mode='after')
+    def compile(self):
+        """Resolve the token and account once, so a bad assertion fails at dataset load"""
+        if Web3.is_address(self.token):
+            if self.decimals is None:
+                raise ValueError(f"Field 'decimals' is required for token address {self.token}")
+            self._token_address = Web3.to_checksum_address(self.token)
+        else:
+            self.token = self.token.upper()
+            if self.token == "ETH":
+                self.decimals = 18
+            elif self.token in ERC20_TOKENS_ETH:
+                token_address, decimals = ERC20_TOKENS_ETH[self.token]
+                self._token_address = Web3.to_checksum_address(token_address)
+                self.decimals = decimals
+            else:
+                raise ValueError(f"Unknown token '{self.token}', use a symbol from ERC20_TOKENS_ETH or a token address")
+        if self.account is not None:
+            if not Web3.is_address(self.account):
+                raise ValueError(f"Invalid account address '{self.account}'")
+            self.account = Web3.to_checksum_address(self.account)
+        return self
+
+    @property
+    def token_address(self) -> Optional[str]:
+        return self._token_address
+
+    def check(self, actual_delta: float) -> bool:
+        if self.comparison == Comparison.GTE:
+            return actual_delta >= self.delta
+        if self.comparison == Comparison.LTE:
+            return actual_delta <= self.delta
+        # 容差为 0 时仍允许 stETH 之类份额代币的舍入误差
+        return abs(actual_delta - self.delta) <= abs(self.delta) * max(self.tolerance, 1e-9)
+
+    def __str__(self) -> str:
+        target = f"{self.account} " if self.account else ""
+        if self.comparison == Comparison.APPROX:
+            return f"{target}{self.token} {self.delta:+} (±{self.tolerance:.0%})"
+        return f"{target}{self.token} {self.comparison.value} {self.delta:+}"
+
+class StorageAssertion(BaseModel):
+    """
+    存储层面的断言，用已执行交易的状态差异 (prestateTracer) 检查，例如授权额度、借贷仓位
+
+    存储槽直接给出 slot，或给出 Solidity mapping 的 base_slot 和各层 key (按 mapping_slot 计算)；
+    key 为 "wallet" 时替换为执行交易的钱包地址。
+    """
+    address: str = Field(description="Contract whose storage is checked")
+    slot: Optional[int] = Field(default=None, description="Raw storage slot")
+    base_slot: Optional[int] = Field(default=None, description="Declaration slot of a mapping, e.g. allowance")
+    keys: List[str] = Field(default_factory=list, description="Mapping keys from outermost, 'wallet' is the wallet executing the txs")
+    expected: Optional[int] = Field(default=None, description="Expected raw value after execution, None only requires the slot to change")
+    tolerance: float = Field(default=0.0, ge=0, description="Relative tolerance of the expected value")
+    comparison: Comparison = Comparison.APPROX
+    description: str = Field(default="", description="What the slot holds, shown in the evaluation reason")
+
+    @model_validator(mode='after')
+    def compile(self):
+        if not Web3.is_address(self.address):
+            raise ValueError(f"Invalid contract address '{self.address}'")
+        self.address = Web3.to_checksum_address(self.address)
+        if (self.slot is None) == (self.base_slot is None):
+            raise ValueError("Exactly one of 'slot' and 'base_slot' is required")
+        if self.slot is not None and self.keys:
+            raise ValueError("Field 'keys' requires 'base_slot'")
+        return self
+
+    def check(self, after: int) -> bool:
+        if self.expected is None:
+            return True
+        if self.comparison == Comparison.GTE:
+            return after >= self.expected
+        if self.comparison == Comparison.LTE:
+            return after <= self.expected
+        return abs(after - self.expected) <= abs(self.expected) * self.tolerance
+
+    def __str__(self) -> str:
+        target = self.description or f"{self.address} slot"
+        if self.expected is None:
+            return f"{target} changed"
+        if self.comparison == Comparison.APPROX:
+            return f"{target} = {self.expected} (±{self.tolerance:.0%})"
+        return f"{target} {self.comparison.value} {self.expected}"
+
 
 class BenchmarkItem(BaseModel):
     task_id: str
@@ -110,6 +227,8 @@ class BenchmarkItem(BaseModel):
     criteria: str = Field(description="The criteria to be evaluated")
     anvil_config: Optional[AnvilConfig] = Field(description="The anvil config", default=None)
     bind_address:Optional[str] = None
+    assertions: Optional[List[BalanceAssertion]] = Field(description="Machine-checkable balance changes, used by the rule evaluator instead of parsing criteria", default=None)
+    storage_assertions: Optional[List[StorageAssertion]] = Field(description="Machine-checkable storage effects (allowances, positions), checked against the executed txs' state diff", default=None)
 
     
 
@@ -206,4 +325,102 @@ class EvaluateResult(BaseModel):
                 raise ValueError("Field 'error' cannot be None when status is 'failed'")
         else:
             raise ValueError("Field 'status' must be either 'success' or 'failed'")
-        return self
\ No newline at end of file
+        return self
+
+
+class SimulatedCall(BaseModel):
+    success: bool
+    gas_used: int
+    logs: list[dict] = Field(default_factory=list)
+    error: Optional[str] = None
+    fee: int = Field(default=0, description="Gas fee paid by the sender in wei, gas used * effective gas price")
+
+
+class SimulationResult(BaseModel):
+    """交易列表模拟执行的结果，链上状态不变"""
+    calls: list[SimulatedCall]
+    # (账户地址, 代币地址，原生 ETH 为 None) -> 执行后的余额 (最小单位)
+    balances: dict[tuple[str, Optional[str]], int] = Field(default_factory=dict)
+    method: str = Field(description="eth_simulateV1 or snapshot")
+
+    @property
+    def failed_index(self) -> Optional[int]:
+        return next((index for index, call in enumerate(self.calls) if not call.success), None)
+
+    @property
+    def gas_used(self) -> int:
+        return sum(call.gas_used for call in self.calls if call.success)
+
+
+def _slot_key(slot: Union[int, str]) -> int:
+    return int(slot, 16) if isinstance(slot, str) else slot
+
+
+class AccountDiff(BaseModel):
+    """一个账户在交易前后的状态，未变化的字段 before == after"""
+    balance: tuple[int, int] = (0, 0)
+    nonce: tuple[int, int] = (0, 0)
+    code_changed: bool = False
+    # 存储槽 -> (执行前, 执行后)，只包含发生变化的槽
+    storage: dict[int, tuple[int, int]] = Field(default_factory=dict)
+
+
+class StateDiff(BaseModel):
+    """prestateTracer diffMode 得到的状态差异: 地址 -> 账户差异，多笔交易的差异可以依次合并"""
+    accounts: dict[str, AccountDiff] = Field(default_factory=dict)
+
+    def account(self, address: str) -> Optional[AccountDiff]:
+        return self.accounts.get(Web3.to_checksum_address(address))
+
+    def slot(self, address: str, slot: Union[int, str]) -> Optional[tuple[int, int]]:
+        """存储槽的 (执行前, 执行后)，未变化时为 None"""
+        account = self.account(address)
+        return account.storage.get(_slot_key(slot)) if account else None
+
+    def changed(self, address: str, slot: Union[int, str, None] = None) -> bool:
+        """slot 为 None 时判断账户的余额、nonce、代码或任一存储槽是否变化"""
+        account = self.account(address)
+        if account is None:
+            return False
+        if slot is not None:
+            return _slot_key(slot) in account.storage
+        return bool(account.storage) or account.code_changed or account.balance[0] != account.balance[1] or account.nonce[0] != account.nonce[1]
+
+    def balance_change(self, address: str) -> int:
+        account = self.account(address)
+        return account.balance[1] - account.balance[0] if account else 0
+
+    def merge(self, other: "StateDiff") -> "StateDiff":
+        """按执行顺序合并: 执行前取自 self，执行后取自 other，最终未变化的存储槽被去掉"""
+        accounts = {address: account.model_copy(deep=True) for address, account in self.accounts.items()}
+        for address, later in other.accounts.items():
+            earlier = accounts.get(address)
+            if earlier is None:
+                accounts[address] = later.model_copy(deep=True)
+                continue
+            earlier.balance = (earlier.balance[0], later.balance[1])
+            earlier.nonce = (earlier.nonce[0], later.nonce[1])
+            earlier.code_changed = earlier.code_changed or later.code_changed
+            for slot, (before, after) in later.storage.items():
+                before = earlier.storage.get(slot, (before, after))[0]
+                if before == after:
+                    earlier.storage.pop(slot, None)
+                else:
+                    earlier.storage[slot] = (before, after)
+        return StateDiff(accounts=accounts)
+
+    def to_compact(self) -> dict[str, dict]:
+        """JSON 友好的紧凑形式: 地址 -> {"balance", "nonce", "storage": {槽: [执行前, 执行后]}}，数值为十六进制，未变化的字段省略"""
+        compact: dict[str, dict] = {}
+        for address, account in self.accounts.items():
+            entry: dict = {}
+            if account.balance[0] != account.balance[1]:
+                entry["balance"] = [hex(value) for value in account.balance]
+            if account.nonce[0] != account.nonce[1]:
+                entry["nonce"] = list(account.nonce)
+            if account.code_changed:
+                entry["code_changed"] = True
+            if account.storage:
+                entry["storage"] = {hex(slot): [hex(before), hex(after)] for slot, (before, after) in account.storage.items()}
+            compact[address] = entry
+        return compact
@@ -0,0 +1,218 @@
+"""
+交易列表的无状态模拟执行
+
+优先使用 eth_simulateV1 在一个模拟区块中依次执行交易，并在其后追加余额查询调用，
+一次请求拿到每笔交易的状态、gas、日志和执行后的余额，链上状态不变。
+模拟调用不收手续费，ETH 余额按 gas used * 实际 gas 价格扣除发送方的手续费，与真实执行一致。
+节点不支持 eth_simulateV1，或要读 ETH 余额而节点上没有 Multicall3 时，退化为 快照 -> 执行 -> 读余额 -> 回滚。
+"""
+import json
+from typing import Any, Optional
+from eth_account.signers.local import LocalAccount
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+from dataset.constants import MULTICALL3_ADDRESS
+from evaluate_module.schemas import SimulatedCall, SimulationResult
+from evaluate_utils.balance_util import has_multicall
+from evaluate_utils.erc20_codec import decode_uint256, encode_balance_of, encode_get_eth_balance
+from execute import prepare_transaction, send_transaction, wait_for_receipt
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+METHOD_NOT_FOUND = -32601
+# 单个调用的 gas 上限，validation 关闭时不需要真实的 gas 估算
+SIMULATE_CALL_GAS = 30_000_000
+
+# 不支持 eth_simulateV1 的节点，避免每次都先失败一次
+_unsupported_endpoints: set[str] = set()
+
+BalanceProbe = tuple[str, Optional[str]]
+
+
+def _balance_call(account: str, token_address: Optional[str]) -> dict[str, str]:
+    if token_address is None:
+        return {"to": MULTICALL3_ADDRESS, "data": encode_get_eth_balance(account)}
+    return {"to": token_address, "data": encode_balance_of(account)}
+
+
+def _to_call(tx: dict[str, Any]) -> dict[str, Any]:
+    """prepare_transaction 补全后的交易转为 eth_simulateV1 的调用，nonce 和手续费交给模拟器"""
+    call = {"from": tx["from"], "to": tx["to"], "data": tx.get("data") or "0x"}
+    call["value"] = hex(int(tx.get("value") or 0))
+    call["gas"] = hex(int(tx.get("gas") or SIMULATE_CALL_GAS))
+    return call
+
+
+def _effective_gas_price(tx: dict[str, Any], base_fee: int) -> int:
+    if tx.get("gasPrice") is not None:
+        return int(tx["gasPrice"])
+    price = base_fee + int(tx.get("maxPriorityFeePerGas") or 0)
+    return min(int(tx["maxFeePerGas"]), price) if tx.get("maxFeePerGas") is not None else price
+
+
+def _simulate_v1(w3: Web3, txs: list[dict[str, Any]], probes: list[BalanceProbe]) -> SimulationResult:
+    calls = [_to_call(tx) for tx in txs] + [_balance_call(*probe) for probe in probes]
+    payload = {
+        "blockStateCalls": [{"calls": calls}],
+        "validation": False,
+        # 原生 ETH 转账以 Transfer 日志的形式出现 (地址为 0xEeee...EEeE)
+        "traceTransfers": True,
+    }
+    # 与当前区块头一起请求，base fee 用于计算手续费
+    responses = w3.provider.make_batch_request([  # type: ignore
+        ("eth_simulateV1", [payload, "latest"]),
+        ("eth_getBlockByNumber", ["latest", False]),
+    ])
+    if not isinstance(responses, list):
+        raise Web3RPCError(str(responses.get("error")), rpc_response=responses)
+    response, block = responses
+    if "error" in response:
+        raise Web3RPCError(str(response["error"]), rpc_response=response)
+    results = response["result"][0]["calls"]
+    base_fee = int((block.get("result") or {}).get("baseFeePerGas") or "0x0", 16)
+
+    simulated = []
+    for tx, result in zip(txs, results[:len(txs)]):
+        error = result.get("error")
+        gas_used = int(result["gasUsed"], 16)
+        simulated.append(SimulatedCall(
+            success=int(result["status"], 16) == 1,
+            gas_used=gas_used,
+            logs=result.get("logs") or [],
+            error=error.get("message") if isinstance(error, dict) else error,
+            fee=gas_used * _effective_gas_price(tx, base_fee),
+        ))
+    balances = {
+        probe: decode_uint256(result["returnData"])
+        for probe, result in zip(probes, results[len(txs):])
+    }
+    # 模拟调用没有扣除手续费，从发送方的 ETH 余额中补扣
+    for (account, token) in balances:
+        if token is None:
+            balances[(account, token)] -= sum(call.fee for tx, call in zip(txs, simulated) if tx["from"].lower() == account.lower())
+    return SimulationResult(calls=simulated, balances=balances, method="eth_simulateV1")
+
+
+def _read_balances(w3: Web3, probes: list[BalanceProbe]) -> dict[BalanceProbe, int]:
+    if not probes:
+        return {}
+    # 真实执行后直接读 ETH 余额，不依赖 Multicall3
+    responses = w3.provider.make_batch_request(  # type: ignore
+        [
+            ("eth_getBalance", [account, "latest"]) if token is None else ("eth_call", [_balance_call(account, token), "latest"])
+            for account, token in probes
+        ]
+    )
+    return {
+        probe: int(response["result"], 16) if probe[1] is None else decode_uint256(response["result"])
+        for probe, response in zip(probes, responses)
+    }
+
+
+def _simulate_with_snapshot(
+    w3: Web3,
+    txs: list[dict[str, Any]],
+    signers: list[LocalAccount],
+    probes: list[BalanceProbe],
+    impersonate: bool,
+) -> SimulationResult:
+    """在快照上真实执行，读取余额后回滚"""
+    snapshot_id = w3.provider.make_request("evm_snapshot", [])["result"]  # type: ignore
+    try:
+        simulated = []
+        for tx, signer in zip(txs, signers):
+            try:
+                receipt = wait_for_receipt(w3, send_transaction(tx, signer, w3, impersonate))
+            except Exception as e:
+                simulated.append(SimulatedCall(success=False, gas_used=0, error=str(e)))
+                break
+            simulated.append(SimulatedCall(
+                success=receipt["status"] == 1,
+                gas_used=receipt["gasUsed"],
+                logs=[json.loads(Web3.to_json(log)) for log in receipt["logs"]],  # type: ignore
+                fee=receipt["gasUsed"] * receipt.get("effectiveGasPrice", 0),
+            ))
+            if receipt["status"] != 1:
+                break
+        return SimulationResult(calls=simulated, balances=_read_balances(w3, probes), method="snapshot")
+    finally:
+        w3.provider.make_request("evm_revert", [snapshot_id])  # type: ignore
+
+
+def simulate_tx_list(
+    tx_list: list[dict],
+    account: LocalAccount,
+    w3: Web3,
+    bind_address: Optional[str] = None,
+    impersonate: bool = False,
+    probes: Optional[list[BalanceProbe]] = None,
+) -> SimulationResult:
+    """
+    模拟执行交易列表，返回每笔交易的结果和 probes 中 (账户, 代币地址) 执行后的余额
+
+    交易的发送地址与 sign_and_send_transaction 的规则一致。
+    """
+    probes = [(Web3.to_checksum_address(account_address), token and Web3.to_checksum_address(token))
+              for account_address, token in probes or []]
+    nonces: dict[str, int] = {}
+    txs, signers = [], []
+    for tx in tx_list:
+        prepared, signer = prepare_transaction(tx, account, w3, bind_address, impersonate, nonces)
+        if prepared is None:
+            break
+        txs.append(prepared)
+        signers.append(signer)
+
+    endpoint = getattr(w3.provider, "endpoint_uri", "")
+    # 模拟区块中的 ETH 余额通过 Multicall3.getEthBalance 读取
+    eth_readable = all(token is not None for _, token in probes) or has_multicall(w3)
+    if endpoint not in _unsupported_endpoints and eth_readable:
+        try:
+            result = _simulate_v1(w3, txs, probes)
+        except Web3RPCError as e:
+            print(f"eth_simulateV1 failed on {endpoint}, falling back to snapshots: {e}")
+            error = (e.rpc_response or {}).get("error")
+            if isinstance(error, dict) and error.get("code") == METHOD_NOT_FOUND:
+                _unsupported_endpoints.add(endpoint)
+        else:
+            return _with_missing_to(result, len(tx_list))
+    return _with_missing_to(_simulate_with_snapshot(w3, txs, signers, probes, impersonate), len(tx_list))
+
+
+def _with_missing_to(result: SimulationResult, tx_count: int) -> SimulationResult:
+    """没有 to 地址的交易不会被执行，记为失败"""
+    if len(result.calls) < tx_count and result.failed_index is None:
+        result.calls.append(SimulatedCall(success=False, gas_used=0, error="No 'to' address specified"))
+    return result
+
+
+def transfers(call: SimulatedCall) -> list[tuple[str, str, str, int]]:
+    """调用日志中的 Transfer 事件: (代币地址, from, to, 数量)，原生 ETH 的代币地址为 0xEeee...EEeE"""
+    result = []
+    for log in call.logs:
+        topics = log.get("topics") or []
+        # ERC721 的 tokenId 在 topics 中，data 为空
+        if len(topics) != 3 or topics[0] != TRANSFER_TOPIC or log.get("data") in (None, "0x"):
+            continue
+        result.append((
+            Web3.to_checksum_address(log["address"]),
+            Web3.to_checksum_address("0x" + topics[1][-40:]),
+            Web3.to_checksum_address("0x" + topics[2][-40:]),
+            int(log["data"], 16),
+        ))
+    return result
+
+
+def describe_simulation(result: SimulationResult, before: Optional[dict[BalanceProbe, int]] = None) -> str:
+    """模拟结果的文字描述，供评估智能体阅读；给出执行前的余额 before 时附上余额变化"""
+    lines = ["Transactions were simulated without changing chain state, get_balances still returns the balances before execution."]
+    for index, call in enumerate(result.calls):
+        status = "success" if call.success else f"reverted ({call.error})" if call.error else "reverted"
+        lines.append(f"tx {index}: {status}, gas used: {call.gas_used}, fee: {call.fee} wei")
+        for token, sender, receiver, amount in transfers(call):
+            lines.append(f"  transfer {amount} (raw units) of {token} from {sender} to {receiver}")
+    for (account, token), balance in result.balances.items():
+        line = f"balance after execution: {account} {token or 'ETH'} = {balance} (raw units)"
+        if before and (account, token) in before:
+            line += f", change: {balance - before[(account, token)]:+}"
+        lines.append(line)
+    return "\n".join(lines)
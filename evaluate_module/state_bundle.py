@@ -0,0 +1,296 @@
+"""
+离线 anvil 状态包
+
+每个任务在 fork 节点上完整跑一遍参考评估，记录其间访问过的账户和存储槽，
+再在同一区块的新 fork 上只读取这些位置并 anvil_dumpState，得到任务的初始状态。
+状态以 gzip 压缩、按内容 sha256 命名存放在 dataset/state_bundles/ 下，
+评估时用 `anvil --load-state` 启动不 fork 的节点，不再依赖上游归档节点。
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+from web3 import Web3
+from dataset.constants import RPC_URL
+from evaluate_module.schemas import AgentOutputItem
+from evaluate_module.anvil_pool import spawn_anvil
+from evaluate_module.evaluator import load_evaluate_data, load_task_dependencies
+from evaluate_module.validate_agent import execute_pre_script
+from evaluate_utils.rpc_util import get_web3, run_sync, use_endpoint
+
+STATE_BUNDLE_DIR = "dataset/state_bundles"
+MANIFEST_FILE = "manifest.json"
+
+
+def dump_state(w3: Web3) -> dict[str, Any]:
+    """anvil_dumpState 返回 (gzip 压缩的) JSON 状态的十六进制编码"""
+    raw = bytes.fromhex(w3.provider.make_request("anvil_dumpState", [])["result"].removeprefix("0x"))  # type: ignore
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    return json.loads(raw)
+
+
+def touched_locations(state: dict[str, Any]) -> dict[str, set[str]]:
+    """状态中出现的账户及其存储槽"""
+    return {
+        address: set((account.get("storage") or {}).keys())
+        for address, account in state.get("accounts", {}).items()
+    }
+
+
+def merge_states(states: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    合并同一区块的多个状态，账户和存储槽取并集
+
+    区块等其余字段取第一个状态的值。
+    """
+    if not states:
+        return {}
+    merged = dict(states[0])
+    accounts: dict[str, dict[str, Any]] = {}
+    for state in states:
+        for address, account in state.get("accounts", {}).items():
+            existing = accounts.setdefault(address, {**account, "storage": {}})
+            existing["storage"].update(account.get("storage") or {})
+    merged["accounts"] = accounts
+    return merged
+
+
+class StateBundleStore:
+    """
+    按内容寻址的状态包仓库
+
+    manifest.json 记录链信息和任务到状态包的映射:
+    {"chains": {"ethereum": {"chain_id", "block_number", "timestamp"}}, "tasks": {task_id: {"chain", "state"}}}
+    """
+
+    def __init__(self, root: str = STATE_BUNDLE_DIR) -> None:
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_FILE
+        self.manifest: dict[str, dict[str, Any]] = {"chains": {}, "tasks": {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+
+    def save_manifest(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+
+    def put(self, state: dict[str, Any]) -> str:
+        """写入状态并返回其 sha256，内容相同的状态只存一份"""
+        data = json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.root / f"{digest}.json.gz"
+        if not path.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            # mtime 固定为 0，同样的状态得到同样的文件
+            path.write_bytes(gzip.compress(data, mtime=0))
+        return digest
+
+    def get(self, digest: str) -> dict[str, Any]:
+        data = gzip.decompress((self.root / f"{digest}.json.gz").read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"State bundle {digest} is corrupted")
+        return json.loads(data)
+
+    def add_task(self, task_id: str, chain: str, state: dict[str, Any]) -> str:
+        digest = self.put(state)
+        self.manifest["tasks"][task_id] = {"chain": chain, "state": digest}
+        return digest
+
+    def task_ids(self, chain: str) -> list[str]:
+        return [task_id for task_id, entry in self.manifest["tasks"].items() if entry["chain"] == chain]
+
+    def chain_state(self, chain: str, task_ids: Optional[list[str]] = None) -> dict[str, Any]:
+        """合并链上全部 (或指定) 任务的状态，供一个 anvil 节点评估所有任务"""
+        task_ids = task_ids if task_ids is not None else self.task_ids(chain)
+        digests = dict.fromkeys(self.manifest["tasks"][task_id]["state"] for task_id in task_ids)
+        return merge_states([self.get(digest) for digest in digests])
+
+    def write_load_state(self, chain: str, path: str, task_ids: Optional[list[str]] = None) -> str:
+        """写出 anvil --load-state 可直接读取的未压缩状态文件"""
+        with open(path, "w") as f:
+            json.dump(self.chain_state(chain, task_ids), f)
+        return path
+
+    def anvil_command(self, chain: str, state_path: str, port: int = 8545, host: str = "127.0.0.1") -> list[str]:
+        """不带 --fork-url 的 anvil 启动参数"""
+        info = self.manifest["chains"][chain]
+        return [
+            "anvil",
+            "--load-state", state_path,
+            "--chain-id", str(info["chain_id"]),
+            "--timestamp", str(info["timestamp"]),
+            "--host", host,
+            "--port", str(port),
+        ]
+
+
+def start_offline_anvil(
+    store: StateBundleStore,
+    chain: str = "ethereum",
+    port: int = 8545,
+    host: str = "127.0.0.1",
+    task_ids: Optional[list[str]] = None,
+    timeout: float = 60,
+) -> subprocess.Popen:
+    """用状态包启动一个离线 anvil 并等待其就绪，调用方负责 terminate()"""
+    fd, state_path = tempfile.mkstemp(prefix=f"anvil-{chain}-", suffix=".json")
+    os.close(fd)
+    store.write_load_state(chain, state_path, task_ids)
+    try:
+        process = spawn_anvil(store.anvil_command(chain, state_path, port, host), f"http://{host}:{port}", timeout)
+    finally:
+        # anvil 启动时已读入状态文件
+        os.remove(state_path)
+    return process
+
+
+def _fork_reset(w3: Web3, fork_url: str, fork_block_number: int) -> None:
+    w3.provider.make_request("anvil_reset", [{"forking": {"jsonRpcUrl": fork_url, "blockNumber": fork_block_number}}])  # type: ignore
+
+
+async def _reference_run(w3: Web3, task_id: str, reference_outputs: list[AgentOutputItem], evaluator: Any) -> dict[str, set[str]]:
+    """在当前 fork 上跑一遍任务，返回访问过的账户和存储槽"""
+    touched: dict[str, set[str]] = {}
+
+    def collect() -> None:
+        # 回滚快照会丢弃 fork 缓存，每次评估后立即收集
+        for address, slots in touched_locations(dump_state(w3)).items():
+            touched.setdefault(address, set()).update(slots)
+
+    if evaluator is not None and reference_outputs:
+        for output in reference_outputs:
+            await evaluator.evaluate_single(output, keep_task_state=True)
+            await run_sync(collect)
+        await run_sync(evaluator.reset_chain)
+        return touched
+
+    _, _, get_balances, pre_script = load_task_dependencies(task_id)
+    if pre_script:
+        await run_sync(execute_pre_script, pre_script)
+    if get_balances:
+        await get_balances()
+    await run_sync(collect)
+    return touched
+
+
+def _warm(w3: Web3, touched: dict[str, set[str]]) -> None:
+    """在新 fork 上读取所有访问过的位置，把它们拉进本地状态"""
+    with w3.batch_requests() as batch:
+        for address, slots in touched.items():
+            address = Web3.to_checksum_address(address)
+            batch.add(w3.eth.get_balance(address))
+            batch.add(w3.eth.get_transaction_count(address))
+            batch.add(w3.eth.get_code(address))
+            for slot in slots:
+                batch.add(w3.eth.get_storage_at(address, int(slot, 16)))
+        batch.execute()
+
+
+async def build_task_bundle(
+    task_id: str,
+    fork_url: str,
+    fork_block_number: int,
+    rpc_url: str = RPC_URL,
+    reference_outputs: Optional[list[AgentOutputItem]] = None,
+    evaluator: Any = None,
+) -> dict[str, Any]:
+    """
+    构建单个任务的初始状态
+
+    第一遍在 fork 上执行 pre_script 和参考评估 (没有参考输出时只执行 pre_script 和 get_balances)，
+    第二遍在同一区块的新 fork 上读取第一遍访问过的位置后导出，因此状态是 pre_script 执行前的值。
+    """
+    w3 = get_web3(rpc_url)
+    with use_endpoint(rpc_url):
+        await run_sync(_fork_reset, w3, fork_url, fork_block_number)
+        touched = await _reference_run(w3, task_id, reference_outputs or [], evaluator)
+        await run_sync(_fork_reset, w3, fork_url, fork_block_number)
+        await run_sync(_warm, w3, touched)
+        return await run_sync(dump_state, w3)
+
+
+async def build_bundles(
+    fork_url: str,
+    fork_block_number: int,
+    chain: str = "ethereum",
+    rpc_url: str = RPC_URL,
+    evaluate_dataset_path: str = "dataset/oce_eval_data.json",
+    reference_outputs_path: Optional[str] = None,
+    task_ids: Optional[list[str]] = None,
+    store: Optional[StateBundleStore] = None,
+) -> StateBundleStore:
+    """为数据集中某条链的任务构建状态包并更新 manifest"""
+    store = store or StateBundleStore()
+    reference_outputs: list[AgentOutputItem] = []
+    evaluator = None
+    if reference_outputs_path:
+        from evaluate_module.oce_evaluator import OCEEvaluator
+        with open(reference_outputs_path, "r") as f:
+            reference_outputs = [AgentOutputItem(**item) for item in json.load(f)]
+        evaluator = OCEEvaluator(rpc_url, evaluate_dataset_path, use_rules=True)
+
+    items = [item for item in load_evaluate_data(evaluate_dataset_path) if item.chain == chain]
+    if task_ids:
+        items = [item for item in items if item.task_id in task_ids]
+
+    w3 = get_web3(rpc_url)
+    _fork_reset(w3, fork_url, fork_block_number)
+    store.manifest["chains"][chain] = {
+        "chain_id": w3.eth.chain_id,
+        "block_number": fork_block_number,
+        "timestamp": w3.eth.get_block(fork_block_number)["timestamp"],  # type: ignore
+    }
+    for item in items:
+        outputs = [output for output in reference_outputs if output.task_id == item.task_id]
+        try:
+            state = await build_task_bundle(item.task_id, fork_url, fork_block_number, rpc_url, outputs, evaluator)
+        except Exception as e:
+            print(f"Build state bundle for task {item.task_id} failed: {e}")
+            continue
+        digest = store.add_task(item.task_id, chain, state)
+        print(f"{item.task_id}: {digest} ({len(state.get('accounts', {}))} accounts)")
+        store.save_manifest()
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build offline anvil state bundles or serve them")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Record task state from a fork anvil at --rpc-url")
+    build_parser.add_argument("--fork-url", required=True)
+    build_parser.add_argument("--fork-block-number", type=int, default=22636495)
+    build_parser.add_argument("--chain", default="ethereum")
+    build_parser.add_argument("--rpc-url", default=RPC_URL)
+    build_parser.add_argument("--dataset", default="dataset/oce_eval_data.json")
+    build_parser.add_argument("--reference-outputs", default=None, help="AgentOutputItem json list used as the reference run")
+    build_parser.add_argument("--task-id", action="append", default=None)
+
+    serve_parser = subparsers.add_parser("serve", help="Start an anvil without fork url from the bundles")
+    serve_parser.add_argument("--chain", default="ethereum")
+    serve_parser.add_argument("--port", type=int, default=8545)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        asyncio.run(build_bundles(
+            fork_url=args.fork_url,
+            fork_block_number=args.fork_block_number,
+            chain=args.chain,
+            rpc_url=args.rpc_url,
+            evaluate_dataset_path=args.dataset,
+            reference_outputs_path=args.reference_outputs,
+            task_ids=args.task_id,
+        ))
+    else:
+        process = start_offline_anvil(StateBundleStore(), args.chain, args.port)
+        print(f"offline anvil started on port {args.port} (pid {process.pid})")
+        process.wait()
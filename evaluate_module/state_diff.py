@@ -0,0 +1,149 @@
+"""
+基于 prestateTracer 的交易状态差异
+
+对已执行的交易用一次批量 debug_traceTransaction (prestateTracer, diffMode) 取回每笔交易修改过的账户余额、nonce、
+代码和存储槽，整理为 StateDiff (地址 -> 存储槽 -> (执行前, 执行后))。验证脚本可以直接断言授权额度、借贷仓位、
+LP 头寸等存储层面的变化，不需要在执行前后分别读取合约。
+"""
+from typing import Any, Optional, Union
+from eth_utils import keccak
+from web3 import Web3
+from evaluate_module.balance_delta import trace_transactions
+from evaluate_module.schemas import AccountDiff, StateDiff, StorageAssertion
+
+PRESTATE_TRACER = "prestateTracer"
+
+
+def _int(value: Union[int, str, None]) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return int(value, 16)
+    return value
+
+
+def _hex_hash(value: Any) -> str:
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    return value
+
+
+def parse_prestate_diff(result: dict[str, Any]) -> StateDiff:
+    """
+    解析 prestateTracer diffMode 的结果
+
+    pre 中是被修改账户的原始状态，post 中只有变化的字段：余额、nonce、代码在 post 中缺失表示未变化，
+    存储槽在 post 中缺失表示被清零，账户不在 post 中表示已被销毁。
+    """
+    pre, post = result.get("pre") or {}, result.get("post") or {}
+    accounts: dict[str, AccountDiff] = {}
+    for address in {**pre, **post}:
+        before = pre.get(address) or {}
+        deleted = address not in post
+        after = post.get(address) or {}
+        balance = _int(before.get("balance"))
+        nonce = _int(before.get("nonce"))
+        storage = {}
+        for slot in {**(before.get("storage") or {}), **(after.get("storage") or {})}:
+            old = _int((before.get("storage") or {}).get(slot))
+            new = _int((after.get("storage") or {}).get(slot))
+            if old != new:
+                storage[int(slot, 16)] = (old, new)
+        accounts[Web3.to_checksum_address(address)] = AccountDiff(
+            balance=(balance, 0 if deleted else _int(after.get("balance", balance))),
+            nonce=(nonce, 0 if deleted else _int(after.get("nonce", nonce))),
+            code_changed=deleted or "code" in after,
+            storage=storage,
+        )
+    return StateDiff(accounts=accounts)
+
+
+def capture_state_diffs(w3: Web3, receipts: list[Any]) -> Optional[list[StateDiff]]:
+    """按执行顺序给出的交易回执，返回每笔交易的状态差异；节点不支持 prestateTracer 时返回 None"""
+    tx_hashes = [_hex_hash(receipt["transactionHash"]) for receipt in receipts]
+    results = trace_transactions(w3, tx_hashes, PRESTATE_TRACER, {"diffMode": True})
+    if results is None:
+        return None
+    return [parse_prestate_diff(result) for result in results]
+
+
+def merge_state_diffs(diffs: list[StateDiff]) -> StateDiff:
+    """多笔交易的状态差异合并为整个交易列表的差异"""
+    merged = StateDiff()
+    for diff in diffs:
+        merged = merged.merge(diff)
+    return merged
+
+
+def _word(key: Union[int, str, bytes]) -> bytes:
+    if isinstance(key, int):
+        return key.to_bytes(32, "big")
+    if isinstance(key, str):
+        key = bytes.fromhex(key.removeprefix("0x"))
+    return key.rjust(32, b"\x00")
+
+
+def mapping_slot(base_slot: int, *keys: Union[int, str, bytes]) -> int:
+    """
+    Solidity mapping 元素的存储槽，多个 key 对应嵌套 mapping
+
+    例如 OpenZeppelin ERC20 的授权额度 allowance[owner][spender] 为 mapping_slot(1, owner, spender)。
+    """
+    slot = base_slot
+    for key in keys:
+        slot = int.from_bytes(keccak(_word(key) + _word(slot)), "big")
+    return slot
+
+
+def assertion_slot(assertion: StorageAssertion, wallet: str) -> int:
+    """存储断言对应的存储槽，key 中的 "wallet" 替换为执行交易的钱包"""
+    if assertion.base_slot is None:
+        return assertion.slot  # type: ignore
+    keys = [wallet if key.lower() == "wallet" else key for key in assertion.keys]
+    return mapping_slot(assertion.base_slot, *(int(key) if key.isdigit() else key for key in keys))
+
+
+def check_storage_assertions(w3: Web3, assertions: list[StorageAssertion], diff: StateDiff, wallet: str) -> Optional[str]:
+    """
+    用状态差异检查存储断言，全部满足时返回 None，否则返回第一条不满足的原因
+
+    未变化的槽的执行后值用一次批量 eth_getStorageAt 读取 (交易已执行，当前值即执行后的值)。
+    """
+    slots = [assertion_slot(assertion, wallet) for assertion in assertions]
+    unchanged = [
+        (assertion.address, slot) for assertion, slot in zip(assertions, slots)
+        if diff.slot(assertion.address, slot) is None and assertion.expected is not None
+    ]
+    current: dict[tuple[str, int], int] = {}
+    if unchanged:
+        responses = w3.provider.make_batch_request([("eth_getStorageAt", [address, hex(slot), "latest"]) for address, slot in unchanged])  # type: ignore
+        current = {key: _int(response.get("result")) for key, response in zip(unchanged, responses)}
+    for assertion, slot in zip(assertions, slots):
+        change = diff.slot(assertion.address, slot)
+        if change is None and assertion.expected is None:
+            return f"{assertion} expected, but slot {hex(slot)} of {assertion.address} did not change"
+        after = change[1] if change is not None else current[(assertion.address, slot)]
+        if not assertion.check(after):
+            return f"{assertion} expected, slot {hex(slot)} of {assertion.address} is {after}"
+    return None
+
+
+def describe_state_diff(diff: StateDiff, max_slots: int = 8) -> str:
+    """状态差异的文字描述，每个账户最多列出 max_slots 个存储槽"""
+    lines = []
+    for address, account in diff.accounts.items():
+        changes = []
+        if account.balance[0] != account.balance[1]:
+            changes.append(f"balance {account.balance[0]} -> {account.balance[1]}")
+        if account.nonce[0] != account.nonce[1]:
+            changes.append(f"nonce {account.nonce[0]} -> {account.nonce[1]}")
+        if account.code_changed:
+            changes.append("code changed")
+        if not changes and not account.storage:
+            continue
+        lines.append(f"{address}: {', '.join(changes) or f'{len(account.storage)} storage slots changed'}")
+        for slot, (before, after) in list(account.storage.items())[:max_slots]:
+            lines.append(f"  slot {hex(slot)}: {hex(before)} -> {hex(after)}")
+        if len(account.storage) > max_slots:
+            lines.append(f"  ... {len(account.storage) - max_slots} more slots")
+    return "\n".join(lines)
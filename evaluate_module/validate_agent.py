@@ -1,12 +1,19 @@
+import asyncio
 from types import ModuleType
 from typing import Any, Callable, Optional
 from openai import AsyncClient
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
 from demo.agent import Agent
 from demo.llm import GeneralLLM
 from demo.tools import Tool, CodeInterpreter
 from pydantic import BaseModel, Field
-from execute import sign_and_send_transaction
+from execute import async_plan_gas_limits, async_sign_and_send_transaction, execute_bundle, plan_gas_limits, sign_and_send_transaction
+from evaluate_module.schemas import ExecutionBackend, StateDiff
+from evaluate_module.simulator import describe_simulation, simulate_tx_list
+from evaluate_module.state_diff import capture_state_diffs, describe_state_diff, merge_state_diffs
+from evaluate_utils.balance_util import balance_probes, record_reads
+from evaluate_utils.calldata_decoder import describe_tx_list
+from evaluate_utils.rpc_util import async_web3_for, route_web3, run_sync
 from eth_account.signers.local import LocalAccount
 
 
@@ -162,23 +169,94 @@ class ExecuteTxTool(Tool):
     required_arguments = ['tx_list']
 
 
-    def __init__(self, account:LocalAccount, w3:Web3, bind_address:Optional[str] = None) -> None:
+    def __init__(self, account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False, backend:ExecutionBackend = ExecutionBackend.SEQUENTIAL, async_w3:Optional[AsyncWeb3] = None, capture_state_diff:bool = False, get_balances:Optional[Callable] = None) -> None:
         super().__init__()
         self.account = account
         self.w3 = w3
+        # 逐笔执行时使用的异步 w3，为空时同步执行放到线程池中
+        self.async_w3 = async_w3
         self.bind_address = bind_address
-    
+        # 以冒充 from 地址的方式执行交易，见 sign_and_send_transaction
+        self.impersonate = impersonate
+        self.backend = backend
+        # 为已执行的交易记录 prestateTracer 状态差异，按执行顺序保存在 state_diffs 中
+        self.capture_state_diff = capture_state_diff
+        self.state_diffs: list[StateDiff] = []
+        # 任务的 get_balances，模拟执行时用其中的余额读取作为探针，返回执行后的余额和变化
+        self.get_balances = get_balances
+
+    async def _balances_before(self) -> dict[tuple[str, Optional[str]], int]:
+        """运行一次 get_balances，取得其读取的余额 (执行前)"""
+        if self.get_balances is None:
+            return {}
+        with record_reads() as recorded:
+            try:
+                await run_sync(asyncio.run, self.get_balances())
+            except Exception as e:
+                print(f"get_balances failed, simulating without balance probes: {e}")
+        return balance_probes(recorded)
+
     async def call_tool(self, arguments:dict) -> str:
         tx_list = arguments.get('tx_list', [])
         if not tx_list:
             return "No transaction provided"
-        total_gas_used = 0
-        for tx in tx_list:
-            success, gas_used = sign_and_send_transaction(tx, self.account, self.w3, self.bind_address)
-            if not success:
-                return f"Transaction execution failed : {tx}"
-            total_gas_used += gas_used
-        return f"Transaction executed successfully, total gas used: {total_gas_used}"
+        # 解码后的交易内容，评估智能体不需要自己解析 calldata
+        decoded = f"Decoded transactions:\n{describe_tx_list(tx_list)}"
+        if self.backend == ExecutionBackend.SIMULATE:
+            before = await self._balances_before()
+            result = await run_sync(simulate_tx_list, tx_list, self.account, self.w3, self.bind_address, self.impersonate, list(before))
+            if result.failed_index is not None:
+                return f"Transaction execution failed : {tx_list[result.failed_index]}\n{describe_simulation(result, before)}\n{decoded}"
+            return f"Transaction executed successfully, total gas used: {result.gas_used}\n{describe_simulation(result, before)}\n{decoded}"
+        receipts: Optional[list[Any]] = [] if self.capture_state_diff else None
+        if self.backend == ExecutionBackend.SEQUENTIAL and self.async_w3 is not None:
+            failed_index, total_gas_used = await async_execute_tx_list(tx_list, self.account, self.async_w3, self.bind_address, self.impersonate, receipts)
+        else:
+            failed_index, total_gas_used = await run_sync(execute_tx_list, tx_list, self.account, self.w3, self.bind_address, self.impersonate, self.backend, receipts)
+        if receipts:
+            diffs = await run_sync(capture_state_diffs, self.w3, receipts) or []
+            self.state_diffs.extend(diffs)
+            if diffs:
+                decoded += f"\nState changes:\n{describe_state_diff(merge_state_diffs(diffs))}"
+        if failed_index is not None:
+            return f"Transaction execution failed : {tx_list[failed_index]}\n{decoded}"
+        return f"Transaction executed successfully, total gas used: {total_gas_used}\n{decoded}"
+
+
+def execute_tx_list(tx_list:list[dict], account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False, backend:ExecutionBackend = ExecutionBackend.SEQUENTIAL, receipts:Optional[list[Any]] = None) -> tuple[Optional[int], int]:
+    """
+    依次执行交易列表，遇到失败的交易立即停止；SIMULATE 时只模拟，不改变链上状态
+    给出 receipts 时按执行顺序收集交易回执 (SIMULATE 没有回执)
+
+    Returns:
+        tuple: (失败交易的下标，全部成功时为 None, 已执行交易的 gas 总和)
+    """
+    if backend == ExecutionBackend.SIMULATE:
+        result = simulate_tx_list(tx_list, account, w3, bind_address, impersonate)
+        return result.failed_index, result.gas_used
+    if backend == ExecutionBackend.BUNDLE:
+        failed_index, gas_used = execute_bundle(tx_list, account, w3, bind_address, impersonate, receipts)
+        return failed_index, sum(gas_used)
+    total_gas_used = 0
+    gas_limits = plan_gas_limits(tx_list, account, w3, bind_address, impersonate)
+    for index, (tx, gas_limit) in enumerate(zip(tx_list, gas_limits)):
+        success, gas_used = sign_and_send_transaction(tx, account, w3, bind_address, impersonate, gas_limit, receipts)
+        if not success:
+            return index, total_gas_used
+        total_gas_used += gas_used
+    return None, total_gas_used
+
+
+async def async_execute_tx_list(tx_list:list[dict], account:LocalAccount, w3:AsyncWeb3, bind_address:Optional[str] = None, impersonate:bool = False, receipts:Optional[list[Any]] = None) -> tuple[Optional[int], int]:
+    """execute_tx_list 逐笔执行的异步版本"""
+    total_gas_used = 0
+    gas_limits = await async_plan_gas_limits(tx_list, account, w3, bind_address, impersonate)
+    for index, (tx, gas_limit) in enumerate(zip(tx_list, gas_limits)):
+        success, gas_used = await async_sign_and_send_transaction(tx, account, w3, bind_address, impersonate, gas_limit, receipts)
+        if not success:
+            return index, total_gas_used
+        total_gas_used += gas_used
+    return None, total_gas_used
 
 
 class GetBalancesTool(Tool):
@@ -188,12 +266,15 @@ class GetBalancesTool(Tool):
 
     required_arguments = []
 
-    def __init__(self, get_balances:Callable) -> None:
+    def __init__(self, get_balances:Callable, backend:ExecutionBackend = ExecutionBackend.SEQUENTIAL) -> None:
         super().__init__()
         self.get_balances = get_balances
+        if backend == ExecutionBackend.SIMULATE:
+            self.description = "get the balance of the account before execution, simulated transactions do not change it"
 
     async def call_tool(self, arguments:dict) -> str:
-        return await self.get_balances()
+        # validate.py 的 get_balances 声明为 async 但内部是同步 w3 调用，在线程池中用独立的事件循环执行
+        return await run_sync(asyncio.run, self.get_balances())
 
 
 INSTRUCTIONS_PROMPT = """You are a validator for a transaction execution. You will be given a list of transactions and you need to validate if they are executed successfully.
@@ -213,6 +294,26 @@ Your final answer should be "FINAL ANSWER: PASS or FAIL\nReason: reason why fail
 Task: {question}
 """
 
+# SIMULATE 时交易不上链，get_balances 始终返回执行前的余额，执行后的余额只在 validate_tx_execution 的输出中
+SIMULATE_INSTRUCTIONS_PROMPT = """You are a validator for a transaction execution. You will be given a list of transactions and you need to validate if they are executed successfully.
+
+Transactions are simulated and never change chain state: `get_balances` always returns the balances before execution.
+
+## How to validate
+1. Check the balances before execution by using the `get_balances` tool
+2. Extract the transaction list from the agent output
+3. Validate the transaction json by using the `validate_tx_execution` tool to simulate the transaction
+4. According to the task and evaluate criteria, identify whether the transactions generated are all correct.
+5. Check the "balance after execution" lines and their changes in the `validate_tx_execution` output to decide whether the balance state after execution satisfies the criteria. Do not call `get_balances` again for this, it does not reflect the simulated transactions.
+
+## Note
+1. If no TX provided, you should just answer "FINAL ANSWER: FAIL\nReason: not tx provided"
+
+Your final answer should be "FINAL ANSWER: PASS or FAIL\nReason: reason why fail or pass"
+
+Task: {question}
+"""
+
 
 
 class EvaluateAgent(Agent):
@@ -221,9 +322,10 @@ class EvaluateAgent(Agent):
         self.w3 = w3
         self.pre_script = pre_script
 
-    async def run(self, question:str, session_id:str = "") -> tuple[str, dict]:
-        if self.pre_script:
-            execute_pre_script(self.pre_script)
+    async def run(self, question:str, session_id:str = "", run_pre_script:bool = True) -> tuple[str, dict]:
+        # 由评估器复用任务快照时，pre_script 已在快照中执行过
+        if self.pre_script and run_pre_script:
+            await run_sync(execute_pre_script, self.pre_script)
         return await super().run(question, session_id)
     
 
@@ -232,9 +334,10 @@ class EvaluateAgent(Agent):
 
 async def get_evaluate_agent(model_name:str, parameters:dict, account:LocalAccount, w3:Web3, get_balances:Callable,pre_script:Optional[ModuleType] = None, bind_address:Optional[str] = None,  *args, **kwargs) -> Agent:
     max_turns = parameters.get("max_turns", 10)
+    backend = parameters.get("backend", ExecutionBackend.SEQUENTIAL)
     selected_tools = {
-        "validate_tx_execution": ExecuteTxTool(account=account, w3=w3, bind_address=bind_address),
-        "get_balances": GetBalancesTool(get_balances=get_balances)
+        "validate_tx_execution": ExecuteTxTool(account=account, w3=w3, bind_address=bind_address, impersonate=parameters.get("impersonate", False), backend=backend, async_w3=async_web3_for(w3), capture_state_diff=parameters.get("capture_state_diff", False), get_balances=get_balances),
+        "get_balances": GetBalancesTool(get_balances=get_balances, backend=backend)
     }
     llm = GeneralLLM(
         provider="openai",
@@ -243,7 +346,8 @@ async def get_evaluate_agent(model_name:str, parameters:dict, account:LocalAccou
         temperature=parameters.get("temperature", 0.0),
     )
 
-    agent = EvaluateAgent(llm=llm, tools=selected_tools, max_turns=max_turns, instructions_prompt=INSTRUCTIONS_PROMPT, w3 = w3, pre_script=pre_script)
+    instructions_prompt = SIMULATE_INSTRUCTIONS_PROMPT if backend == ExecutionBackend.SIMULATE else INSTRUCTIONS_PROMPT
+    agent = EvaluateAgent(llm=llm, tools=selected_tools, max_turns=max_turns, instructions_prompt=instructions_prompt, w3 = w3, pre_script=pre_script)
     return agent
     
     
@@ -278,6 +382,8 @@ def execute_pre_script(pre_script: Optional[ModuleType]) -> bool:
             print("未找到 run() 或 main() 函数，尝试执行模块级别代码...")
             import importlib
             importlib.reload(pre_script)
+            # reload 重新创建了模块级 w3，需要再次改为可路由
+            route_web3(getattr(pre_script, "w3", None))
             print("模块重新加载完成。")
             return True
     except Exception as e:
@@ -1,30 +1,16 @@
-import json
 from eth_typing import ChecksumAddress
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from evaluate_utils.abi_registry import contract
+from evaluate_utils.rpc_util import get_web3
+from evaluate_utils.tx_manager import next_nonce
 from eth_account.signers.local import LocalAccount
 from dataset.constants import USDT_CONTRACT_ADDRESS_ETH, AAVE_POOL_ADDRESS_ETH, RPC_URL, PRIVATE_KEY, WETH_CONTRACT_ADDRESS_ETH
 
 # 初始化 web3
-w3 = Web3(HTTPProvider(RPC_URL))
+w3 = get_web3(RPC_URL)
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 
-ERC20_ABI = json.loads("""[
-  {"constant":true,"inputs":[{"name":"owner","type":"address"}],
-   "name":"balanceOf","outputs":[{"name":"","type":"uint256"}],
-   "stateMutability":"view","type":"function"},
-  {"constant":false,"inputs":[
-     {"name":"spender","type":"address"},
-     {"name":"amount","type":"uint256"}],
-   "name":"approve","outputs":[{"name":"","type":"bool"}],
-   "stateMutability":"nonpayable","type":"function"}
-]""")
-
-WETH_ABI = json.loads("""[
-  {"inputs":[],"name":"deposit","outputs":[],
-   "stateMutability":"payable","type":"function"}
-]""") + ERC20_ABI  # 复用 balanceOf/approve
-
 AAVE_POOL_ABI = [
     {
         "inputs": [{"name": "user", "type": "address"}],
@@ -101,7 +87,7 @@ def borrow_usdt(amount_usdt: float):
     ).build_transaction({
         'from': addr,
         'gas': 500000,
-        'nonce': w3.eth.get_transaction_count(addr),
+        'nonce': next_nonce(w3, addr),
     })
     
     # 签名并发送交易
@@ -166,7 +152,7 @@ def borrow_token(token_address: str, amount: float, decimals: int = 18, interest
             'from': addr,
             'gas': 500000,
             'gasPrice': w3.to_wei('20', 'gwei'),
-            'nonce': w3.eth.get_transaction_count(addr),
+            'nonce': next_nonce(w3, addr),
         })
         
         print(f"交易详情: {tx}")
@@ -212,12 +198,12 @@ def supply_eth(amount_eth: float):
     amount = Web3.to_wei(amount_eth, 'ether')
 
     # 先把ETH转换为WETH
-    weth_contract = w3.eth.contract(address=WETH, abi=WETH_ABI)
+    weth_contract = contract(w3, WETH, "weth")
     deposit_tx = weth_contract.functions.deposit().build_transaction({
         'from': addr,
         'value': amount,
         'gas': 100000,
-        'nonce': w3.eth.get_transaction_count(addr)
+        'nonce': next_nonce(w3, addr)
     })
     
     # 签名并发送交易
@@ -232,7 +218,7 @@ def supply_eth(amount_eth: float):
         'from': addr,
         'gas': 100000,
         'gasPrice': w3.to_wei('20', 'gwei'),
-        'nonce': w3.eth.get_transaction_count(addr)
+        'nonce': next_nonce(w3, addr)
     })
     
     # 签名并发送授权交易
@@ -251,7 +237,7 @@ def supply_eth(amount_eth: float):
         "value": 0,
         'gas': 5000000,
         'gasPrice': w3.to_wei('20', 'gwei'),
-        'nonce': w3.eth.get_transaction_count(addr),
+        'nonce': next_nonce(w3, addr),
     })
     
     # 签名并发送交易
@@ -272,13 +258,13 @@ def supply_aave_v3_token(token_add, address, amount):
     """
     # 初始化合约
     token_add = Web3.to_checksum_address(token_add)
-    token_contract = w3.eth.contract(address=token_add, abi=ERC20_ABI)
+    token_contract = contract(w3, token_add, "erc20")
     # 授权Aave Pool合约
     approve_tx = token_contract.functions.approve(AAVE_POOL, amount).build_transaction({
         'from': address,
         'gas': 100000,
         'gasPrice': w3.to_wei('20', 'gwei'),
-        'nonce': w3.eth.get_transaction_count(address)
+        'nonce': next_nonce(w3, address)
     })
     signed_approve = account.sign_transaction(approve_tx)
     approve_hash = w3.eth.send_raw_transaction(signed_approve.raw_transaction)
@@ -296,7 +282,7 @@ def supply_aave_v3_token(token_add, address, amount):
         'value': 0,
         'gas': 500000,
         'gasPrice': w3.to_wei('20', 'gwei'),
-        'nonce': w3.eth.get_transaction_count(address)
+        'nonce': next_nonce(w3, address)
     })
     signed_tx = account.sign_transaction(tx)
     tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
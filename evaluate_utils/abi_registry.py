@@ -0,0 +1,108 @@
+"""
+进程内共享的 ABI 注册表
+
+abi/ 目录下的 ABI 按名称 (文件名去掉 _abi.json) 只读取一次；合约对象按 (w3, 地址, ABI) 缓存，
+同一个 w3 对应一条链 (节点池中同一条链的节点共用路由后的 w3)。
+所有已注册 ABI 的 4 字节函数选择器和事件 topic 预先建立索引，供 calldata 和日志解码使用。
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Union
+from eth_utils.abi import abi_to_signature, event_abi_to_log_topic, function_abi_to_4byte_selector, get_abi_input_types
+from web3 import Web3
+from web3.contract import Contract
+
+ABI_DIR = Path(__file__).parent.parent / "abi"
+ABI_SUFFIX = "_abi.json"
+
+
+class FunctionEntry(NamedTuple):
+    """选择器索引中的一个函数"""
+    abi_name: str
+    signature: str
+    input_types: list[str]
+    abi: dict[str, Any]
+
+
+class EventEntry(NamedTuple):
+    """topic 索引中的一个事件"""
+    abi_name: str
+    signature: str
+    abi: dict[str, Any]
+
+
+_lock = threading.RLock()
+_abis: dict[str, list[dict[str, Any]]] = {}
+# 0x 开头的小写十六进制选择器 / topic -> 条目，多个 ABI 中签名相同的函数只保留最先注册的
+_functions: dict[str, FunctionEntry] = {}
+_events: dict[str, EventEntry] = {}
+_contracts: dict[tuple[int, str, str], Contract] = {}
+_indexed_dir = False
+
+
+def _index(name: str, abi: list[dict[str, Any]]) -> None:
+    for item in abi:
+        if item.get("type") == "function":
+            selector = "0x" + function_abi_to_4byte_selector(item).hex()  # type: ignore
+            _functions.setdefault(selector, FunctionEntry(name, abi_to_signature(item), list(get_abi_input_types(item)), item))  # type: ignore
+        elif item.get("type") == "event" and not item.get("anonymous"):
+            topic = "0x" + event_abi_to_log_topic(item).hex()  # type: ignore
+            _events.setdefault(topic, EventEntry(name, abi_to_signature(item), item))  # type: ignore
+
+
+def register_abi(name: str, abi: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """注册一个 (例如脚本中内联声明的) ABI 并加入索引，同名 ABI 已存在时返回已有的"""
+    with _lock:
+        if name not in _abis:
+            _abis[name] = abi
+            _index(name, abi)
+        return _abis[name]
+
+
+def load_abi(name: str) -> list[dict[str, Any]]:
+    """按名称取 ABI，如 load_abi("erc20") 读取 abi/erc20_abi.json，每个文件只读取一次"""
+    with _lock:
+        if name not in _abis:
+            with open(ABI_DIR / f"{name}{ABI_SUFFIX}", "r") as f:
+                register_abi(name, json.load(f))
+        return _abis[name]
+
+
+def _index_abi_dir() -> None:
+    global _indexed_dir
+    with _lock:
+        if _indexed_dir:
+            return
+        for path in sorted(ABI_DIR.glob(f"*{ABI_SUFFIX}")):
+            load_abi(path.name.removesuffix(ABI_SUFFIX))
+        _indexed_dir = True
+
+
+def contract(w3: Web3, address: str, abi: str) -> Contract:
+    """按 (w3, 地址, ABI 名称) 缓存的合约对象"""
+    address = Web3.to_checksum_address(address)
+    key = (id(w3), address, abi)
+    with _lock:
+        cached = _contracts.get(key)
+        if cached is None or cached.w3 is not w3:
+            cached = _contracts[key] = w3.eth.contract(address=address, abi=load_abi(abi))
+        return cached
+
+
+def _hex_key(value: Union[str, bytes]) -> str:
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    return "0x" + value.lower().removeprefix("0x")
+
+
+def function_by_selector(selector: Union[str, bytes]) -> Optional[FunctionEntry]:
+    """按 4 字节选择器 (或以其开头的 calldata) 查找函数"""
+    _index_abi_dir()
+    return _functions.get(_hex_key(selector)[:10])
+
+
+def event_by_topic(topic: Union[str, bytes]) -> Optional[EventEntry]:
+    """按 topics[0] 查找事件"""
+    _index_abi_dir()
+    return _events.get(_hex_key(topic))
@@ -0,0 +1,160 @@
+"""
+批量读取余额和合约状态
+
+validate.py 中的 get_balances 只声明要读什么，由 read_all() 合并成一次
+Multicall3.aggregate3 调用 (同一区块、一次往返)；节点上没有 Multicall3 时退化为一次 JSON-RPC 批量请求。
+在 record_reads() 作用域内调用 get_balances 可以取得任务关心的余额 (balance_probes)。
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, NamedTuple, Optional, Sequence, Union
+from eth_abi import decode, encode
+from eth_typing import BlockIdentifier
+from eth_utils.abi import get_abi_output_types
+from web3 import Web3
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3.contract.contract import ContractFunction
+from web3.exceptions import ContractLogicError
+from dataset.constants import MULTICALL3_ADDRESS
+from evaluate_utils import erc20_codec
+
+# aggregate3((address,bool,bytes)[])
+AGGREGATE3_SELECTOR = "0x82ad56cb"
+
+# 节点地址 -> 是否部署了 Multicall3
+_multicall_available: dict[str, bool] = {}
+# record_reads() 作用域内 read_all() 读到的 (读取项, 值)
+_recorded_reads: ContextVar[Optional[list[tuple[Any, Any]]]] = ContextVar("recorded_reads", default=None)
+
+
+class EthBalance(NamedTuple):
+    """原生 ETH 余额读取"""
+    address: str
+
+
+Read = Union[ContractFunction, EthBalance]
+
+
+def eth_balance_of(address: str) -> EthBalance:
+    return EthBalance(Web3.to_checksum_address(address))
+
+
+def _block_param(block_identifier: BlockIdentifier) -> Any:
+    return hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+
+
+def _is_fast(read: ContractFunction) -> bool:
+    """balanceOf / allowance / decimals 用 erc20_codec 编解码"""
+    return read.signature in erc20_codec.FAST_SIGNATURES and not read.kwargs and all(isinstance(arg, str) for arg in read.args)
+
+
+def _call_data(read: Read) -> tuple[str, str]:
+    """(目标地址, calldata)"""
+    if isinstance(read, EthBalance):
+        return MULTICALL3_ADDRESS, erc20_codec.encode_get_eth_balance(read.address)
+    if _is_fast(read):
+        return read.address, erc20_codec.encode_fast_call(read.signature, read.args)
+    return read.address, read._encode_transaction_data()
+
+
+def _decode(read: Read, return_data: bytes) -> Any:
+    """与 ContractFunction.call() 的返回值一致：单个输出直接返回，地址为 checksum 格式"""
+    if isinstance(read, EthBalance) or _is_fast(read):
+        return erc20_codec.decode_uint256(return_data)
+    output_types = get_abi_output_types(read.abi)
+    normalized = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, decode(output_types, return_data))
+    return normalized[0] if len(normalized) == 1 else normalized
+
+
+def has_multicall(w3: Web3) -> bool:
+    endpoint = getattr(w3.provider, "endpoint_uri", "")
+    if endpoint not in _multicall_available:
+        code = w3.provider.make_request("eth_getCode", [MULTICALL3_ADDRESS, "latest"]).get("result")  # type: ignore
+        _multicall_available[endpoint] = bool(code) and code != "0x"
+    return _multicall_available[endpoint]
+
+
+def _read_multicall(w3: Web3, reads: Sequence[Read], block_identifier: BlockIdentifier) -> list[Any]:
+    calls = [(target, True, bytes.fromhex(data.removeprefix("0x"))) for target, data in map(_call_data, reads)]
+    data = AGGREGATE3_SELECTOR + encode(["(address,bool,bytes)[]"], [calls]).hex()
+    # 直接发原始请求，避开 web3 中间件为 eth_call 额外查询 chain id
+    response = w3.provider.make_request("eth_call", [{"to": MULTICALL3_ADDRESS, "data": data}, _block_param(block_identifier)])  # type: ignore
+    if "error" in response:
+        raise ContractLogicError(f"Multicall3 aggregate3 failed: {response['error']}")
+    results = decode(["(bool,bytes)[]"], bytes.fromhex(response["result"].removeprefix("0x")))[0]
+    values = []
+    for read, (success, return_data) in zip(reads, results):
+        if not success:
+            raise ContractLogicError(f"Call {read} reverted", data=return_data.hex())
+        values.append(_decode(read, return_data))
+    return values
+
+
+def _read_batch(w3: Web3, reads: Sequence[Read], block_identifier: BlockIdentifier) -> list[Any]:
+    block = _block_param(block_identifier)
+    requests = []
+    for read in reads:
+        if isinstance(read, EthBalance):
+            requests.append(("eth_getBalance", [read.address, block]))
+        else:
+            target, data = _call_data(read)
+            requests.append(("eth_call", [{"to": target, "data": data}, block]))
+    responses = w3.provider.make_batch_request(requests)  # type: ignore
+    values = []
+    for read, response in zip(reads, responses):
+        if "error" in response:
+            raise ContractLogicError(f"Call {read} failed: {response['error']}")
+        if isinstance(read, EthBalance):
+            values.append(int(response["result"], 16))
+        else:
+            values.append(_decode(read, bytes.fromhex(response["result"].removeprefix("0x"))))
+    return values
+
+
+def read_all(w3: Web3, reads: Sequence[Read], block_identifier: BlockIdentifier = "latest") -> list[Any]:
+    """
+    在同一区块上一次读出全部值，顺序与 reads 一致
+
+    Args:
+        w3: Web3 实例
+        reads: eth_balance_of(address) 或未调用 .call() 的合约函数，如 contract.functions.balanceOf(addr)
+        block_identifier: 读取的区块
+    """
+    if not reads:
+        return []
+    if has_multicall(w3):
+        values = _read_multicall(w3, reads, block_identifier)
+    else:
+        values = _read_batch(w3, reads, block_identifier)
+    recorded = _recorded_reads.get()
+    if recorded is not None:
+        recorded.extend(zip(reads, values))
+    return values
+
+
+@contextmanager
+def record_reads() -> Iterator[list[tuple[Read, Any]]]:
+    """收集作用域内 read_all() 的读取项和读到的值，run_sync / asyncio.run 中的调用同样会被记录"""
+    recorded: list[tuple[Read, Any]] = []
+    token = _recorded_reads.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _recorded_reads.reset(token)
+
+
+def balance_probes(recorded: Sequence[tuple[Read, Any]]) -> dict[tuple[str, Optional[str]], int]:
+    """
+    记录的读取中的余额部分
+
+    Returns:
+        dict: (账户地址, 代币地址，原生 ETH 为 None) -> 读到的余额，其它读取 (授权额度、头寸等) 被忽略
+    """
+    balances: dict[tuple[str, Optional[str]], int] = {}
+    for read, value in recorded:
+        if isinstance(read, EthBalance):
+            balances[(read.address, None)] = value
+        elif read.fn_name == "balanceOf" and len(read.args) == 1 and isinstance(read.args[0], str) and Web3.is_address(read.args[0]):
+            balances[(Web3.to_checksum_address(read.args[0]), Web3.to_checksum_address(read.address))] = value
+    return balances
@@ -0,0 +1,322 @@
+"""
+交易 calldata 解码
+
+选择器先在 abi_registry 的全部 ABI 索引中查找，再查 abi/signatures.json 中的文本签名库 (可用 register_signature 扩展)。
+支持嵌套 tuple / 数组，multicall、Multicall3 等参数中的 bytes 调用和 Universal Router 的 execute 命令会递归解码。
+同一 calldata 只解码一次，供评估报告和评估智能体阅读交易内容。
+"""
+import json
+import threading
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional, Union
+from eth_abi import decode
+from eth_utils.abi import abi_to_signature, function_abi_to_4byte_selector, get_abi_input_types
+from web3 import Web3
+from dataset.constants import ERC20_TOKENS_ETH
+from evaluate_utils.abi_registry import ABI_DIR, function_by_selector
+
+SIGNATURES_FILE = ABI_DIR / "signatures.json"
+UNKNOWN = "unknown"
+# 每层最多展开的嵌套深度，防止恶意构造的 calldata 无限递归
+MAX_DEPTH = 4
+DECODE_CACHE_SIZE = 4096
+# 摘要中超过该长度 (字节) 的 bytes 参数只显示开头，其内容通常已作为子调用展开
+SUMMARY_BYTES = 68
+
+# Universal Router execute 的命令 (低 6 位) -> (名称, 参数)，最高位为 allow revert 标志
+COMMAND_MASK = 0x3F
+UNIVERSAL_ROUTER_COMMANDS: dict[int, tuple[str, list[tuple[str, str]]]] = {
+    0x00: ("V3_SWAP_EXACT_IN", [("recipient", "address"), ("amountIn", "uint256"), ("amountOutMin", "uint256"), ("path", "bytes"), ("payerIsUser", "bool")]),
+    0x01: ("V3_SWAP_EXACT_OUT", [("recipient", "address"), ("amountOut", "uint256"), ("amountInMax", "uint256"), ("path", "bytes"), ("payerIsUser", "bool")]),
+    0x02: ("PERMIT2_TRANSFER_FROM", [("token", "address"), ("recipient", "address"), ("amount", "uint160")]),
+    0x04: ("SWEEP", [("token", "address"), ("recipient", "address"), ("amountMin", "uint256")]),
+    0x05: ("TRANSFER", [("token", "address"), ("recipient", "address"), ("value", "uint256")]),
+    0x06: ("PAY_PORTION", [("token", "address"), ("recipient", "address"), ("bips", "uint256")]),
+    0x08: ("V2_SWAP_EXACT_IN", [("recipient", "address"), ("amountIn", "uint256"), ("amountOutMin", "uint256"), ("path", "address[]"), ("payerIsUser", "bool")]),
+    0x09: ("V2_SWAP_EXACT_OUT", [("recipient", "address"), ("amountOut", "uint256"), ("amountInMax", "uint256"), ("path", "address[]"), ("payerIsUser", "bool")]),
+    0x0A: ("PERMIT2_PERMIT", [("permitSingle", "((address,uint160,uint48,uint48),address,uint256)"), ("signature", "bytes")]),
+    0x0B: ("WRAP_ETH", [("recipient", "address"), ("amountMin", "uint256")]),
+    0x0C: ("UNWRAP_WETH", [("recipient", "address"), ("amountMin", "uint256")]),
+    0x0E: ("BALANCE_CHECK_ERC20", [("owner", "address"), ("token", "address"), ("minBalance", "uint256")]),
+    0x10: ("V4_SWAP", [("actions", "bytes"), ("params", "bytes[]")]),
+    0x11: ("V3_POSITION_MANAGER_PERMIT", [("data", "bytes")]),
+    0x12: ("V3_POSITION_MANAGER_CALL", [("data", "bytes")]),
+    0x13: ("V4_INITIALIZE_POOL", [("poolKey", "(address,address,uint24,int24,address)"), ("sqrtPriceX96", "uint160")]),
+    0x14: ("V4_POSITION_MANAGER_CALL", [("data", "bytes")]),
+    0x21: ("EXECUTE_SUB_PLAN", [("commands", "bytes"), ("inputs", "bytes[]")]),
+}
+UNIVERSAL_ROUTER_EXECUTE = {"0x3593564c", "0x24856bc3"}
+
+_lock = threading.Lock()
+# 文本签名库的选择器 -> 函数 ABI
+_signatures: dict[str, dict[str, Any]] = {}
+_signatures_loaded = False
+# 按 ABI 对象缓存的选择器索引，保存 ABI 本身以免 id 被复用
+_abi_indexes: dict[int, tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]] = {}
+_token_symbols = {Web3.to_checksum_address(address): symbol for symbol, (address, _) in ERC20_TOKENS_ETH.items()}
+
+
+class DecodedCall(NamedTuple):
+    """
+    解码后的调用，args 中 bytes 为 0x 开头的十六进制，tuple 为 dict
+
+    calls 为嵌套的调用 (multicall 的子调用、Universal Router 的命令)，不要修改返回值，它会被缓存复用。
+    """
+    selector: str
+    name: str
+    signature: Optional[str]
+    args: dict[str, Any]
+    calls: tuple["DecodedCall", ...] = ()
+    error: Optional[str] = None
+
+
+def _split_types(types: str) -> list[str]:
+    """按顶层逗号拆分参数类型"""
+    parts, depth, start = [], 0, 0
+    for index, char in enumerate(types):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(types[start:index])
+            start = index + 1
+    if types:
+        parts.append(types[start:])
+    return parts
+
+
+def _param(type_str: str, name: str = "") -> dict[str, Any]:
+    """文本类型转为 ABI 参数定义，如 (address,uint256)[] -> tuple[] + components"""
+    if not type_str.startswith("("):
+        return {"name": name, "type": type_str}
+    depth = 0
+    for index, char in enumerate(type_str):
+        depth += char == "("
+        depth -= char == ")"
+        if depth == 0:
+            break
+    components = [_param(component) for component in _split_types(type_str[1:index])]
+    return {"name": name, "type": "tuple" + type_str[index + 1:], "components": components}
+
+
+def signature_to_abi(signature: str) -> dict[str, Any]:
+    """文本签名 name(type,...) 转为函数 ABI，参数名为空"""
+    name, types = signature.split("(", 1)
+    return {"type": "function", "name": name, "inputs": [_param(t) for t in _split_types(types[:-1])]}
+
+
+def _selector(abi: dict[str, Any]) -> str:
+    return "0x" + function_abi_to_4byte_selector(abi).hex()  # type: ignore
+
+
+def register_signature(signature: str) -> str:
+    """加入一个文本签名，返回其选择器；已有相同选择器时保留原有的"""
+    abi = signature_to_abi(signature)
+    selector = _selector(abi)
+    with _lock:
+        _signatures.setdefault(selector, abi)
+    return selector
+
+
+def _load_signatures() -> None:
+    global _signatures_loaded
+    if _signatures_loaded:
+        return
+    with open(SIGNATURES_FILE, "r") as f:
+        signatures = json.load(f)
+    for signature in signatures:
+        register_signature(signature)
+    _signatures_loaded = True
+
+
+def selector_index(abi: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """单个 ABI 的选择器 -> 函数，同一 ABI 对象只计算一次"""
+    with _lock:
+        cached = _abi_indexes.get(id(abi))
+        if cached is None or cached[0] is not abi:
+            index = {_selector(item): item for item in abi if item.get("type") == "function"}
+            cached = _abi_indexes[id(abi)] = (abi, index)
+        return cached[1]
+
+
+def lookup(selector: str) -> Optional[dict[str, Any]]:
+    """项目 ABI 优先，其次文本签名库"""
+    entry = function_by_selector(selector)
+    if entry is not None:
+        return entry.abi
+    _load_signatures()
+    return _signatures.get(selector)
+
+
+def format_value(value: Any, param: dict[str, Any]) -> Any:
+    """bytes 转为十六进制，tuple 按 components 转为 dict，数组逐个元素格式化"""
+    param_type = param["type"]
+    if param_type.endswith("]"):
+        element = {**param, "type": param_type[:param_type.rindex("[")]}
+        return [format_value(item, element) for item in value]
+    if param_type == "tuple":
+        return {
+            component.get("name") or f"field_{index}": format_value(component_value, component)
+            for index, (component_value, component) in enumerate(zip(value, param["components"]))
+        }
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    return value
+
+
+def _v3_path(path: bytes) -> Optional[list[Any]]:
+    """Uniswap V3 的 path: token (20 字节) + fee (3 字节) + token ..."""
+    if len(path) < 43 or (len(path) - 20) % 23 != 0:
+        return None
+    hops: list[Any] = [Web3.to_checksum_address(path[:20])]
+    for offset in range(20, len(path), 23):
+        hops.append(int.from_bytes(path[offset:offset + 3], "big"))
+        hops.append(Web3.to_checksum_address(path[offset + 3:offset + 23]))
+    return hops
+
+
+def _decode_args(inputs: list[dict[str, Any]], data: bytes) -> tuple[dict[str, Any], list[Any]]:
+    types = get_abi_input_types({"type": "function", "inputs": inputs})
+    values = decode(types, data)
+    args = {}
+    for index, (param, value) in enumerate(zip(inputs, values)):
+        name = param.get("name") or f"param_{index}"
+        if name == "path" and param["type"] == "bytes":
+            args[name] = _v3_path(value) or format_value(value, param)
+        else:
+            args[name] = format_value(value, param)
+    return args, list(values)
+
+
+def _nested_calls(values: Any, depth: int) -> list[DecodedCall]:
+    """参数中能识别出选择器的 bytes 作为子调用解码 (multicall、aggregate3 等)"""
+    if isinstance(values, bytes):
+        if len(values) >= 4 and lookup("0x" + values[:4].hex()) is not None:
+            call = _decode(values, depth + 1)
+            return [call] if call.error is None else []
+        return []
+    if isinstance(values, (list, tuple)):
+        return [call for value in values for call in _nested_calls(value, depth)]
+    return []
+
+
+def _decode_commands(commands: bytes, inputs: list[bytes], depth: int) -> list[DecodedCall]:
+    calls = []
+    for command, data in zip(commands, inputs):
+        selector = f"0x{command:02x}"
+        known = UNIVERSAL_ROUTER_COMMANDS.get(command & COMMAND_MASK)
+        if known is None:
+            calls.append(DecodedCall(selector, UNKNOWN, None, {"input": "0x" + data.hex()}))
+            continue
+        name, params = known
+        inputs_abi = [_param(param_type, param_name) for param_name, param_type in params]
+        signature = f"{name}({','.join(param_type for _, param_type in params)})"
+        try:
+            args, values = _decode_args(inputs_abi, data)
+        except Exception as e:
+            calls.append(DecodedCall(selector, name, signature, {}, error=str(e)))
+            continue
+        if name == "EXECUTE_SUB_PLAN" and depth < MAX_DEPTH:
+            nested = _decode_commands(values[0], values[1], depth + 1)
+        elif name != "V4_SWAP" and depth < MAX_DEPTH:
+            nested = _nested_calls(values, depth)
+        else:
+            nested = []
+        calls.append(DecodedCall(selector, name, signature, args, tuple(nested)))
+    return calls
+
+
+def _decode(data: bytes, depth: int = 0) -> DecodedCall:
+    selector = "0x" + data[:4].hex()
+    if len(data) < 4:
+        return DecodedCall(selector, UNKNOWN, None, {}, error="calldata shorter than a selector")
+    abi = lookup(selector)
+    if abi is None:
+        return DecodedCall(selector, UNKNOWN, None, {}, error=f"unknown selector {selector}")
+    signature = abi_to_signature(abi)  # type: ignore
+    try:
+        args, values = _decode_args(abi.get("inputs", []), data[4:])
+    except Exception as e:
+        return DecodedCall(selector, abi["name"], signature, {}, error=str(e))
+    nested: list[DecodedCall] = []
+    if depth < MAX_DEPTH:
+        if selector in UNIVERSAL_ROUTER_EXECUTE:
+            nested = _decode_commands(values[0], values[1], depth + 1)
+        else:
+            nested = _nested_calls(values, depth)
+    return DecodedCall(selector, abi["name"], signature, args, tuple(nested))
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _decode_cached(data: str) -> DecodedCall:
+    return _decode(bytes.fromhex(data))
+
+
+def decode_calldata(data: Union[str, bytes]) -> DecodedCall:
+    """解码 calldata，相同的 calldata 直接返回缓存结果"""
+    if isinstance(data, bytes):
+        data = data.hex()
+    data = data.lower().removeprefix("0x")
+    if len(data) % 2:
+        data += "0"
+    return _decode_cached(data)
+
+
+def decode_tx_list(tx_list: list[dict[str, Any]]) -> list[DecodedCall]:
+    """批量解码交易列表的 data 字段"""
+    return [decode_calldata(tx.get("data") or tx.get("input") or "0x") for tx in tx_list]
+
+
+def _label(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith("0x") and len(value) > 2 + 2 * SUMMARY_BYTES:
+        return f"{value[:2 + 2 * SUMMARY_BYTES]}... ({(len(value) - 2) // 2} bytes)"
+    if isinstance(value, str) and Web3.is_address(value):
+        address = Web3.to_checksum_address(value)
+        symbol = _token_symbols.get(address)
+        return f"{address} ({symbol})" if symbol else address
+    if isinstance(value, list):
+        return [_label(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _label(item) for key, item in value.items()}
+    return value
+
+
+def summarize_call(call: DecodedCall, indent: str = "") -> str:
+    """调用的可读摘要，地址标注已知代币符号，子调用逐行缩进"""
+    if call.name == UNKNOWN:
+        line = f"{indent}unknown call {call.selector}"
+    else:
+        arguments = ", ".join(f"{name}={_label(value)}" for name, value in call.args.items())
+        line = f"{indent}{call.name}({arguments})"
+    if call.error and call.name != UNKNOWN:
+        line += f" [decode error: {call.error}]"
+    return "\n".join([line] + [summarize_call(nested, indent + "  ") for nested in call.calls])
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, str):
+        return int(value, 16) if value.startswith("0x") else int(value or 0)
+    return int(value or 0)
+
+
+def describe_tx(tx: dict[str, Any]) -> str:
+    """单笔交易的可读描述: 目标地址、转账的 ETH 和解码后的调用"""
+    to = tx.get("to")
+    target = _label(to) if to else "no 'to' address"
+    value = Web3.from_wei(_to_int(tx.get("value")), "ether")
+    data = tx.get("data") or tx.get("input") or "0x"
+    if data in ("0x", ""):
+        return f"to {target}, value {value} ETH: plain transfer"
+    return f"to {target}, value {value} ETH: " + summarize_call(decode_calldata(data)).replace("\n", "\n    ")
+
+
+def describe_tx_list(tx_list: list[dict[str, Any]]) -> str:
+    lines = []
+    for index, tx in enumerate(tx_list):
+        try:
+            lines.append(f"tx {index}: {describe_tx(tx)}")
+        except Exception as e:
+            # agent 输出的字段格式不规范时只跳过这一笔
+            lines.append(f"tx {index}: could not be decoded ({e})")
+    return "\n".join(lines)
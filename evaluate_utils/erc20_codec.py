@@ -0,0 +1,156 @@
+"""
+ERC20 / WETH 常用调用的预编译编解码
+
+balanceOf、allowance、decimals、approve、transfer、deposit、withdraw 的参数和返回值都是 32 字节的静态字,
+直接按固定选择器拼接 calldata、按字读取返回值，不经过 web3 合约函数的 ABI 查找、参数规范化和格式化中间件。
+结果与 eth_abi 编解码一致。
+"""
+from typing import Any, Union
+from eth_abi import decode
+from eth_typing import BlockIdentifier
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+BALANCE_OF = "0x70a08231"
+ALLOWANCE = "0xdd62ed3e"
+DECIMALS = "0x313ce567"
+APPROVE = "0x095ea7b3"
+TRANSFER = "0xa9059cbb"
+TRANSFER_FROM = "0x23b872dd"
+DEPOSIT = "0xd0e30db0"
+WITHDRAW = "0x2e1a7d4d"
+# Multicall3.getEthBalance(address)
+GET_ETH_BALANCE = "0x4d2301cc"
+
+# 可以走快速路径的函数签名 -> 选择器
+FAST_SIGNATURES = {
+    "balanceOf(address)": BALANCE_OF,
+    "allowance(address,address)": ALLOWANCE,
+    "decimals()": DECIMALS,
+}
+
+UINT256_MAX = 2**256 - 1
+
+
+def _address_word(address: str) -> str:
+    value = address.lower().removeprefix("0x")
+    if len(value) != 40:
+        raise ValueError(f"Invalid address: {address}")
+    return "000000000000000000000000" + value
+
+
+def _uint_word(value: int) -> str:
+    if not 0 <= value <= UINT256_MAX:
+        raise ValueError(f"Value out of uint256 range: {value}")
+    return format(value, "064x")
+
+
+def encode_balance_of(owner: str) -> str:
+    return BALANCE_OF + _address_word(owner)
+
+
+def encode_allowance(owner: str, spender: str) -> str:
+    return ALLOWANCE + _address_word(owner) + _address_word(spender)
+
+
+def encode_approve(spender: str, amount: int) -> str:
+    return APPROVE + _address_word(spender) + _uint_word(amount)
+
+
+def encode_transfer(to: str, amount: int) -> str:
+    return TRANSFER + _address_word(to) + _uint_word(amount)
+
+
+def encode_withdraw(amount: int) -> str:
+    return WITHDRAW + _uint_word(amount)
+
+
+def encode_get_eth_balance(address: str) -> str:
+    return GET_ETH_BALANCE + _address_word(address)
+
+
+def encode_fast_call(signature: str, args: Union[list[Any], tuple[Any, ...]]) -> str:
+    """按 FAST_SIGNATURES 中的签名编码调用"""
+    return FAST_SIGNATURES[signature] + "".join(_address_word(arg) for arg in args)
+
+
+def _to_bytes(return_data: Union[str, bytes]) -> bytes:
+    if isinstance(return_data, str):
+        return bytes.fromhex(return_data.removeprefix("0x"))
+    return return_data
+
+
+def decode_uint256(return_data: Union[str, bytes]) -> int:
+    data = _to_bytes(return_data)
+    if len(data) < 32:
+        # 与 eth_abi 一致：数据不足一个字时报错
+        return decode(["uint256"], data)[0]
+    return int.from_bytes(data[:32], "big")
+
+
+def decode_bool(return_data: Union[str, bytes]) -> bool:
+    """USDT 等不返回值的代币视为成功"""
+    data = _to_bytes(return_data)
+    return not data or int.from_bytes(data[:32], "big") != 0
+
+
+def approve_tx(token: str, spender: str, amount: int) -> dict[str, Any]:
+    return {"to": Web3.to_checksum_address(token), "data": encode_approve(spender, amount), "value": 0}
+
+
+def transfer_tx(token: str, to: str, amount: int) -> dict[str, Any]:
+    return {"to": Web3.to_checksum_address(token), "data": encode_transfer(to, amount), "value": 0}
+
+
+def deposit_tx(weth: str, amount: int) -> dict[str, Any]:
+    return {"to": Web3.to_checksum_address(weth), "data": DEPOSIT, "value": amount}
+
+
+def withdraw_tx(weth: str, amount: int) -> dict[str, Any]:
+    return {"to": Web3.to_checksum_address(weth), "data": encode_withdraw(amount), "value": 0}
+
+
+def _call(w3: Web3, token: str, data: str, block_identifier: BlockIdentifier) -> str:
+    block = hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+    response = w3.provider.make_request("eth_call", [{"to": token, "data": data}, block])  # type: ignore
+    if "error" in response:
+        raise ContractLogicError(f"Call {data[:10]} on {token} failed: {response['error']}")
+    return response["result"]
+
+
+def balance_of(w3: Web3, token: str, owner: str, block_identifier: BlockIdentifier = "latest") -> int:
+    return decode_uint256(_call(w3, token, encode_balance_of(owner), block_identifier))
+
+
+def allowance(w3: Web3, token: str, owner: str, spender: str, block_identifier: BlockIdentifier = "latest") -> int:
+    return decode_uint256(_call(w3, token, encode_allowance(owner, spender), block_identifier))
+
+
+def decimals(w3: Web3, token: str, block_identifier: BlockIdentifier = "latest") -> int:
+    return decode_uint256(_call(w3, token, DECIMALS, block_identifier))
+
+
+if __name__ == "__main__":
+    # 微基准：与 web3 合约函数的编码 + eth_abi 解码对比，不访问节点
+    import timeit
+    from evaluate_utils.abi_registry import load_abi
+
+    owner = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+    token = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    return_data = "0x" + format(123456789, "064x")
+    usdc = Web3().eth.contract(address=Web3.to_checksum_address(token), abi=load_abi("erc20"))
+    assert usdc.functions.balanceOf(owner)._encode_transaction_data() == encode_balance_of(owner)
+    assert usdc.functions.approve(owner, 10**18)._encode_transaction_data() == encode_approve(owner, 10**18)
+
+    def web3_round() -> int:
+        usdc.functions.balanceOf(owner)._encode_transaction_data()
+        return decode(["uint256"], bytes.fromhex(return_data[2:]))[0]
+
+    def codec_round() -> int:
+        encode_balance_of(owner)
+        return decode_uint256(return_data)
+
+    number = 20_000
+    for name, func in [("web3 contract function", web3_round), ("erc20_codec", codec_round)]:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{name:<24} {seconds / number * 1e6:8.2f} us per balanceOf encode + decode")
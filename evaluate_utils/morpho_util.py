@@ -1,24 +1,24 @@
 from eth_typing import ChecksumAddress
 from dataset.constants import (
     MORPHO_CONTRACT_ADDRESS_ETH,
-    MORPHO_VAULT_ABI, 
     RPC_URL, 
     PRIVATE_KEY, 
-    ERC20_ABI,
     USDC_CONTRACT_ADDRESS_ETH,
     WETH_CONTRACT_ADDRESS_ETH,
-    MORPHO_CONTRACT_ABI
 )
 import json
 from web3 import Web3
+from evaluate_utils.abi_registry import contract
+from evaluate_utils.rpc_util import get_web3
+from evaluate_utils.tx_manager import next_nonce
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
+w3 = get_web3(RPC_URL)
 account = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 # 初始化 WETH 合约实例
 
 
-weth = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
+weth = contract(w3, WETH_CONTRACT_ADDRESS_ETH, "weth")
 
 
 def load_morpho_contract(w3: Web3):
@@ -31,8 +31,7 @@ def load_morpho_contract(w3: Web3):
     返回:
         Contract: Morpho 合约对象
     """
-    contract = w3.eth.contract(address=Web3.to_checksum_address(MORPHO_CONTRACT_ADDRESS_ETH), abi=MORPHO_CONTRACT_ABI)
-    return contract
+    return contract(w3, MORPHO_CONTRACT_ADDRESS_ETH, "morpho")
 
 
 morpho_contract = load_morpho_contract(w3)
@@ -48,17 +47,7 @@ def get_token_balance(token_address, holder_address):
     返回:
         int: 代币余额（单位：最小单位）
     """
-    # ERC20 ABI 只需要 balanceOf 方法
-    erc20_abi = [
-        {
-            "constant": True,
-            "inputs": [{"name": "_owner", "type": "address"}],
-            "name": "balanceOf",
-            "outputs": [{"name": "balance", "type": "uint256"}],
-            "type": "function"
-        }
-    ]
-    token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=erc20_abi)
+    token_contract = contract(w3, token_address, "erc20")
     balance = token_contract.functions.balanceOf(Web3.to_checksum_address(holder_address)).call()
     return balance
 
@@ -68,7 +57,7 @@ def approve_weth_to_morpho(amount_wei: int, address: ChecksumAddress):
     if allowance < amount_wei:
         tx = weth.functions.approve(MORPHO_CONTRACT_ADDRESS_ETH, amount_wei).build_transaction({
             "from": address,
-            "nonce": w3.eth.get_transaction_count(address),
+            "nonce": next_nonce(w3, address),
             "gas": 60000,
         })
         signed = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
@@ -98,7 +87,7 @@ def supply_weth_to_morpho(amount_wei: int, from_address:ChecksumAddress, market_
             b''            # data (empty bytes)
         ).build_transaction({
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
+            "nonce": next_nonce(w3, from_address),
             "gas": 800000,
         })
 
@@ -156,7 +145,7 @@ def borrow_usdt_from_morpho(amount_usdt_wei: int, from_address, market_params: t
             from_address      # receiver
         ).build_transaction({
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
+            "nonce": next_nonce(w3, from_address),
             "gas": 800000,
         })
 
@@ -206,29 +195,11 @@ def deposit_to_vault(vault_address: ChecksumAddress, amount_usdc: float, receive
     """
     # 加载 ABI
 
-    vault_contract = w3.eth.contract(address=vault_address, abi=MORPHO_VAULT_ABI)
+    vault_contract = contract(w3, vault_address, "morpho_vault")
 
     # 获取 USDC 地址
     usdc_address = Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH)
-    usdc_contract = w3.eth.contract(address=usdc_address, abi=[
-        {
-            "constant": False,
-            "inputs": [
-                {"name": "_spender", "type": "address"},
-                {"name": "_value", "type": "uint256"}
-            ],
-            "name": "approve",
-            "outputs": [{"name": "", "type": "bool"}],
-            "type": "function"
-        },
-        {
-            "constant": True,
-            "inputs": [],
-            "name": "decimals",
-            "outputs": [{"name": "", "type": "uint8"}],
-            "type": "function"
-        }
-    ])
+    usdc_contract = contract(w3, usdc_address, "erc20")
 
     # 获取 USDC 精度
     usdc_decimals = usdc_contract.functions.decimals().call()
@@ -244,7 +215,7 @@ def deposit_to_vault(vault_address: ChecksumAddress, amount_usdc: float, receive
             amount_usdc_wei
         ).build_transaction({
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
+            "nonce": next_nonce(w3, from_address),
             "gas": 100000,
         })
         signed_approve = w3.eth.account.sign_transaction(approve_tx, private_key=PRIVATE_KEY)
@@ -265,7 +236,7 @@ def deposit_to_vault(vault_address: ChecksumAddress, amount_usdc: float, receive
             from_address
         ).build_transaction({
             "from": from_address,
-            "nonce": w3.eth.get_transaction_count(from_address),
+            "nonce": next_nonce(w3, from_address),
             "gas": 30000000,
         })
         signed_deposit = w3.eth.account.sign_transaction(deposit_tx, private_key=PRIVATE_KEY)
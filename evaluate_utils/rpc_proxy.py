@@ -0,0 +1,183 @@
+"""
+缓存 JSON-RPC 代理
+
+anvil 的 --fork-url 指向本代理，代理再转发到上游归档节点。
+固定区块上的查询结果不会变化，持久化到本地 sqlite 后，后续 fork 直接命中缓存；
+并发的相同请求只会向上游发送一次。
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+import aiohttp
+from aiohttp import web
+
+# 方法 -> 区块参数的位置；区块参数为具体区块号时结果不可变
+CACHEABLE_METHODS = {
+    "eth_getCode": 1,
+    "eth_getStorageAt": 2,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_getBlockByNumber": 0,
+}
+# 与区块无关、始终不变的方法
+IMMUTABLE_METHODS = {"eth_chainId", "net_version"}
+
+
+def cache_key(method: str, params: list[Any]) -> Optional[str]:
+    """可缓存的请求返回缓存键，否则返回 None"""
+    if method in IMMUTABLE_METHODS:
+        return method
+    position = CACHEABLE_METHODS.get(method)
+    if position is None or len(params) <= position:
+        return None
+    block = params[position]
+    # latest / pending 等标签对应的结果会变化
+    if not isinstance(block, str) or not block.startswith("0x"):
+        return None
+    normalized = [p.lower() if isinstance(p, str) else p for p in params]
+    normalized[position] = hex(int(block, 16))
+    return f"{method}:{json.dumps(normalized, separators=(',', ':'))}"
+
+
+class ResponseStore:
+    """
+    sqlite 实现的磁盘 KV，值为 JSON 编码的 result
+
+    代理中通过 async_get / async_put 使用，读写在专用的单线程中顺序执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self.db.commit()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rpc-cache")
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.db.execute("SELECT result FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, result: Any) -> None:
+        self.db.execute("INSERT OR REPLACE INTO responses (key, result) VALUES (?, ?)", (key, json.dumps(result)))
+        self.db.commit()
+
+    async def async_get(self, key: str) -> Optional[Any]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, key)
+
+    async def async_put(self, key: str, result: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.put, key, result)
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        # 等待已提交的写入完成后再关闭连接
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+
+class CachingRpcProxy:
+    """
+    缓存 JSON-RPC 代理
+
+    Args:
+        upstream_url: 上游节点地址，offline 为 True 时可为空
+        cache_path: sqlite 缓存文件
+        offline: 只使用已录制的缓存，未命中的请求返回错误
+    """
+
+    def __init__(self, upstream_url: Optional[str], cache_path: str = "rpc_cache.sqlite", offline: bool = False) -> None:
+        if not offline and not upstream_url:
+            raise ValueError("upstream_url is required unless offline")
+        self.upstream_url = upstream_url
+        self.offline = offline
+        self.store = ResponseStore(cache_path)
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats = {"hits": 0, "misses": 0, "deduped": 0, "passthrough": 0}
+
+    async def _upstream(self, payload: Any) -> Any:
+        if self.offline:
+            raise RuntimeError("cache miss in offline mode")
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60))
+        async with self._session.post(self.upstream_url, json=payload) as response:  # type: ignore
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def _fetch_cacheable(self, key: str, request: dict[str, Any]) -> dict[str, Any]:
+        """返回上游的完整响应，成功的结果写入缓存"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["deduped"] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            self.stats["misses"] += 1
+            response = await self._upstream({**request, "id": 1})
+            if "error" not in response and response.get("result") is not None:
+                await self.store.async_put(key, response["result"])
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def handle_call(self, request: dict[str, Any]) -> dict[str, Any]:
+        request_id = request.get("id")
+        key = cache_key(request.get("method", ""), request.get("params") or [])
+        try:
+            if key is None:
+                self.stats["passthrough"] += 1
+                response = await self._upstream(request)
+                return response
+            result = await self.store.async_get(key)
+            if result is not None:
+                self.stats["hits"] += 1
+                return {"jsonrpc": "2.0", "id": request_id, "result": result}
+            response = await self._fetch_cacheable(key, request)
+            return {**response, "id": request_id}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": f"proxy error: {e}"}}
+
+    async def handle(self, http_request: web.Request) -> web.Response:
+        try:
+            payload = await http_request.json()
+        except ValueError:
+            return web.json_response({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+        if isinstance(payload, list):
+            responses = await asyncio.gather(*(self.handle_call(call) for call in payload))
+            return web.json_response(list(responses))
+        return web.json_response(await self.handle_call(payload))
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/", self.handle)
+        app.on_cleanup.append(lambda _: self.close())
+        return app
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await asyncio.to_thread(self.store.close)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Caching JSON-RPC proxy for anvil --fork-url")
+    parser.add_argument("--upstream", default=None, help="Upstream archive node url")
+    parser.add_argument("--cache", default="rpc_cache.sqlite", help="sqlite cache file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--offline", action="store_true", help="Serve only recorded responses")
+    args = parser.parse_args()
+
+    proxy = CachingRpcProxy(args.upstream, args.cache, args.offline)
+    web.run_app(proxy.make_app(), host=args.host, port=args.port)
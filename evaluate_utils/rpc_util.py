@@ -0,0 +1,403 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3, HTTPProvider, IPCProvider, LegacyWebSocketProvider
+from web3._utils.http_session_manager import HTTPSessionManager
+from web3.types import RPCEndpoint, RPCResponse
+from dataset.constants import RPC_URL
+
+T = TypeVar("T")
+IPC_SCHEME = "ipc://"
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "0.0.0.0"}
+# 阻塞的链上调用 (同步 w3、validate.py 的 get_balances、pre_script) 所用的线程数
+CHAIN_IO_WORKERS = 32
+
+# 当前上下文中的节点路由表: 配置中的 RPC 地址 -> 实际租用的节点地址
+_endpoint_routes: ContextVar[dict[str, str]] = ContextVar("endpoint_routes", default={})
+# 同一路由表中租用节点的 HTTP 地址，供直接创建的 HTTPProvider 使用 (它们不支持 ws:// / ipc://)
+_http_routes: ContextVar[dict[str, str]] = ContextVar("http_routes", default={})
+# batch() 作用域内的合并等待时间 (秒)
+_batch_window: ContextVar[float] = ContextVar("batch_window", default=0.0)
+
+# 只读请求可以合并进批量请求，交易发送和 anvil/evm 控制类请求保持原顺序单独发送
+BATCHABLE_METHODS = {
+    "eth_call",
+    "eth_getBalance",
+    "eth_getCode",
+    "eth_getStorageAt",
+    "eth_getTransactionCount",
+    "eth_getTransactionReceipt",
+    "eth_getTransactionByHash",
+    "eth_getBlockByNumber",
+    "eth_getLogs",
+    "eth_blockNumber",
+    "eth_chainId",
+    "eth_gasPrice",
+    "eth_maxPriorityFeePerGas",
+    "eth_estimateGas",
+}
+
+# 成功后节点状态被整体替换的请求，本地缓存的 nonce 等随之失效
+STATE_RESET_METHODS = {"evm_revert", "anvil_reset", "anvil_loadState", "anvil_dropAllTransactions", "anvil_setNonce"}
+SEND_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+# 节点状态重置时以实际节点地址调用
+_state_reset_listeners: list[Callable[[str], None]] = []
+
+
+def add_state_reset_listener(listener: Callable[[str], None]) -> None:
+    _state_reset_listeners.append(listener)
+
+
+def notify_state_reset(endpoint_uri: str) -> None:
+    for listener in _state_reset_listeners:
+        listener(endpoint_uri)
+
+
+def _observe_response(endpoint_uri: str, method: str, response: Any) -> None:
+    """状态重置成功，或交易被拒绝 (预分配的 nonce 未被使用) 时通知监听者"""
+    if not isinstance(response, dict):
+        return
+    if (method in STATE_RESET_METHODS and "error" not in response) or (method in SEND_METHODS and "error" in response):
+        notify_state_reset(endpoint_uri)
+
+
+class _SharedSessionManager(HTTPSessionManager):
+    """所有 provider 共用的 keep-alive 连接池，每个 (线程, 节点) 一个 requests.Session"""
+
+    def cache_and_return_session(self, endpoint_uri, session=None, request_timeout=None):  # type: ignore[no-untyped-def]
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return super().cache_and_return_session(endpoint_uri, session, request_timeout)
+
+
+_session_manager = _SharedSessionManager(cache_size=256)
+
+
+class _PendingCall:
+    def __init__(self, method: RPCEndpoint, params: Any) -> None:
+        self.method = method
+        self.params = params
+        self.done = threading.Event()
+        # 被唤醒时若 lead 为 True，由本线程发送下一批
+        self.lead = False
+        self.response: Optional[RPCResponse] = None
+        self.error: Optional[BaseException] = None
+
+    def result(self) -> RPCResponse:
+        if self.error is not None:
+            raise self.error
+        return self.response  # type: ignore
+
+
+class _Coalescer:
+    """
+    单个节点的请求合并器
+
+    节点空闲时请求直接发出，不增加延迟；已有请求在途时后来的请求排队，
+    在途请求返回后由队首线程把整个队列作为一次批量请求发出。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: list[_PendingCall] = []
+        self._busy = False
+        self.stats = {"requests": 0, "round_trips": 0}
+
+    def request(self, provider: "BatchingHTTPProvider", method: RPCEndpoint, params: Any) -> RPCResponse:
+        call = _PendingCall(method, params)
+        with self._lock:
+            self._queue.append(call)
+            waiting, self._busy = self._busy, True
+        if waiting:
+            call.done.wait()
+            if not call.lead:
+                return call.result()
+        self._drain(provider, _batch_window.get())
+        return call.result()
+
+    def _drain(self, provider: "BatchingHTTPProvider", window: float) -> None:
+        if window > 0:
+            time.sleep(window)
+        with self._lock:
+            calls, self._queue = self._queue, []
+        try:
+            self.stats["requests"] += len(calls)
+            self.stats["round_trips"] += 1
+            if len(calls) == 1:
+                calls[0].response = provider.send_request(calls[0].method, calls[0].params)
+            else:
+                responses = provider.make_batch_request([(call.method, call.params) for call in calls])
+                if not isinstance(responses, list):
+                    # 整个批量请求被拒绝时节点只返回一个错误对象
+                    responses = [responses] * len(calls)
+                for call, response in zip(calls, responses):
+                    call.response = response
+        except BaseException as e:
+            for call in calls:
+                call.error = e
+        finally:
+            with self._lock:
+                if self._queue:
+                    self._queue[0].lead = True
+                    self._queue[0].done.set()
+                else:
+                    self._busy = False
+            for call in calls:
+                call.done.set()
+
+
+# 实际节点地址 -> 合并器
+_coalescers: dict[str, _Coalescer] = {}
+_registry_lock = threading.Lock()
+
+
+def _coalescer(endpoint_uri: str) -> _Coalescer:
+    with _registry_lock:
+        return _coalescers.setdefault(endpoint_uri, _Coalescer())
+
+
+def is_http(endpoint_uri: str) -> bool:
+    return endpoint_uri.startswith(("http://", "https://"))
+
+
+# 非 HTTP 节点地址 (ws:// 或 ipc://路径) -> 持久连接的 provider
+_socket_providers: dict[str, Union[IPCProvider, LegacyWebSocketProvider]] = {}
+
+
+def socket_provider(endpoint_uri: str) -> Union[IPCProvider, LegacyWebSocketProvider]:
+    """节点地址对应的 IPC / WebSocket provider，每个地址一个持久连接"""
+    with _registry_lock:
+        if endpoint_uri not in _socket_providers:
+            if endpoint_uri.startswith(IPC_SCHEME):
+                _socket_providers[endpoint_uri] = IPCProvider(endpoint_uri[len(IPC_SCHEME):], timeout=60)
+            elif endpoint_uri.startswith(("ws://", "wss://")):
+                _socket_providers[endpoint_uri] = LegacyWebSocketProvider(endpoint_uri, websocket_timeout=60)
+            else:
+                raise ValueError(f"Unsupported endpoint {endpoint_uri}")
+        return _socket_providers[endpoint_uri]
+
+
+def subscription_uri(endpoint_uri: str) -> Optional[str]:
+    """
+    可用于 eth_subscribe 的 WebSocket 地址
+
+    anvil 在同一端口上同时提供 HTTP 和 WebSocket，本地 HTTP 节点直接换成 ws://；
+    远程 HTTP 节点和 IPC 返回 None。
+    """
+    if endpoint_uri.startswith(("ws://", "wss://")):
+        return endpoint_uri
+    if is_http(endpoint_uri):
+        url = urlparse(endpoint_uri)
+        if url.hostname in LOCAL_HOSTS:
+            return url._replace(scheme="ws").geturl()
+    return None
+
+
+class RoutedHTTPProvider(HTTPProvider):
+    """
+    按上下文路由的 HTTPProvider
+
+    模块级别创建的 w3 (validate.py / evaluate_utils) 只认识 RPC_URL,
+    评估时通过 use_endpoint() 把请求转发到当前协程租用的 anvil 节点。
+    """
+
+    @property
+    def endpoint_uri(self) -> str:
+        return _endpoint_routes.get().get(self._endpoint_uri, self._endpoint_uri)
+
+    @endpoint_uri.setter
+    def endpoint_uri(self, value: str) -> None:
+        self._endpoint_uri = value
+
+
+class RoutedAsyncHTTPProvider(AsyncHTTPProvider):
+    """按上下文路由的 AsyncHTTPProvider，路由规则与 RoutedHTTPProvider 相同"""
+
+    @property
+    def endpoint_uri(self) -> str:
+        return _endpoint_routes.get().get(self._endpoint_uri, self._endpoint_uri)
+
+    @endpoint_uri.setter
+    def endpoint_uri(self, value: str) -> None:
+        self._endpoint_uri = value
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        endpoint_uri = self.endpoint_uri
+        if is_http(endpoint_uri):
+            response = await super().make_request(method, params)
+        else:
+            # 路由到 IPC / WebSocket 节点时使用同步的持久连接，在线程池中执行
+            response = await run_sync(socket_provider(endpoint_uri).make_request, method, params)
+        _observe_response(endpoint_uri, method, response)
+        return response
+
+    async def make_batch_request(self, requests: list[tuple[RPCEndpoint, Any]]) -> Union[list[RPCResponse], RPCResponse]:  # type: ignore[override]
+        endpoint_uri = self.endpoint_uri
+        if is_http(endpoint_uri):
+            return await super().make_batch_request(requests)
+        return await run_sync(socket_provider(endpoint_uri).make_batch_request, requests)
+
+
+class BatchingHTTPProvider(RoutedHTTPProvider):
+    """
+    合并并发只读请求的 RoutedHTTPProvider
+
+    同一节点上同时在途的只读请求合并为一次 JSON-RPC 批量请求，
+    所有实例共用按节点缓存的连接池，由 get_web3() / route_web3() 创建。
+    节点地址为 ws:// 或 ipc://路径 时改用对应的持久连接发送。
+    """
+
+    def __init__(self, endpoint_uri: str, **kwargs: Any) -> None:
+        super().__init__(endpoint_uri, **kwargs)
+        self._request_session_manager = _session_manager
+
+    def send_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        """不经过合并器直接发送单个请求"""
+        endpoint_uri = self.endpoint_uri
+        if is_http(endpoint_uri):
+            response = super().make_request(method, params)
+        else:
+            response = socket_provider(endpoint_uri).make_request(method, params)
+        _observe_response(endpoint_uri, method, response)
+        return response
+
+    def make_batch_request(self, requests: list[tuple[RPCEndpoint, Any]]) -> Union[list[RPCResponse], RPCResponse]:  # type: ignore[override]
+        endpoint_uri = self.endpoint_uri
+        if is_http(endpoint_uri):
+            return super().make_batch_request(requests)
+        return socket_provider(endpoint_uri).make_batch_request(requests)
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method not in BATCHABLE_METHODS:
+            return self.send_request(method, params)
+        return _coalescer(self.endpoint_uri).request(self, method, params)
+
+
+@contextmanager
+def batch(window: float = 0.005) -> Iterator[None]:
+    """
+    在当前上下文内等待 window 秒再发送请求，使并发发起的请求 (线程、asyncio.to_thread) 合并为一次批量请求
+
+    作用域外请求仍会与同时在途的请求合并，但不会额外等待。
+    """
+    token = _batch_window.set(window)
+    try:
+        yield
+    finally:
+        _batch_window.reset(token)
+
+
+def batching_stats(endpoint_uri: Optional[str] = None) -> dict[str, dict[str, int]]:
+    """各节点合并前的请求数和实际往返次数"""
+    with _registry_lock:
+        return {
+            uri: dict(coalescer.stats)
+            for uri, coalescer in _coalescers.items()
+            if endpoint_uri is None or uri == endpoint_uri
+        }
+
+
+@contextmanager
+def use_endpoint(endpoint_uri: str, upstream_uri: str = RPC_URL, http_uri: Optional[str] = None) -> Iterator[str]:
+    """
+    在当前上下文内把发往 upstream_uri 的请求改发到 endpoint_uri
+
+    Args:
+        endpoint_uri: 实际使用的节点地址
+        upstream_uri: 代码中配置的节点地址，默认 RPC_URL
+        http_uri: endpoint_uri 不是 HTTP 地址时同一节点的 HTTP 地址，直接创建的 HTTPProvider 改发到这里
+    """
+    routes = dict(_endpoint_routes.get())
+    routes[upstream_uri] = endpoint_uri
+    http_routes = dict(_http_routes.get())
+    http_uri = http_uri or (endpoint_uri if is_http(endpoint_uri) else None)
+    if http_uri:
+        http_routes[upstream_uri] = http_uri
+    token = _endpoint_routes.set(routes)
+    http_token = _http_routes.set(http_routes)
+    try:
+        yield endpoint_uri
+    finally:
+        _http_routes.reset(http_token)
+        _endpoint_routes.reset(token)
+
+
+def _routed_http_uri(provider: HTTPProvider) -> str:
+    # 打补丁前创建的 provider 把地址存在实例属性 endpoint_uri 中
+    uri = provider.__dict__.get("_endpoint_uri") or provider.__dict__.get("endpoint_uri")
+    return _http_routes.get().get(uri, uri)
+
+
+def _set_http_uri(provider: HTTPProvider, value: str) -> None:
+    provider.__dict__["_endpoint_uri"] = value
+
+
+def route_http_providers() -> None:
+    """
+    让所有 HTTPProvider 都按 use_endpoint() 路由
+
+    pre_script 在 main() 中或 reload 时新建的 Web3(HTTPProvider(RPC_URL)) 不经过 route_web3()，
+    在 HTTPProvider 类上安装可路由的 endpoint_uri 后，这些请求同样发往当前上下文租用的节点。
+    没有路由时地址不变，可重复调用。
+    """
+    if not isinstance(HTTPProvider.__dict__.get("endpoint_uri"), property):
+        HTTPProvider.endpoint_uri = property(_routed_http_uri, _set_http_uri)  # type: ignore[assignment]
+
+
+def get_provider(endpoint_uri: str = RPC_URL, **kwargs: Any) -> BatchingHTTPProvider:
+    """provider 工厂: 可路由、合并并发请求、共用连接池"""
+    return BatchingHTTPProvider(endpoint_uri, **kwargs)
+
+
+def route_web3(w3: Optional[Web3]) -> Optional[Web3]:
+    """把已有 w3 的 HTTPProvider 替换为工厂创建的 provider，合约对象会跟随生效"""
+    if w3 is None or isinstance(w3.provider, BatchingHTTPProvider):
+        return w3
+    if isinstance(w3.provider, HTTPProvider):
+        w3.provider = get_provider(w3.provider.endpoint_uri)
+    return w3
+
+
+def get_web3(endpoint_uri: str = RPC_URL) -> Web3:
+    return Web3(get_provider(endpoint_uri))
+
+
+# 配置的节点地址 -> AsyncWeb3
+_async_web3s: dict[str, AsyncWeb3] = {}
+_chain_executor = ThreadPoolExecutor(max_workers=CHAIN_IO_WORKERS, thread_name_prefix="chain-io")
+
+
+def get_async_web3(endpoint_uri: str = RPC_URL) -> AsyncWeb3:
+    """按配置的节点地址共用的 AsyncWeb3，同样受 use_endpoint() 路由"""
+    if endpoint_uri not in _async_web3s:
+        _async_web3s[endpoint_uri] = AsyncWeb3(RoutedAsyncHTTPProvider(endpoint_uri))
+    return _async_web3s[endpoint_uri]
+
+
+def async_web3_for(w3: Web3) -> AsyncWeb3:
+    """与同步 w3 指向同一 (配置的) 节点的 AsyncWeb3"""
+    provider = w3.provider
+    return get_async_web3(getattr(provider, "_endpoint_uri", None) or provider.endpoint_uri)  # type: ignore
+
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在链 I/O 线程池中执行阻塞调用，事件循环不被阻塞
+
+    与 asyncio.to_thread 一样复制当前上下文，use_endpoint() 路由和 batch() 窗口在线程中依然生效。
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_chain_executor, call)
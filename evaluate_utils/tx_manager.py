@@ -0,0 +1,309 @@
+"""
+评估侧的交易管理
+
+按 (节点, 账户) 在本地分配 nonce，节点状态被回滚、重置或交易被拒绝时自动丢弃，下次使用时重新同步；
+chain id 按节点缓存，手续费参数按区块缓存；整个交易列表的 gas 用一次批量 eth_estimateGas 估算。
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Optional
+from eth_account.signers.local import LocalAccount
+from hexbytes import HexBytes
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound, Web3RPCError
+from web3.types import TxParams, TxReceipt
+from websockets.asyncio.client import connect as async_ws_connect
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect as ws_connect
+from evaluate_utils.rpc_util import add_state_reset_listener, subscription_uri
+
+# 估算值乘以该系数作为 gas limit，覆盖退款和 63/64 规则带来的差额
+GAS_LIMIT_MARGIN = 1.5
+RECEIPT_TIMEOUT = 120
+# 无法订阅 newHeads 时 (IPC、远程 HTTP 节点) 的轮询间隔
+RECEIPT_POLL_LATENCY = 0.01
+SUBSCRIBE_NEW_HEADS = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]})
+
+_lock = threading.Lock()
+# (节点, 账户) -> 下一个 nonce
+_nonces: dict[tuple[str, str], int] = {}
+# 节点 -> chain id
+_chain_ids: dict[str, int] = {}
+# 节点 -> (区块号, 手续费参数)
+_fees: dict[str, tuple[int, dict[str, int]]] = {}
+# 节点 -> 从回执中看到的最新区块
+_latest_blocks: dict[str, int] = {}
+
+
+def _endpoint(w3: Any) -> str:
+    return getattr(w3.provider, "endpoint_uri", None) or ""
+
+
+def resync(endpoint_uri: str, address: Optional[str] = None) -> None:
+    """丢弃节点上 (某个账户) 本地记录的 nonce，address 为空时一并丢弃手续费缓存"""
+    with _lock:
+        for key in [key for key in _nonces if key[0] == endpoint_uri and (address is None or key[1] == address)]:
+            del _nonces[key]
+        if address is None:
+            _fees.pop(endpoint_uri, None)
+            _latest_blocks.pop(endpoint_uri, None)
+
+
+add_state_reset_listener(resync)
+
+
+def _allocate(key: tuple[str, str], chain_nonce: Optional[int]) -> Optional[int]:
+    with _lock:
+        nonce = _nonces.get(key)
+        if nonce is None:
+            if chain_nonce is None:
+                return None
+            nonce = chain_nonce
+        _nonces[key] = nonce + 1
+        return nonce
+
+
+def next_nonce(w3: Web3, address: str) -> int:
+    """分配 address 在当前节点上的下一个 nonce，只在第一次或重新同步后查询链上"""
+    key = (_endpoint(w3), Web3.to_checksum_address(address))
+    nonce = _allocate(key, None)
+    if nonce is None:
+        nonce = _allocate(key, w3.eth.get_transaction_count(key[1], "pending"))
+    return nonce  # type: ignore
+
+
+async def async_next_nonce(w3: AsyncWeb3, address: str) -> int:
+    key = (_endpoint(w3), Web3.to_checksum_address(address))
+    nonce = _allocate(key, None)
+    if nonce is None:
+        nonce = _allocate(key, await w3.eth.get_transaction_count(key[1], "pending"))
+    return nonce  # type: ignore
+
+
+def chain_id(w3: Web3) -> int:
+    endpoint = _endpoint(w3)
+    if endpoint not in _chain_ids:
+        _chain_ids[endpoint] = w3.eth.chain_id
+    return _chain_ids[endpoint]
+
+
+async def async_chain_id(w3: AsyncWeb3) -> int:
+    endpoint = _endpoint(w3)
+    if endpoint not in _chain_ids:
+        _chain_ids[endpoint] = await w3.eth.chain_id
+    return _chain_ids[endpoint]
+
+
+def observe_receipt(w3: Any, receipt: Any) -> None:
+    """记录回执所在区块，出现新区块后手续费缓存失效"""
+    endpoint = _endpoint(w3)
+    block_number = receipt["blockNumber"]
+    with _lock:
+        if block_number > _latest_blocks.get(endpoint, -1):
+            _latest_blocks[endpoint] = block_number
+
+
+def _cached_fees(endpoint: str) -> Optional[dict[str, int]]:
+    with _lock:
+        cached = _fees.get(endpoint)
+        if cached is None or cached[0] < _latest_blocks.get(endpoint, -1):
+            return None
+        return dict(cached[1])
+
+
+def _store_fees(endpoint: str, responses: Any) -> dict[str, int]:
+    block = responses[0]["result"]
+    base_fee = int(block.get("baseFeePerGas") or "0x0", 16)
+    tip = int(responses[1]["result"], 16) if "result" in responses[1] else 0
+    fees = {"maxFeePerGas": 2 * base_fee + tip, "maxPriorityFeePerGas": tip}
+    with _lock:
+        _fees[endpoint] = (int(block["number"], 16), fees)
+    return dict(fees)
+
+
+FEE_REQUESTS = [("eth_getBlockByNumber", ["latest", False]), ("eth_maxPriorityFeePerGas", [])]
+
+
+def fee_params(w3: Web3) -> dict[str, int]:
+    """EIP-1559 手续费参数 (maxFeePerGas = 2 * baseFee + tip)，同一区块内只查询一次"""
+    endpoint = _endpoint(w3)
+    fees = _cached_fees(endpoint)
+    if fees is None:
+        fees = _store_fees(endpoint, w3.provider.make_batch_request(FEE_REQUESTS))  # type: ignore
+    return fees
+
+
+async def async_fee_params(w3: AsyncWeb3) -> dict[str, int]:
+    endpoint = _endpoint(w3)
+    fees = _cached_fees(endpoint)
+    if fees is None:
+        fees = _store_fees(endpoint, await w3.provider.make_batch_request(FEE_REQUESTS))  # type: ignore
+    return fees
+
+
+def _estimate_request(tx: TxParams) -> tuple[str, list[Any]]:
+    call = {"from": tx["from"], "to": tx["to"], "data": tx.get("data") or "0x", "value": hex(int(tx.get("value") or 0))}
+    return "eth_estimateGas", [call]
+
+
+def _limits(responses: Any, count: int) -> list[Optional[int]]:
+    if not isinstance(responses, list):
+        return [None] * count
+    return [
+        int(int(response["result"], 16) * GAS_LIMIT_MARGIN) if "result" in response else None
+        for response in responses
+    ]
+
+
+def estimate_gas_limits(w3: Web3, txs: list[Optional[TxParams]]) -> list[Optional[int]]:
+    """
+    一次批量 eth_estimateGas 估算交易列表的 gas limit
+
+    每笔交易都在当前状态上估算，依赖前面交易结果 (如先 approve 再 swap) 而估算失败的交易返回 None，
+    由调用方使用默认值；txs 中为 None 的交易不估算。
+    """
+    indexes = [index for index, tx in enumerate(txs) if tx is not None]
+    limits: list[Optional[int]] = [None] * len(txs)
+    if not indexes:
+        return limits
+    responses = w3.provider.make_batch_request([_estimate_request(txs[index]) for index in indexes])  # type: ignore
+    for index, limit in zip(indexes, _limits(responses, len(indexes))):
+        limits[index] = limit
+    return limits
+
+
+async def async_estimate_gas_limits(w3: AsyncWeb3, txs: list[Optional[TxParams]]) -> list[Optional[int]]:
+    """estimate_gas_limits 的异步版本"""
+    indexes = [index for index, tx in enumerate(txs) if tx is not None]
+    limits: list[Optional[int]] = [None] * len(txs)
+    if not indexes:
+        return limits
+    responses = await w3.provider.make_batch_request([_estimate_request(txs[index]) for index in indexes])  # type: ignore
+    for index, limit in zip(indexes, _limits(responses, len(indexes))):
+        limits[index] = limit
+    return limits
+
+
+def _check_subscription(message: Any) -> None:
+    response = json.loads(message)
+    if "error" in response:
+        raise ValueError(f"eth_subscribe failed: {response['error']}")
+
+
+def _wait_with_subscription(w3: Web3, ws_uri: str, tx_hash: HexBytes, timeout: float) -> TxReceipt:
+    deadline = time.monotonic() + timeout
+    with ws_connect(ws_uri, open_timeout=5) as ws:
+        ws.send(SUBSCRIBE_NEW_HEADS)
+        _check_subscription(ws.recv(timeout=5))
+        while True:
+            # 订阅建立之前交易可能已经上链，先查一次
+            try:
+                return w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                pass
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                ws.recv(timeout=remaining)
+            except TimeoutError:
+                raise TimeExhausted(f"Transaction {tx_hash.hex()} is not in the chain after {timeout} seconds")
+
+
+def _wait_for_receipt(w3: Web3, tx_hash: HexBytes, timeout: float) -> TxReceipt:
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        pass
+    ws_uri = subscription_uri(w3.provider.endpoint_uri)  # type: ignore
+    if ws_uri is not None:
+        try:
+            return _wait_with_subscription(w3, ws_uri, tx_hash, timeout)
+        except (OSError, WebSocketException, ValueError) as e:
+            print(f"Subscribe newHeads on {ws_uri} failed, polling instead: {e}")
+    return w3.eth.wait_for_transaction_receipt(tx_hash, timeout, RECEIPT_POLL_LATENCY)
+
+
+def wait_for_receipt(w3: Web3, tx_hash: HexBytes, timeout: float = RECEIPT_TIMEOUT) -> TxReceipt:
+    """
+    等待交易回执
+
+    anvil 自动出块时第一次查询就能拿到回执；否则订阅 newHeads，每出一个块查询一次，
+    不能订阅时按 RECEIPT_POLL_LATENCY 轮询。
+    """
+    receipt = _wait_for_receipt(w3, tx_hash, timeout)
+    observe_receipt(w3, receipt)
+    return receipt
+
+
+async def _async_wait_with_subscription(w3: AsyncWeb3, ws_uri: str, tx_hash: HexBytes, timeout: float) -> TxReceipt:
+    deadline = time.monotonic() + timeout
+    async with async_ws_connect(ws_uri, open_timeout=5) as ws:
+        await ws.send(SUBSCRIBE_NEW_HEADS)
+        _check_subscription(await asyncio.wait_for(ws.recv(), 5))
+        while True:
+            try:
+                return await w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                pass
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                await asyncio.wait_for(ws.recv(), remaining)
+            except TimeoutError:
+                raise TimeExhausted(f"Transaction {tx_hash.hex()} is not in the chain after {timeout} seconds")
+
+
+async def _async_wait_for_receipt(w3: AsyncWeb3, tx_hash: HexBytes, timeout: float) -> TxReceipt:
+    try:
+        return await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        pass
+    ws_uri = subscription_uri(w3.provider.endpoint_uri)  # type: ignore
+    if ws_uri is not None:
+        try:
+            return await _async_wait_with_subscription(w3, ws_uri, tx_hash, timeout)
+        except (OSError, WebSocketException, ValueError) as e:
+            print(f"Subscribe newHeads on {ws_uri} failed, polling instead: {e}")
+    return await w3.eth.wait_for_transaction_receipt(tx_hash, timeout, RECEIPT_POLL_LATENCY)
+
+
+async def async_wait_for_receipt(w3: AsyncWeb3, tx_hash: HexBytes, timeout: float = RECEIPT_TIMEOUT) -> TxReceipt:
+    """wait_for_receipt 的异步版本"""
+    receipt = await _async_wait_for_receipt(w3, tx_hash, timeout)
+    observe_receipt(w3, receipt)
+    return receipt
+
+
+def send_transaction(w3: Web3, account: LocalAccount, tx: TxParams) -> TxReceipt:
+    """
+    签名发送一笔交易并等待回执，供 pre_script 和 evaluate_utils 中的辅助函数使用
+
+    缺少的 nonce、chainId、手续费和 gas 由本模块补全；nonce 过低 (链上已被其它进程使用) 时重新同步后重试一次。
+    """
+    tx = dict(tx)  # type: ignore
+    tx["from"] = account.address
+    tx.setdefault("chainId", chain_id(w3))
+    if "gasPrice" not in tx and "maxFeePerGas" not in tx:
+        tx.update(fee_params(w3))
+    if "gas" not in tx:
+        tx["gas"] = estimate_gas_limits(w3, [tx])[0] or w3.eth.estimate_gas(tx)  # type: ignore
+    explicit_nonce = "nonce" in tx
+    try:
+        tx_hash = _sign_and_send(w3, account, tx, explicit_nonce)
+    except Web3RPCError as e:
+        if explicit_nonce or "nonce" not in str(e).lower():
+            raise
+        # 被拒绝的交易已触发重新同步，这次会从链上读取 nonce
+        print(f"Nonce of {account.address} out of sync, retrying: {e}")
+        tx_hash = _sign_and_send(w3, account, tx, explicit_nonce)
+    return wait_for_receipt(w3, tx_hash)
+
+
+def _sign_and_send(w3: Web3, account: LocalAccount, tx: dict[str, Any], explicit_nonce: bool) -> HexBytes:
+    if not explicit_nonce:
+        tx["nonce"] = next_nonce(w3, account.address)
+    return w3.eth.send_raw_transaction(account.sign_transaction(tx).raw_transaction)
@@ -3,7 +3,11 @@ import os, time, json
 from decimal import Decimal
 from typing import Optional
 from eth_typing import ChecksumAddress
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from evaluate_utils.abi_registry import contract
+from evaluate_utils.rpc_util import get_web3
+from evaluate_utils import tx_manager
+from evaluate_utils.tx_manager import next_nonce
 from web3.types import TxParams
 from eth_account.signers.local import LocalAccount
 from dataset.constants import (
@@ -18,22 +22,6 @@ ROUTER = Web3.to_checksum_address("0xE592427A0AEce92De3Edee1F18E0157C05861564")
 QUOTER = Web3.to_checksum_address("0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6")
 NPM = Web3.to_checksum_address(UNISWAP_NPM_ADDRESS_ETH)
 # 最小ABI
-ERC20_ABI = json.loads("""[
-  {"constant":true,"inputs":[{"name":"owner","type":"address"}],
-   "name":"balanceOf","outputs":[{"name":"","type":"uint256"}],
-   "stateMutability":"view","type":"function"},
-  {"constant":false,"inputs":[
-     {"name":"spender","type":"address"},
-     {"name":"amount","type":"uint256"}],
-   "name":"approve","outputs":[{"name":"","type":"bool"}],
-   "stateMutability":"nonpayable","type":"function"}
-]""")
-
-WETH_ABI = json.loads("""[
-  {"inputs":[],"name":"deposit","outputs":[],
-   "stateMutability":"payable","type":"function"}
-]""") + ERC20_ABI
-
 ROUTER_ABI = json.loads("""[
   {"inputs":[{"components":[
      {"name":"tokenIn","type":"address"},
@@ -50,19 +38,12 @@ ROUTER_ABI = json.loads("""[
    "stateMutability":"payable","type":"function"}
 ]""")
 
-w3 = Web3(HTTPProvider(RPC_URL))
+w3 = get_web3(RPC_URL)
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 
 def send_transaction(tx: TxParams):
-    tx.update({
-        "nonce": w3.eth.get_transaction_count(addr),
-        "chainId": w3.eth.chain_id,
-    })
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    return tx_manager.send_transaction(w3, account, tx)
 
 
 def swap(
@@ -82,7 +63,7 @@ def swap(
         amount_token_1: 最小期望输出代币数量（可选，默认为0，表示不限制滑点）
     """
     # 1. 授权Router合约花费token_0
-    token_0 = w3.eth.contract(address=token_0_address, abi=ERC20_ABI)
+    token_0 = contract(w3, token_0_address, "erc20")
     print(f"\n1. 授权Uniswap V3 Router花费 {amount_token_0} token_0 ...")
     receipt = send_transaction(
         token_0.functions.approve(ROUTER, amount_token_0).build_transaction({
@@ -126,7 +107,7 @@ def swap_weth_to_usdc(amount_weth: float):
     amount_in_wei = int(amount_weth * 10**18)
     
     # 1. Wrap ETH to WETH
-    weth = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=WETH_ABI)
+    weth = contract(w3, WETH_CONTRACT_ADDRESS_ETH, "weth")
 
     # 2. Approve Router
     print("\n2. Approving Router to spend WETH...")
@@ -163,7 +144,7 @@ def swap_weth_to_usdc(amount_weth: float):
     print("Swap complete, gas used:", receipt.gasUsed)
 
     # 检查USDC余额
-    usdc = w3.eth.contract(address=Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
+    usdc = contract(w3, USDC_CONTRACT_ADDRESS_ETH, "erc20")
     usdc_balance = usdc.functions.balanceOf(addr).call()
     print(f"\nSwap结果: 获得 {usdc_balance / 10**6:.2f} USDC")
 
@@ -172,7 +153,7 @@ def approve_nft():
     # （可选）如果要走 Router，一次性批量授权
     tx = pm.functions.setApprovalForAll(ROUTER, True).build_transaction({
         "from": my_addr,
-        "nonce": w3.eth.get_transaction_count(my_addr),
+        "nonce": next_nonce(w3, my_addr),
     })
     signed = w3.eth.account.sign_transaction(tx, private_key)
     w3.eth.send_raw_transaction(signed.raw_transaction)
\ No newline at end of file
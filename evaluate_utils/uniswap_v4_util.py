@@ -1,6 +1,9 @@
 import os, time, json
 from decimal import Decimal
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from evaluate_utils.abi_registry import contract
+from evaluate_utils.rpc_util import get_web3
+from evaluate_utils import tx_manager
 from web3.types import TxParams
 from eth_account.signers.local import LocalAccount
 from dataset.constants import (
@@ -14,38 +17,15 @@ ROUTER = Web3.to_checksum_address(UNISWAP_V4_ROUTER_ADDRESS_ETH)
 QUOTER = Web3.to_checksum_address(UNISWAP_V4_QUETOR_ADDRESS_ETH)
 
 # 最小ABI
-ERC20_ABI = json.loads("""[
-  {"constant":true,"inputs":[{"name":"owner","type":"address"}],
-   "name":"balanceOf","outputs":[{"name":"","type":"uint256"}],
-   "stateMutability":"view","type":"function"},
-  {"constant":false,"inputs":[
-     {"name":"spender","type":"address"},
-     {"name":"amount","type":"uint256"}],
-   "name":"approve","outputs":[{"name":"","type":"bool"}],
-   "stateMutability":"nonpayable","type":"function"}
-]""")
-
-WETH_ABI = json.loads("""[
-  {"inputs":[],"name":"deposit","outputs":[],
-   "stateMutability":"payable","type":"function"}
-]""") + ERC20_ABI
-
 ROUTER_ABI = json.loads("""[
   {"inputs":[{"internalType":"bytes","name":"commands","type":"bytes"},{"internalType":"bytes[]","name":"inputs","type":"bytes[]"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"name":"execute","outputs":[],"stateMutability":"payable","type":"function"}""")
 
-w3 = Web3(HTTPProvider(RPC_URL))
+w3 = get_web3(RPC_URL)
 account: LocalAccount = w3.eth.account.from_key(PRIVATE_KEY)
 addr = account.address
 
 def send_transaction(tx: TxParams):
-    tx.update({
-        "nonce": w3.eth.get_transaction_count(addr),
-        "chainId": w3.eth.chain_id,
-    })
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    return tx_manager.send_transaction(w3, account, tx)
 
 async def swap_eth_to_usdc(amount_eth: float):
     """
@@ -58,7 +38,7 @@ async def swap_eth_to_usdc(amount_eth: float):
     
     # 1. Approve Router
     print("\n1. Approving Router to spend ETH...")
-    weth = w3.eth.contract(address=Web3.to_checksum_address(WETH_CONTRACT_ADDRESS_ETH), abi=WETH_ABI)
+    weth = contract(w3, WETH_CONTRACT_ADDRESS_ETH, "weth")
     receipt = send_transaction(
         weth.functions.approve(ROUTER, amount_in_wei).build_transaction({
             "from": addr,
@@ -90,7 +70,7 @@ async def swap_eth_to_usdc(amount_eth: float):
     print("Swap complete, gas used:", receipt.gasUsed)
 
     # 检查USDC余额
-    usdc = w3.eth.contract(address=Web3.to_checksum_address(USDC_CONTRACT_ADDRESS_ETH), abi=ERC20_ABI)
+    usdc = contract(w3, USDC_CONTRACT_ADDRESS_ETH, "erc20")
     usdc_balance = usdc.functions.balanceOf(addr).call()
     print(f"\nSwap结果: 获得 {usdc_balance / 10**6:.2f} USDC")
 
@@ -1,56 +1,163 @@
+from typing import Any, Optional
 import os
-from typing import Optional
 from eth_account import Account
-from web3 import Web3, HTTPProvider
+from web3 import AsyncWeb3, Web3, HTTPProvider
+from web3.exceptions import Web3RPCError
 from web3.types import TxParams
 from eth_account.signers.local import LocalAccount
+from hexbytes import HexBytes
+from evaluate_utils.tx_manager import (
+    async_chain_id, async_estimate_gas_limits, async_fee_params, async_next_nonce, async_wait_for_receipt,
+    chain_id, estimate_gas_limits, fee_params, next_nonce, wait_for_receipt,
+)
 
+# 交易没有给出 gas 且无法估算时使用的 gas limit (翻倍前)
+DEFAULT_GAS = 800_000
 
 
-def sign_and_send_transaction(tx: TxParams, account:LocalAccount, w3:Web3, bind_address:Optional[str] = None) -> tuple[bool, int]:
+def get_chain_id(w3: Web3) -> int:
+    return chain_id(w3)
+
+
+def _send_impersonated(tx: TxParams, w3: Web3) -> HexBytes:
+    """以 tx["from"] 的身份发送交易，不需要私钥"""
+    try:
+        return w3.eth.send_transaction(tx)
+    except Web3RPCError as e:
+        # 节点未开启该地址的冒充 (或节点重启过)，开启后重试
+        print(f"Impersonating {tx['from']}: {e}")
+        w3.provider.make_request("anvil_impersonateAccount", [tx["from"]])  # type: ignore
+        return w3.eth.send_transaction(tx)
+
+
+def _build_transaction(tx: TxParams, account:LocalAccount, bind_address:Optional[str] = None, impersonate:bool = False) -> tuple[Optional[TxParams], LocalAccount]:
+    """补全发送地址、to 和 gas 字段，不访问节点"""
     # 去除所有value为None的字段
     tx = {k: v for k, v in tx.items() if v is not None}
-    if not bind_address:
+    if impersonate:
+        sender = bind_address or tx.get("from") or account.address
+        tx.pop("nonce", None)
+        tx["from"] = Web3.to_checksum_address(sender)
+    elif not bind_address:
         original_from_addr = tx.get("from", None)
         if original_from_addr:
             to_replace_addr = original_from_addr.lower()[2:]
             replace_addr = account.address.lower()[2:]
             tx["data"] = tx["data"].replace(to_replace_addr, replace_addr)
-        tx.update({
-            "nonce": w3.eth.get_transaction_count(account.address),
-            "chainId": w3.eth.chain_id,
-            "from": w3.to_checksum_address(account.address),
-            "to": w3.to_checksum_address(tx.get("to", "")),
-        })
-    
+        tx["from"] = Web3.to_checksum_address(account.address)
     else:
         account = Account.from_key(os.environ.get("REAL_PRIVATE_KEY", None))
-        tx.update({
-            "nonce": w3.eth.get_transaction_count(account.address),
-            "chainId": w3.eth.chain_id,
-            "to": w3.to_checksum_address(tx.get("to", "")),
-            "from":w3.to_checksum_address(account.address)
-        })
+        tx["from"] = Web3.to_checksum_address(account.address)
+    tx["to"] = Web3.to_checksum_address(tx.get("to", ""))
 
     if tx.get('to', "") == "":
         print("Transaction failed! No 'to' address specified.")
-        return False, 0
+        return None, account
 
-    # Check if gasPrice is in tx
     if "maxFeePerGas" in tx and "maxPriorityFeePerGas" in tx:
-    # INSERT_YOUR_CODE
-    # 删除 gas 和 gasPrice 字段
         tx.pop('gasPrice', None)
-    elif "maxFeePerGas" not in tx and "maxPriorityFeePerGas" not in tx:
-        tx['gasPrice'] = w3.to_wei(30, 'gwei')
-        tx['gas'] = 800_000
-        
-    tx['gas']*=2
-        
-    print(tx)
+    return tx, account
+
+
+def _fill_gas(tx: TxParams, fees: Optional[dict[str, int]], gas_limit: Optional[int]) -> None:
+    """
+    没有给出 EIP-1559 手续费时使用节点当前的手续费参数 (fees)，gas limit 不低于 DEFAULT_GAS 的两倍
+    (与原先固定使用 DEFAULT_GAS * 2 的评分结果一致)；交易自带 gas 时 gas limit 至少为其两倍，
+    否则使用估算值 (无法估算时为 DEFAULT_GAS 的两倍)
+    """
+    agent_gas = tx['gas'] * 2 if 'gas' in tx else 0
+    if fees is not None:
+        tx.pop('gasPrice', None)
+        tx.update(fees)
+        tx['gas'] = max(agent_gas, gas_limit or 0, DEFAULT_GAS * 2)
+    else:
+        tx['gas'] = agent_gas or gas_limit or DEFAULT_GAS * 2
+
+
+def _needs_fees(tx: TxParams) -> bool:
+    return "maxFeePerGas" not in tx and "maxPriorityFeePerGas" not in tx
+
+
+def plan_gas_limits(tx_list: list[TxParams], account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False) -> list[Optional[int]]:
+    """用一次批量 eth_estimateGas 估算整个交易列表的 gas limit，自带 gas 和估算失败的交易为 None"""
+    return estimate_gas_limits(w3, _unsized(tx_list, account, bind_address, impersonate))
+
+
+def _unsized(tx_list: list[TxParams], account:LocalAccount, bind_address:Optional[str], impersonate:bool) -> list[Optional[TxParams]]:
+    """需要估算 gas 的交易，自带 gas 的交易为 None"""
+    built = [_build_transaction(tx, account, bind_address, impersonate)[0] for tx in tx_list]
+    return [tx if tx is not None and "gas" not in tx else None for tx in built]
+
+
+def prepare_transaction(tx: TxParams, account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False, nonces:Optional[dict[str, int]] = None, gas_limit:Optional[int] = None) -> tuple[Optional[TxParams], LocalAccount]:
+    """
+    补全交易字段
+
+    impersonate 为 True 时直接以交易中的 from 地址 (bind_address 优先，缺省为 account) 执行，
+    不改写 calldata。nonces 为各发送地址的下一个 nonce，给出时按顺序分配并递增 (只在本次调用内有效，
+    用于不一定上链的交易列表)；否则由 tx_manager 在本地分配。gas_limit 为 plan_gas_limits 的估算值，
+    只在交易没有给出 gas 时使用。
+
+    Returns:
+        tuple: (补全后的交易，没有 to 地址时为 None, 签名账户)
+    """
+    prepared, account = _build_transaction(tx, account, bind_address, impersonate)
+    if prepared is None:
+        return None, account
+    prepared["chainId"] = chain_id(w3)
+    prepared["nonce"] = _next_nonce(w3, prepared["from"], nonces)
+    _fill_gas(prepared, fee_params(w3) if _needs_fees(prepared) else None, gas_limit)
+    print(prepared)
+    return prepared, account
+
+
+def _next_nonce(w3: Web3, address: str, nonces: Optional[dict[str, int]]) -> int:
+    if nonces is None:
+        return next_nonce(w3, address)
+    if address not in nonces:
+        nonces[address] = w3.eth.get_transaction_count(address)
+    nonces[address] += 1
+    return nonces[address] - 1
+
+
+def send_transaction(tx: TxParams, account:LocalAccount, w3:Web3, impersonate:bool = False) -> HexBytes:
+    """发送 prepare_transaction 补全后的交易"""
+    if impersonate:
+        return _send_impersonated(tx, w3)
     sign_tx = account.sign_transaction(transaction_dict=tx)
-    tx_hash = w3.eth.send_raw_transaction(sign_tx.raw_transaction)
-    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    return w3.eth.send_raw_transaction(sign_tx.raw_transaction)
+
+
+def sign_and_send_transaction(tx: TxParams, account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False, gas_limit:Optional[int] = None, receipts:Optional[list[Any]] = None) -> tuple[bool, int]:
+    """
+    执行一笔交易
+
+    impersonate 为 True 时通过 anvil_impersonateAccount + eth_sendTransaction
+    以交易的 from 地址执行，不签名、不改写 calldata。
+    给出 receipts 时把交易回执追加到其中。nonce 过低 (链上已被其它进程使用) 时重新同步后重试一次。
+    """
+    prepared, account = prepare_transaction(tx, account, w3, bind_address, impersonate, gas_limit=gas_limit)
+    if prepared is None:
+        return False, 0
+    try:
+        tx_hash = send_transaction(prepared, account, w3, impersonate)
+    except Web3RPCError as e:
+        if not _is_nonce_error(e):
+            raise
+        # 被拒绝的交易已触发重新同步，这次会从链上读取 nonce
+        print(f"Nonce of {prepared['from']} out of sync, retrying: {e}")
+        prepared["nonce"] = next_nonce(w3, prepared["from"])
+        tx_hash = send_transaction(prepared, account, w3, impersonate)
+    return _report_receipt(prepared, wait_for_receipt(w3, tx_hash), receipts)
+
+
+def _is_nonce_error(error: Exception) -> bool:
+    return "nonce" in str(error).lower()
+
+
+def _report_receipt(prepared: TxParams, tx_receipt: Any, receipts: Optional[list[Any]] = None) -> tuple[bool, int]:
+    if receipts is not None:
+        receipts.append(tx_receipt)
     if tx_receipt["status"] == 1:
         print("Transaction succeeded!")
         print(f"Gas used: {tx_receipt['gasUsed']}")
@@ -58,12 +165,123 @@ def sign_and_send_transaction(tx: TxParams, account:LocalAccount, w3:Web3, bind_
         return True, tx_receipt["gasUsed"]
     else:
         print("Transaction failed!")
-        print(tx)
+        print(prepared)
         print(f"Transaction hash: {tx_receipt['transactionHash'].hex()}")
         print(tx_receipt.values())
         return False, 0
 
 
+def execute_bundle(tx_list: list[TxParams], account:LocalAccount, w3:Web3, bind_address:Optional[str] = None, impersonate:bool = False, receipts:Optional[list[Any]] = None) -> tuple[Optional[int], list[int]]:
+    """
+    在同一个区块中执行整个交易列表
+
+    关闭 automine，按顺序预分配 nonce 提交全部交易，evm_mine 出一个块，
+    再用一次批量请求取回所有回执。同一块内失败交易之后的交易仍会上链，由调用方回滚状态。
+    给出 receipts 时把 (原始 JSON 格式的) 回执追加到其中。
+
+    Returns:
+        tuple: (第一笔失败交易的下标，全部成功时为 None, 成功交易各自的 gas)
+    """
+    provider = w3.provider
+    provider.make_request("evm_setAutomine", [False])  # type: ignore
+    try:
+        nonces: dict[str, int] = {}
+        tx_hashes: list[HexBytes] = []
+        gas_limits = plan_gas_limits(tx_list, account, w3, bind_address, impersonate)
+        for index, (tx, gas_limit) in enumerate(zip(tx_list, gas_limits)):
+            prepared, signer = prepare_transaction(tx, account, w3, bind_address, impersonate, nonces, gas_limit)
+            if prepared is None:
+                return index, []
+            try:
+                tx_hashes.append(send_transaction(prepared, signer, w3, impersonate))
+            except Exception as e:
+                print(f"Transaction {index} rejected: {e}")
+                return index, []
+
+        provider.make_request("evm_mine", [])  # type: ignore
+        responses = provider.make_batch_request([("eth_getTransactionReceipt", [tx_hash.to_0x_hex()]) for tx_hash in tx_hashes])  # type: ignore
+        gas_used: list[int] = []
+        for index, response in enumerate(responses):
+            receipt = response.get("result")
+            # 没有回执说明交易未被打包 (例如超出区块 gas 上限)
+            if receipt and receipts is not None:
+                receipts.append(receipt)
+            if not receipt or int(receipt["status"], 16) != 1:
+                print(f"Transaction {index} failed: {tx_list[index]}")
+                return index, gas_used
+            gas_used.append(int(receipt["gasUsed"], 16))
+        print(f"Bundle of {len(tx_hashes)} transactions mined, gas used: {sum(gas_used)}")
+        return None, gas_used
+    finally:
+        # 丢弃未打包的交易，避免恢复 automine 后被意外打包
+        provider.make_request("anvil_dropAllTransactions", [])  # type: ignore
+        provider.make_request("evm_setAutomine", [True])  # type: ignore
+
+
+async def async_get_chain_id(w3: AsyncWeb3) -> int:
+    return await async_chain_id(w3)
+
+
+async def async_plan_gas_limits(tx_list: list[TxParams], account:LocalAccount, w3:AsyncWeb3, bind_address:Optional[str] = None, impersonate:bool = False) -> list[Optional[int]]:
+    """plan_gas_limits 的异步版本"""
+    return await async_estimate_gas_limits(w3, _unsized(tx_list, account, bind_address, impersonate))
+
+
+async def _async_send_impersonated(tx: TxParams, w3: AsyncWeb3) -> HexBytes:
+    try:
+        return await w3.eth.send_transaction(tx)
+    except Web3RPCError as e:
+        print(f"Impersonating {tx['from']}: {e}")
+        await w3.provider.make_request("anvil_impersonateAccount", [tx["from"]])  # type: ignore
+        return await w3.eth.send_transaction(tx)
+
+
+async def async_prepare_transaction(tx: TxParams, account:LocalAccount, w3:AsyncWeb3, bind_address:Optional[str] = None, impersonate:bool = False, nonces:Optional[dict[str, int]] = None, gas_limit:Optional[int] = None) -> tuple[Optional[TxParams], LocalAccount]:
+    """prepare_transaction 的异步版本"""
+    prepared, account = _build_transaction(tx, account, bind_address, impersonate)
+    if prepared is None:
+        return None, account
+    prepared["chainId"] = await async_chain_id(w3)
+    address = prepared["from"]
+    if nonces is None:
+        prepared["nonce"] = await async_next_nonce(w3, address)
+    else:
+        if address not in nonces:
+            nonces[address] = await w3.eth.get_transaction_count(address)
+        prepared["nonce"] = nonces[address]
+        nonces[address] += 1
+    _fill_gas(prepared, await async_fee_params(w3) if _needs_fees(prepared) else None, gas_limit)
+    print(prepared)
+    return prepared, account
+
+
+async def async_send_transaction(tx: TxParams, account:LocalAccount, w3:AsyncWeb3, impersonate:bool = False) -> HexBytes:
+    if impersonate:
+        return await _async_send_impersonated(tx, w3)
+    sign_tx = account.sign_transaction(transaction_dict=tx)
+    return await w3.eth.send_raw_transaction(sign_tx.raw_transaction)
+
+
+async def async_sign_and_send_transaction(tx: TxParams, account:LocalAccount, w3:AsyncWeb3, bind_address:Optional[str] = None, impersonate:bool = False, gas_limit:Optional[int] = None, receipts:Optional[list[Any]] = None) -> tuple[bool, int]:
+    """
+    sign_and_send_transaction 的异步版本
+
+    等待回执时让出事件循环，不阻塞同时进行的其它评估和 LLM 调用。
+    """
+    prepared, account = await async_prepare_transaction(tx, account, w3, bind_address, impersonate, gas_limit=gas_limit)
+    if prepared is None:
+        return False, 0
+    try:
+        tx_hash = await async_send_transaction(prepared, account, w3, impersonate)
+    except Web3RPCError as e:
+        if not _is_nonce_error(e):
+            raise
+        print(f"Nonce of {prepared['from']} out of sync, retrying: {e}")
+        prepared["nonce"] = await async_next_nonce(w3, prepared["from"])
+        tx_hash = await async_send_transaction(prepared, account, w3, impersonate)
+    return _report_receipt(prepared, await async_wait_for_receipt(w3, tx_hash), receipts)
+
+
 if __name__ == "__main__":
     from dataset.constants import PRIVATE_KEY
     w3 = Web3(HTTPProvider("http://127.0.0.1:8545"))
@@ -5,6 +5,7 @@ from dataset.constants import RPC_URL
 from demo.get_agent import get_agent
 from evaluator import get_eval_agent_by_task_id
 from evaluate_module.oce_evaluator import OCEEvaluator
+from demo.llm_clients import close_llm_clients
 import csv
 
 evaluator = OCEEvaluator(RPC_URL)
@@ -14,9 +15,13 @@ w3 = Web3(HTTPProvider(RPC_URL))
 async def run_eval(agent_outputs:list[AgentOutputItem], save_file:bool = False):
 
     # 执行批量评估
-    results = await evaluator.evaluate_batch(
-        agent_outputs=agent_outputs
-    )
+    try:
+        results = await evaluator.evaluate_batch(
+            agent_outputs=agent_outputs
+        )
+    finally:
+        # 关闭评估智能体共用的 LLM 连接池
+        await close_llm_clients()
 
     # 保存为CSV
     csv_file = "eval_results_parallel_20250704_152429_o3.csv"
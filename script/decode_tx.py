@@ -1,7 +1,7 @@
 import json
 from typing import Dict, Any, Optional
-from web3 import Web3
 from eth_abi.abi import decode
+from evaluate_utils.calldata_decoder import format_value, selector_index
 
 
 def get_canonical_type(param_type: Dict[str, Any]) -> str:
@@ -71,21 +71,8 @@ def decode_tx_data(hex_data: str, abi_json: str|dict) -> Dict[str, Any]:
         # 提取参数数据
         params_data = hex_data[10:]
         
-        # 在ABI中查找匹配的函数
-        target_function = None
-        for item in abi:
-            if item.get('type') == 'function':
-                # 计算函数签名的选择器
-                param_types = []
-                for input_param in item.get('inputs', []):
-                    param_types.append(get_canonical_type(input_param))
-                
-                function_signature = f"{item['name']}({','.join(param_types)})"
-                calculated_selector = '0x' + Web3.keccak(text=function_signature)[:4].hex()
-                
-                if calculated_selector == function_selector:
-                    target_function = item
-                    break
+        # 在ABI的选择器索引中查找匹配的函数 (同一ABI只计算一次)
+        target_function = selector_index(abi).get(function_selector.lower())
                     
         if target_function is None:
             return {
@@ -148,35 +135,7 @@ def format_decoded_value(value: Any, param_definition: Dict[str, Any]) -> Any:
     Returns:
         Any: 格式化后的值
     """
-    if isinstance(value, bytes):
-        # 将bytes转换为hex字符串
-        return '0x' + value.hex()
-    elif param_definition['type'] == 'tuple' and isinstance(value, tuple):
-        # 对于tuple类型，递归格式化其组件
-        formatted_tuple = {}
-        for i, (component_value, component_def) in enumerate(zip(value, param_definition['components'])):
-            component_name = component_def['name'] or f'field_{i}'
-            formatted_tuple[component_name] = format_decoded_value(component_value, component_def)
-        return formatted_tuple
-    elif param_definition['type'].endswith('[]') and isinstance(value, (list, tuple)):
-        # 对于数组类型，格式化每个元素
-        base_type = param_definition['type'][:-2]
-        if base_type == 'tuple':
-            # tuple数组
-            formatted_array = []
-            for item in value:
-                formatted_item = {}
-                for j, (component_value, component_def) in enumerate(zip(item, param_definition['components'])):
-                    component_name = component_def['name'] or f'field_{j}'
-                    formatted_item[component_name] = format_decoded_value(component_value, component_def)
-                formatted_array.append(formatted_item)
-            return formatted_array
-        else:
-            # 基本类型数组
-            return [format_decoded_value(item, {'type': base_type, 'name': ''}) for item in value]
-    else:
-        # 基本类型直接返回
-        return value
+    return format_value(value, param_definition)
 
 
 def decode_tx_data_simple(hex_data: str, abi_json: str) -> Optional[Dict[str, Any]]: